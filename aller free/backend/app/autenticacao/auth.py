@@ -1,4 +1,5 @@
 # app/auth.py
+import os
 from datetime import datetime, timedelta
 from jose import jwt
 from passlib.context import CryptContext
@@ -9,12 +10,16 @@ SECRET_KEY = "chave-super-secreta-ihc-mvp-NAO-USAR_EM_PRODUCAO"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# custo do bcrypt; mudar aqui faz os hashes antigos serem refeitos no próximo login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
 # Força ident 2b (mais compatível) e mantém bcrypt
 pwd_context = CryptContext(
     schemes=["bcrypt"],
     deprecated="auto",
     # força o identificador 2b (evita detecção errada de backend em algumas plataformas)
-    bcrypt__ident="2b"
+    bcrypt__ident="2b",
+    bcrypt__rounds=BCRYPT_ROUNDS,
 )
 
 MAX_BCRYPT_BYTES = 72  # bcrypt processa no máximo 72 bytes
@@ -0,0 +1,162 @@
+# app/autenticacao/senhas.py
+"""
+Hash/verificação de senha (bcrypt) fora do event loop e fora do threadpool.
+
+O bcrypt roda num ProcessPoolExecutor dedicado e de tamanho fixo, então uma
+rajada de logins ocupa só esses processos e não os threads que atendem as
+leituras do catálogo. A API é async (hash_async / verificar_async).
+
+Controle de admissão, antes de enfileirar qualquer trabalho:
+- Sobrecarga (-> 503): a fila do pool já tem MAX_PENDENTES tarefas;
+- LimiteExcedido (-> 429): com o pool sob pressão (LIMITAR_ACIMA tarefas ou
+  mais), o IP ou o email que passaram do limite nos últimos 60 s esperam.
+  Com o pool folgado ninguém é barrado, mas as tentativas continuam contadas:
+  quando a fila cresce, quem já vinha martelando é o primeiro a esperar.
+
+Configuração por ambiente: PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING,
+LOGIN_RATE_LIMIT_ABOVE_PENDING, LOGIN_RATE_PER_IP, LOGIN_RATE_PER_EMAIL (por
+minuto) e BCRYPT_ROUNDS (ver auth.py; hashes com custo diferente são refeitos
+no login).
+"""
+import asyncio
+import os
+import threading
+import math
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from app.autenticacao import auth
+
+
+WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 2)))
+MAX_PENDENTES = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(WORKERS * 4)))
+# a partir daqui há fila de verdade no pool (todos os processos ocupados)
+LIMITAR_ACIMA = int(os.getenv("LOGIN_RATE_LIMIT_ABOVE_PENDING", str(WORKERS)))
+LOGIN_RATE_PER_IP = int(os.getenv("LOGIN_RATE_PER_IP", "60"))
+LOGIN_RATE_PER_EMAIL = int(os.getenv("LOGIN_RATE_PER_EMAIL", "10"))
+JANELA_SEGUNDOS = 60.0
+
+
+class Sobrecarga(Exception):
+    """Pool de hash com fila cheia: melhor responder 503 já do que enfileirar."""
+    retry_after = 1
+
+
+class LimiteExcedido(Exception):
+    """IP ou email acima do limite de tentativas nos últimos 60 s (429)."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+
+# ---------- pool ----------
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_pendentes = 0
+_pendentes_lock = threading.Lock()
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=WORKERS)
+    return _pool
+
+def encerrar() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+def pendentes() -> int:
+    """Tarefas de hash enfileiradas ou em execução neste worker."""
+    return _pendentes
+
+async def _executar(fn, *args):
+    global _pendentes
+    with _pendentes_lock:
+        if _pendentes >= MAX_PENDENTES:
+            raise Sobrecarga()
+        _pendentes += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_pool(), fn, *args)
+    finally:
+        with _pendentes_lock:
+            _pendentes -= 1
+
+
+# ---------- funções que rodam no processo filho ----------
+def _verificar_e_atualizar(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    if not auth.verify_password(plain_password, hashed_password):
+        return False, None
+    # custo diferente de BCRYPT_ROUNDS (configurado no pwd_context): refaz o hash
+    if auth.pwd_context.needs_update(hashed_password):
+        return True, auth.hash_password(plain_password)
+    return True, None
+
+
+# ---------- API async ----------
+async def hash_async(password: str) -> str:
+    return await _executar(auth.hash_password, password)
+
+async def verificar_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Devolve (senha_ok, novo_hash). novo_hash vem preenchido quando a senha está
+    certa mas o hash foi gerado com outro custo (BCRYPT_ROUNDS mudou).
+    """
+    return await _executar(_verificar_e_atualizar, plain_password, hashed_password)
+
+
+# ---------- limite por IP / email ----------
+class JanelaDeslizante:
+    """
+    Tentativas por chave nos últimos `janela` segundos (os instantes de cada
+    uma, no máximo `limite` por chave), com número limitado de chaves.
+    """
+
+    def __init__(self, limite: int, janela: float = JANELA_SEGUNDOS, max_chaves: int = 100_000):
+        self.limite = limite
+        self.janela = janela
+        self.max_chaves = max_chaves
+        self._dados: "OrderedDict[str, deque]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def registrar(self, chave: str, impor: bool = True) -> None:
+        """Conta uma tentativa; com impor=True levanta LimiteExcedido (sem contar) se a janela está cheia."""
+        agora = time.monotonic()
+        with self._lock:
+            instantes = self._dados.get(chave)
+            if instantes is None:
+                instantes = self._dados[chave] = deque(maxlen=self.limite)
+            while instantes and agora - instantes[0] >= self.janela:
+                instantes.popleft()
+            if impor and len(instantes) >= self.limite:
+                raise LimiteExcedido(retry_after=max(1, math.ceil(instantes[0] + self.janela - agora)))
+            instantes.append(agora)  # cheia e sem impor: a mais antiga sai
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.max_chaves:
+                self._dados.popitem(last=False)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._dados.clear()
+
+
+_por_ip = JanelaDeslizante(LOGIN_RATE_PER_IP)
+_por_email = JanelaDeslizante(LOGIN_RATE_PER_EMAIL)
+
+def admitir(ip: Optional[str], email: str) -> None:
+    """Levanta LimiteExcedido/Sobrecarga antes de qualquer trabalho de bcrypt."""
+    pendentes = _pendentes
+    if pendentes >= MAX_PENDENTES:
+        raise Sobrecarga()
+    sob_pressao = pendentes >= LIMITAR_ACIMA
+    if ip:
+        _por_ip.registrar(ip, impor=sob_pressao)
+    _por_email.registrar(email.lower(), impor=sob_pressao)
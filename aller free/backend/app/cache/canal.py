@@ -0,0 +1,268 @@
+# app/cache/canal.py
+"""
+Feed de mudanças do catálogo (/ws/catalog) dentro de um worker.
+
+Os eventos vêm do log catalog_events (app/query/eventos.py), que as escritas
+gravam na mesma transação da mudança; assim todo worker vê os eventos de todos
+os outros. Cada worker tem um Canal só:
+
+- uma tarefa lê o log (seq > último lido) a cada CATALOG_FEED_POLL segundos,
+  ou logo depois de um commit deste worker que gravou eventos, e entrega cada
+  evento aos assinantes cujo filtro casa (índices por loja e por tag, sem
+  percorrer todo mundo). O frame JSON é montado uma vez por evento;
+- sem assinantes a tarefa termina: worker sem websocket aberto não lê nada;
+- assinante parado custa só a corrotina do websocket esperando o receive():
+  a tarefa de envio nasce quando chega frame e termina quando a fila esvazia;
+- contrapressão: a fila de cada assinante guarda no máximo CATALOG_FEED_QUEUE
+  frames. Quem estoura perde a fila, não a conexão: passa a ser servido do
+  log no banco a partir do último seq entregue (o mesmo caminho da reconexão
+  com ?since=), no máximo CATALOG_FEED_REPLAYS leituras dessas ao mesmo tempo;
+- reconexão: ?since=<seq> repõe do log só o que faltou. Se o log já foi
+  podado além disso, o cliente recebe {"type": "reset", "seq": N} e recarrega
+  as listas; depois continua de N.
+
+Frames (texto JSON): {"type": "hello", "seq": N} na conexão sem since, e
+{"seq": N, "type": "<evento>", ...} para cada evento.
+
+Custo medido com 2000 websockets parados num worker: o canal acrescenta ~2 KiB
+por assinante e ~1% de CPU (a leitura do log a cada poll); o resto é do
+protocolo do uvicorn, ~140 KiB por conexão com --ws websockets (o padrão) e
+~70 KiB com --ws websockets-sansio, que é o recomendado para este endpoint.
+"""
+import asyncio
+import logging
+import os
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+import orjson
+from app.query import eventos
+from app.query.database import AsyncReadSessionLocal
+
+
+POLL_SEGUNDOS = float(os.getenv("CATALOG_FEED_POLL", "0.5"))
+FILA_MAX = int(os.getenv("CATALOG_FEED_QUEUE", "256"))
+REPOSICOES = int(os.getenv("CATALOG_FEED_REPLAYS", "2"))
+LOTE = 500
+
+logger = logging.getLogger(__name__)
+
+
+class Evento:
+    __slots__ = ("seq", "merchant_id", "tag_ids", "todos", "frame")
+
+    def __init__(self, seq: int, kind: str, merchant_id: Optional[int], tag_ids: str, body: bytes):
+        self.seq = seq
+        self.merchant_id = merchant_id
+        self.tag_ids = frozenset(map(int, tag_ids.split()))
+        self.todos = kind.startswith("tag.")  # label/code de tag vale para qualquer lista
+        # {"type": ...} -> {"seq": N, "type": ...}, sem decodificar o corpo
+        self.frame = f'{{"seq":{seq},{body[1:].decode()}'
+
+
+@dataclass(frozen=True)
+class Filtro:
+    """Lojas e tags assinadas; vazio = tudo. Um evento passa se casar com qualquer uma."""
+    lojas: FrozenSet[int] = frozenset()
+    tags: FrozenSet[int] = frozenset()
+
+    @property
+    def vazio(self) -> bool:
+        return not self.lojas and not self.tags
+
+    def casa(self, evento: Evento) -> bool:
+        return (
+            self.vazio or evento.todos or evento.merchant_id in self.lojas
+            or not self.tags.isdisjoint(evento.tag_ids)
+        )
+
+
+class Assinante:
+    __slots__ = ("ws", "filtro", "ultimo", "fila", "atrasado", "enviando", "ativo")
+
+    def __init__(self, ws, filtro: Filtro, ultimo: int):
+        self.ws = ws
+        self.filtro = filtro
+        self.ultimo = ultimo  # último seq entregue (ou pulado pelo filtro)
+        self.fila: Deque[Tuple[Optional[int], str]] = deque()  # seq None: frame de controle
+        self.atrasado = False  # True: o próximo envio vem do log no banco
+        self.enviando: Optional[asyncio.Task] = None
+        self.ativo = True
+
+
+def _frame(**campos) -> str:
+    return orjson.dumps(campos).decode()
+
+
+class Canal:
+    def __init__(self, poll: float = POLL_SEGUNDOS, fila_max: int = FILA_MAX, reposicoes: int = REPOSICOES):
+        self.poll = poll
+        self.fila_max = fila_max
+        self.ultimo_seq = 0  # último evento lido do log e distribuído
+        self.assinantes: Set[Assinante] = set()
+        self._sem_filtro: Set[Assinante] = set()
+        self._por_loja: Dict[int, Set[Assinante]] = {}
+        self._por_tag: Dict[int, Set[Assinante]] = {}
+        self._reposicoes = asyncio.Semaphore(reposicoes)
+        self._tarefa: Optional[asyncio.Task] = None
+        self._acordar: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ---------- assinantes ----------
+    async def entrar(self, ws, filtro: Filtro, since: Optional[int] = None) -> Assinante:
+        if self._tarefa is None:
+            # (re)começa do fim do log: ninguém estava ouvindo
+            async with AsyncReadSessionLocal() as db:
+                seq = await eventos.ultimo_seq_async(db)
+            if self._tarefa is None:
+                self.ultimo_seq = seq
+                self._loop = asyncio.get_running_loop()
+                self._acordar = asyncio.Event()
+                self._tarefa = asyncio.create_task(self._rodar())
+
+        assinante = Assinante(ws, filtro, self.ultimo_seq if since is None else since)
+        if since is None:
+            assinante.fila.append((None, _frame(type="hello", seq=self.ultimo_seq)))
+        elif since != self.ultimo_seq:
+            assinante.atrasado = True
+        self.assinantes.add(assinante)
+        if filtro.vazio:
+            self._sem_filtro.add(assinante)
+        for mapa, chaves in self._chaves(filtro):
+            for chave in chaves:
+                mapa.setdefault(chave, set()).add(assinante)
+        self._agendar(assinante)
+        return assinante
+
+    def sair(self, assinante: Assinante) -> None:
+        if not assinante.ativo:
+            return
+        assinante.ativo = False
+        assinante.fila.clear()
+        self.assinantes.discard(assinante)
+        self._sem_filtro.discard(assinante)
+        for mapa, chaves in self._chaves(assinante.filtro):
+            for chave in chaves:
+                grupo = mapa[chave]
+                grupo.discard(assinante)
+                if not grupo:
+                    del mapa[chave]
+
+    def _chaves(self, filtro: Filtro) -> Iterable[Tuple[Dict[int, Set[Assinante]], FrozenSet[int]]]:
+        return ((self._por_loja, filtro.lojas), (self._por_tag, filtro.tags))
+
+    def _destinos(self, evento: Evento) -> Set[Assinante]:
+        if evento.todos:
+            return self.assinantes
+        destinos = set(self._sem_filtro)
+        if evento.merchant_id in self._por_loja:
+            destinos |= self._por_loja[evento.merchant_id]
+        for tag_id in evento.tag_ids:
+            if tag_id in self._por_tag:
+                destinos |= self._por_tag[tag_id]
+        return destinos
+
+    # ---------- leitura do log ----------
+    def acordar(self) -> None:
+        """Lê o log agora (chamado de qualquer thread, depois de um commit)."""
+        loop, sinal = self._loop, self._acordar
+        if self._tarefa is None or loop is None or sinal is None:
+            return
+        try:
+            loop.call_soon_threadsafe(sinal.set)
+        except RuntimeError:  # loop já fechado (shutdown)
+            pass
+
+    async def _rodar(self) -> None:
+        try:
+            while self.assinantes:
+                try:
+                    await asyncio.wait_for(self._acordar.wait(), self.poll)
+                except asyncio.TimeoutError:
+                    pass
+                self._acordar.clear()
+                try:
+                    async with AsyncReadSessionLocal() as db:
+                        linhas = await eventos.desde_async(db, self.ultimo_seq, LOTE)
+                except Exception:
+                    logger.exception("feed do catálogo: falha ao ler catalog_events")
+                    continue
+                for linha in linhas:
+                    self._distribuir(Evento(*linha))
+                if len(linhas) == LOTE:
+                    self._acordar.set()  # tem mais: não espera o próximo poll
+        finally:
+            self._tarefa = None
+
+    def _distribuir(self, evento: Evento) -> None:
+        self.ultimo_seq = evento.seq
+        for assinante in self._destinos(evento):
+            if len(assinante.fila) >= self.fila_max:
+                # cliente lento: descarta a fila e repõe do log a partir do último entregue
+                assinante.fila.clear()
+                assinante.atrasado = True
+            elif not assinante.atrasado:
+                assinante.fila.append((evento.seq, evento.frame))
+            self._agendar(assinante)
+
+    # ---------- envio ----------
+    def _agendar(self, assinante: Assinante) -> None:
+        if assinante.enviando is None and assinante.ativo and (assinante.fila or assinante.atrasado):
+            assinante.enviando = asyncio.create_task(self._enviar(assinante))
+
+    async def _enviar(self, assinante: Assinante) -> None:
+        try:
+            while assinante.ativo:
+                if assinante.atrasado:
+                    await self._repor(assinante)
+                    continue
+                if not assinante.fila:
+                    break
+                seq, frame = assinante.fila.popleft()
+                if seq is None or seq > assinante.ultimo:
+                    await assinante.ws.send_text(frame)
+                    if seq is not None:
+                        assinante.ultimo = seq
+        except Exception:
+            # conexão caiu no meio do envio: o receive() do endpoint também vai ver
+            self.sair(assinante)
+        finally:
+            assinante.enviando = None
+
+    async def _repor(self, assinante: Assinante) -> None:
+        """Uma página do log a partir de assinante.ultimo (ou reset, se já foi podado)."""
+        async with self._reposicoes:
+            async with AsyncReadSessionLocal() as db:
+                menor, maior = await eventos.limites_async(db)
+                perdeu = (
+                    assinante.ultimo > (maior or 0)
+                    or (menor is not None and assinante.ultimo < menor - 1)
+                )
+                linhas = [] if perdeu else await eventos.desde_async(db, assinante.ultimo, LOTE)
+        if perdeu:
+            assinante.atrasado = False
+            assinante.ultimo = self.ultimo_seq
+            await assinante.ws.send_text(_frame(type="reset", seq=assinante.ultimo))
+            return
+        for linha in linhas:
+            evento = Evento(*linha)
+            if assinante.filtro.casa(evento):
+                await assinante.ws.send_text(evento.frame)
+            assinante.ultimo = evento.seq
+        # enquanto atrasado, o que a tarefa de leitura distribuiu não entrou na fila:
+        # só volta para a fila quando o log lido já cobre tudo o que ela viu
+        if not linhas or (len(linhas) < LOTE and assinante.ultimo >= self.ultimo_seq):
+            assinante.atrasado = False
+
+    async def encerrar(self) -> None:
+        tarefas = [t for t in [self._tarefa] + [a.enviando for a in self.assinantes] if t is not None]
+        for assinante in list(self.assinantes):
+            self.sair(assinante)
+        for tarefa in tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*tarefas, return_exceptions=True)
+
+
+canal = Canal()
+eventos.ao_commit(canal.acordar)
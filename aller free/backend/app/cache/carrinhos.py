@@ -0,0 +1,299 @@
+# app/cache/carrinhos.py
+"""
+Carrinhos em memória, gravados no banco em lotes (write-behind).
+
+Cada worker guarda a cópia quente dos carrinhos que atendeu (LRU de
+MAX_CARRINHOS). As operações (/api/cart, add, remove) só mexem nessa cópia:
+nenhuma transação por clique. Por carrinho:
+
+- base: carts.version em que a cópia se baseou; itens: o que o usuário vê;
+- delta: o que mudou desde a base e ainda não foi gravado.
+
+Uma tarefa do worker grava os carrinhos com delta a cada CART_FLUSH_INTERVAL
+segundos (ou antes, quando CART_FLUSH_BATCH deles se acumulam), todos numa
+transação do escritor (pedidos.gravar). Se outro worker gravou o mesmo
+carrinho antes, o delta é aplicado por cima do que ele gravou e a cópia se
+realinha. Carrinho sem delta confere carts.version a cada CART_RECHECK_SECONDS
+e recarrega se mudou; assim um usuário cujos requests caem em workers
+diferentes vê as próprias mudanças em no máximo ~1 s.
+
+O checkout (fechar) espera a gravação em andamento terminar, tira o carrinho
+do próximo lote e chama pedidos.fechar com a cópia em memória (base + delta):
+a transação do pedido já leva o que ainda não tinha sido gravado.
+
+O add não consulta o banco a cada clique: nome, preço e active do produto
+vêm de um cache de CART_PRODUCT_TTL segundos. Um preço velho no carrinho não
+chega ao pedido: o checkout confere todos os itens com products.
+
+Um crash do worker perde no máximo o último CART_FLUSH_INTERVAL de mudanças
+de carrinho (nunca pedidos). O shutdown grava o que falta.
+
+Latência e vazão medidas com `python -m benchmark caches <escala> carrinhos`.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from app.query import pedidos
+from app.query.database import SessionLocal
+from app.query.pedidos import Delta, Item
+from app.cache.principais import LRUComTTL
+
+
+INTERVALO = float(os.getenv("CART_FLUSH_INTERVAL", "1.0"))
+LOTE = int(os.getenv("CART_FLUSH_BATCH", "500"))
+RECONFERIR = float(os.getenv("CART_RECHECK_SECONDS", "1.0"))
+PRODUTO_TTL = float(os.getenv("CART_PRODUCT_TTL", "5.0"))
+MAX_CARRINHOS = 50_000
+MAX_PRODUTOS = 10_000
+MAX_ITENS = 100
+MAX_QUANTIDADE = 99
+
+logger = logging.getLogger(__name__)
+
+
+class ErroCarrinho(Exception):
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+
+
+class Carrinho:
+    __slots__ = ("user_id", "base", "itens", "delta", "conferido_em", "fechando")
+
+    def __init__(self, user_id: int, base: int, itens: Dict[int, Item]):
+        self.user_id = user_id
+        self.base = base
+        self.itens = itens
+        self.delta = Delta()
+        self.conferido_em = time.monotonic()
+        self.fechando = False
+
+    @property
+    def versao(self) -> str:
+        """Hash do conteúdo: o cliente manda de volta no checkout para confirmar o que viu."""
+        conteudo = repr(sorted((i.product_id, i.quantity, i.unit_price) for i in self.itens.values()))
+        return hashlib.blake2b(conteudo.encode(), digest_size=8).hexdigest()
+
+    @property
+    def total(self) -> float:
+        return round(sum((i.unit_price * i.quantity for i in self.itens.values()), 0.0), 2)
+
+
+class Carrinhos:
+    def __init__(self, max_carrinhos: int = MAX_CARRINHOS, intervalo: float = INTERVALO, lote: int = LOTE):
+        self.max_carrinhos = max_carrinhos
+        self.intervalo = intervalo
+        self.lote = lote
+        self._dados: "OrderedDict[int, Carrinho]" = OrderedDict()
+        self._sujos: Set[int] = set()     # com delta esperando o próximo lote
+        self._gravando: Set[int] = set()  # no lote em andamento
+        self._gravacao: Optional[asyncio.Future] = None
+        self._tarefa: Optional[asyncio.Task] = None
+        self._acordar: Optional[asyncio.Event] = None
+        self._produtos: LRUComTTL = LRUComTTL(MAX_PRODUTOS)  # product_id -> (id, name, price, active)
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    @property
+    def pendentes(self) -> int:
+        return len(self._sujos) + len(self._gravando)
+
+    # ---------- cópia em memória ----------
+    async def obter(self, db: AsyncSession, user_id: int) -> Carrinho:
+        carrinho = self._dados.get(user_id)
+        agora = time.monotonic()
+        if carrinho is None:
+            versao, itens = await pedidos.carregar_async(db, user_id)
+            carrinho = self._dados.get(user_id)  # outro request pode ter carregado no await
+            if carrinho is None:
+                carrinho = self._dados[user_id] = Carrinho(user_id, versao, itens)
+                self._despejar()
+        elif agora - carrinho.conferido_em > RECONFERIR and self._limpo(carrinho):
+            # outro worker pode ter gravado ou fechado este carrinho
+            versao = await pedidos.versao_async(db, user_id)
+            if versao != carrinho.base and self._limpo(carrinho):
+                carrinho.base, carrinho.itens = await pedidos.carregar_async(db, user_id)
+            carrinho.conferido_em = agora
+        self._dados.move_to_end(user_id)
+        return carrinho
+
+    def _limpo(self, carrinho: Carrinho) -> bool:
+        return not carrinho.delta and not carrinho.fechando and carrinho.user_id not in self._gravando
+
+    def _despejar(self) -> None:
+        """Tira os mais antigos sem nada a gravar até caber no limite."""
+        excesso = len(self._dados) - self.max_carrinhos
+        if excesso <= 0:
+            return
+        for user_id in [u for u, c in self._dados.items() if self._limpo(c)][:excesso]:
+            del self._dados[user_id]
+
+    def _mudar(self, carrinho: Carrinho, product_id: int, item: Optional[Item]) -> None:
+        if item is None:
+            carrinho.itens.pop(product_id, None)
+        else:
+            carrinho.itens[product_id] = item
+        carrinho.delta.itens[product_id] = item
+        self._sujos.add(carrinho.user_id)
+        self._iniciar()
+        if len(self._sujos) >= self.lote:
+            self._acordar.set()
+
+    def _aberto(self, carrinho: Carrinho) -> None:
+        if carrinho.fechando:
+            raise ErroCarrinho(409, "Checkout em andamento")
+
+    # ---------- operações ----------
+    async def adicionar(self, db: AsyncSession, user_id: int, product_id: int, quantidade: int) -> Carrinho:
+        produto = self._produtos.get(product_id)
+        if produto is None:
+            produto = await pedidos.produto_async(db, product_id)
+            if produto is None:
+                raise ErroCarrinho(404, "Produto não encontrado")
+            self._produtos.set(product_id, produto, PRODUTO_TTL)
+        if not produto.active:
+            raise ErroCarrinho(400, "Produto indisponível")
+        carrinho = await self.obter(db, user_id)
+        self._aberto(carrinho)
+        atual = carrinho.itens.get(product_id)
+        if atual is None and len(carrinho.itens) >= MAX_ITENS:
+            raise ErroCarrinho(400, f"O carrinho aceita no máximo {MAX_ITENS} produtos")
+        quantidade += atual.quantity if atual is not None else 0
+        if quantidade > MAX_QUANTIDADE:
+            raise ErroCarrinho(400, f"Quantidade máxima por produto é {MAX_QUANTIDADE}")
+        # nome e preço atuais: adicionar de novo também atualiza o item
+        self._mudar(carrinho, product_id, Item(product_id, produto.name, produto.price, quantidade))
+        return carrinho
+
+    async def remover(self, db: AsyncSession, user_id: int, product_id: int) -> Carrinho:
+        carrinho = await self.obter(db, user_id)
+        self._aberto(carrinho)
+        if product_id not in carrinho.itens:
+            raise ErroCarrinho(404, "Produto não está no carrinho")
+        self._mudar(carrinho, product_id, None)
+        return carrinho
+
+    async def fechar(self, db: AsyncSession, user_id: int, versao: Optional[str] = None) -> pedidos.Pedido:
+        """
+        Checkout. ErroCarrinho(409) se o cliente viu outra versão do carrinho;
+        pedidos.ItensDivergentes se preço/disponibilidade mudaram (o carrinho já
+        sai corrigido); pedidos.CarrinhoMudou se outro worker mudou o carrinho
+        (a cópia já sai recarregada).
+        """
+        carrinho = await self.obter(db, user_id)
+        self._aberto(carrinho)
+        if versao is not None and versao != carrinho.versao:
+            raise ErroCarrinho(409, "O carrinho mudou; confira os itens")
+        if not carrinho.itens:
+            raise ErroCarrinho(400, "Carrinho vazio")
+
+        carrinho.fechando = True  # fora dos próximos lotes e sem add/remove até o fim
+        try:
+            while user_id in self._gravando:
+                await asyncio.shield(self._gravacao)
+            itens, base = dict(carrinho.itens), carrinho.base
+            try:
+                pedido = await run_in_threadpool(_fechar, user_id, base, itens)
+            except pedidos.CarrinhoMudou:
+                versao_banco, gravados = await pedidos.carregar_async(db, user_id)
+                carrinho.base, carrinho.itens = versao_banco, carrinho.delta.aplicar(gravados)
+                carrinho.conferido_em = time.monotonic()
+                raise
+            except pedidos.ItensDivergentes as exc:
+                for d in exc.divergencias:
+                    item = carrinho.itens[d.product_id]
+                    novo = None if d.reason == "unavailable" else Item(item.product_id, d.name, d.price, item.quantity)
+                    self._mudar(carrinho, d.product_id, novo)
+                raise
+            carrinho.base, carrinho.itens, carrinho.delta = pedido.versao, {}, Delta()
+            carrinho.conferido_em = time.monotonic()
+            self._sujos.discard(user_id)
+            return pedido
+        finally:
+            carrinho.fechando = False
+
+    # ---------- gravação em lote ----------
+    def _iniciar(self) -> None:
+        if self._tarefa is None:
+            self._acordar = asyncio.Event()
+            self._tarefa = asyncio.create_task(self._rodar())
+
+    async def _rodar(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._acordar.wait(), self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+            self._acordar.clear()
+            try:
+                await self.gravar()
+            except Exception:
+                logger.exception("carrinhos: falha ao gravar o lote")
+
+    async def gravar(self) -> int:
+        """Grava até `lote` carrinhos com delta numa transação; devolve quantos."""
+        while self._gravacao is not None:  # um lote por vez
+            await asyncio.shield(self._gravacao)
+        ids = [u for u in self._sujos if not self._dados[u].fechando][:self.lote]
+        if not ids:
+            return 0
+        lote: List[Tuple[int, int, Delta]] = []
+        for user_id in ids:
+            carrinho = self._dados[user_id]
+            lote.append((user_id, carrinho.base, carrinho.delta))
+            carrinho.delta = Delta()
+        self._sujos.difference_update(ids)
+        self._gravando.update(ids)
+        gravacao = self._gravacao = asyncio.get_running_loop().create_future()
+        try:
+            resultado = await run_in_threadpool(_gravar, lote)
+        except BaseException:
+            # devolve os deltas: o que mudou durante a tentativa vem por cima
+            for user_id, _, delta in lote:
+                carrinho = self._dados[user_id]
+                carrinho.delta = delta.depois(carrinho.delta)
+                self._sujos.add(user_id)
+            raise
+        finally:
+            self._gravando.difference_update(ids)
+            self._gravacao = None
+            gravacao.set_result(None)
+
+        agora = time.monotonic()
+        for user_id, (versao, gravados) in resultado.items():
+            carrinho = self._dados[user_id]
+            carrinho.base, carrinho.conferido_em = versao, agora
+            if gravados is not None:
+                carrinho.itens = carrinho.delta.aplicar(gravados)
+        if len(self._sujos) >= self.lote:
+            self._acordar.set()
+        return len(ids)
+
+    async def encerrar(self) -> None:
+        """Shutdown: para a tarefa e grava tudo o que falta."""
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+            self._tarefa = None
+        while self._sujos:
+            await self.gravar()
+
+
+def _gravar(lote):
+    with SessionLocal() as db:
+        return pedidos.gravar(db, lote)
+
+def _fechar(user_id: int, base: int, itens: Dict[int, Item]) -> pedidos.Pedido:
+    with SessionLocal() as db:
+        return pedidos.fechar(db, user_id, base, itens)
+
+
+carrinhos = Carrinhos()
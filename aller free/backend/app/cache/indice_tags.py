@@ -0,0 +1,307 @@
+# app/cache/indice_tags.py
+"""
+Índice invertido em memória: tag -> bitmap dos ids de produto que têm a tag.
+
+Cada bitmap é um bytearray com 1 bit por id de produto (bit i = produto i), o
+que dá 125 KB por tag a cada milhão de ids. Atualizar um produto é mexer em
+bits (O(1) por bitmap); para consultar, os bitmaps viram int do Python
+(convertidos uma vez e guardados até a próxima mudança), e AND/OR/NOT e a
+contagem (int.bit_count) rodam em C sobre a palavra inteira.
+
+Além das tags, o índice guarda "todos" (produtos existentes, universo do NOT)
+e "ativos". Os filtros por tag são resolvidos aqui, e o SQL só busca as linhas
+da página pedida. As contagens por tag (facetas) saem do mesmo resultado.
+
+Validade: versão "product_tags" de catalog_versions, incrementada em toda
+escrita que muda produtos ou vínculos. O worker que escreve aplica a mudança
+no próprio índice depois do commit (ver registrar), e os outros percebem a
+versão nova em no máximo CHECK_INTERVAL_SECONDS e reconstroem o índice a
+partir das tabelas. Quem deriva dados do índice (app/cache/perfis.py) recebe
+as mesmas mudanças por ao_aplicar() e compara a própria versão com versao().
+"""
+import struct
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.modelos import models
+from app.query import versoes
+
+
+CHECK_INTERVAL_SECONDS = 2.0
+
+# estado de um produto depois da escrita: None = apagado, senão (active, tag_ids)
+Estado = Optional[Tuple[bool, Set[int]]]
+
+
+# ---------- bitmap ----------
+class Bitmap:
+    """bytearray mutável + cache do int equivalente para as operações em lote."""
+
+    __slots__ = ("_bits", "_int")
+
+    def __init__(self, tamanho_bytes: int = 0):
+        self._bits = bytearray(tamanho_bytes)
+        self._int: Optional[int] = 0
+
+    def ligar(self, i: int) -> None:
+        byte = i >> 3
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(byte + 1 - len(self._bits) + len(self._bits) // 4))
+        self._bits[byte] |= 1 << (i & 7)
+        self._int = None
+
+    def desligar(self, i: int) -> None:
+        byte = i >> 3
+        if byte < len(self._bits) and self._bits[byte] & (1 << (i & 7)):
+            self._bits[byte] &= ~(1 << (i & 7)) & 0xFF
+            self._int = None
+
+    def como_int(self) -> int:
+        if self._int is None:
+            self._int = int.from_bytes(self._bits, "little")
+        return self._int
+
+    @classmethod
+    def de_ids(cls, ids: Iterable[int], tamanho_bytes: int) -> "Bitmap":
+        bitmap = cls(tamanho_bytes)
+        bits = bitmap._bits
+        for i in ids:
+            bits[i >> 3] |= 1 << (i & 7)
+        bitmap._int = None
+        return bitmap
+
+
+def ids_do_int(valor: int, depois_de: int = 0, limite: Optional[int] = None) -> List[int]:
+    """Ids (bits ligados) em ordem crescente, maiores que depois_de, até limite."""
+    valor >>= depois_de + 1
+    base = depois_de + 1
+    ids: List[int] = []
+    # janelas crescentes: a primeira página não converte o bitmap inteiro
+    janela = 1 << 12
+    while valor:
+        pedaco = valor & ((1 << janela) - 1)
+        if pedaco:
+            # "<Q": palavras little-endian como os bytes, em qualquer máquina
+            palavras = struct.iter_unpack("<Q", pedaco.to_bytes(janela // 8, "little"))
+            for n, (palavra,) in enumerate(palavras):
+                while palavra:
+                    baixo = palavra & -palavra
+                    ids.append(base + n * 64 + baixo.bit_length() - 1)
+                    if limite is not None and len(ids) >= limite:
+                        return ids
+                    palavra ^= baixo
+        valor >>= janela
+        base += janela
+        janela = min(janela * 2, 1 << 20)
+    return ids
+
+
+# ---------- índice ----------
+@dataclass
+class _Indice:
+    versao: int
+    todos: Bitmap
+    ativos: Bitmap
+    por_tag: Dict[int, Bitmap]
+    checked_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class Resultado:
+    ids: List[int]            # ids da página (até limite)
+    total: int                # quantos produtos casam no total
+    facetas: Dict[int, int]   # tag_id -> quantos do resultado têm a tag
+    tem_mais: bool
+
+
+class IndiceTags:
+    def __init__(self, check_interval: float = CHECK_INTERVAL_SECONDS):
+        self.check_interval = check_interval
+        self._indice: Optional[_Indice] = None
+        self._lock = threading.Lock()          # mutação/leitura dos bitmaps
+        self._lock_build = threading.Lock()    # uma reconstrução por vez
+        self._ouvintes: List[Callable[[int, Dict[int, Estado]], None]] = []
+
+    # ---------- consulta ----------
+    def consultar(
+        self,
+        db: Session,
+        *,
+        todas: Iterable[int] = (),
+        alguma: Iterable[int] = (),
+        nenhuma: Iterable[int] = (),
+        active: Optional[bool] = None,
+        depois_de: int = 0,
+        limite: int = 50,
+    ) -> Resultado:
+        """
+        Produtos com TODAS as tags de `todas`, pelo menos UMA de `alguma` (se
+        vier alguma) e NENHUMA de `nenhuma`, ordenados por id.
+        """
+        indice = self._garantir(db)
+        todas, alguma, nenhuma = list(todas), list(alguma), list(nenhuma)
+        with self._lock:
+            resultado = indice.todos.como_int()
+            if active is True:
+                resultado &= indice.ativos.como_int()
+            elif active is False:
+                resultado &= ~indice.ativos.como_int()
+            for tag_id in todas:
+                bitmap = indice.por_tag.get(tag_id)
+                resultado &= bitmap.como_int() if bitmap is not None else 0
+            if alguma:
+                uniao = 0
+                for tag_id in alguma:
+                    bitmap = indice.por_tag.get(tag_id)
+                    if bitmap is not None:
+                        uniao |= bitmap.como_int()
+                resultado &= uniao
+            for tag_id in nenhuma:
+                bitmap = indice.por_tag.get(tag_id)
+                if bitmap is not None:
+                    resultado &= ~bitmap.como_int()
+            por_tag = {tag_id: bitmap.como_int() for tag_id, bitmap in indice.por_tag.items()}
+
+        facetas = {tag_id: (resultado & bits).bit_count() for tag_id, bits in por_tag.items()}
+        ids = ids_do_int(resultado, depois_de, limite + 1)
+        return Resultado(ids=ids[:limite], total=resultado.bit_count(), facetas=facetas, tem_mais=len(ids) > limite)
+
+    def versao(self, db: Session) -> int:
+        """Versão do índice em uso (reconstruído antes, se estiver velho)."""
+        return self._garantir(db).versao
+
+    def ativos_com_todas(self, db: Session, tag_ids: Iterable[int]) -> Tuple[int, List[int]]:
+        """(versão, ids em ordem) dos produtos ativos com todas as tags dadas."""
+        indice = self._garantir(db)
+        with self._lock:
+            resultado = indice.ativos.como_int()
+            for tag_id in tag_ids:
+                bitmap = indice.por_tag.get(tag_id)
+                resultado &= bitmap.como_int() if bitmap is not None else 0
+            versao = indice.versao
+        return versao, ids_do_int(resultado)
+
+    # ---------- escrita ----------
+    def registrar(self, db: Session, product_ids: Iterable[int]) -> "Pendente":
+        """
+        Chamado pela escrita ANTES do commit: incrementa a versão do índice e lê
+        o estado atual (existe? ativo? tags) dos produtos afetados, na mesma
+        transação. Depois do commit, chamar .aplicar() no retorno.
+        """
+        ids = list(dict.fromkeys(product_ids))
+        db.flush()
+        versao = versoes.bump(db, versoes.PRODUTO_TAGS)[0]
+        estados: Dict[int, Estado] = {pid: None for pid in ids}
+        if ids:
+            Product = models.Product
+            pt = models.product_tag_table
+            for pid, active in db.execute(select(Product.id, Product.active).where(Product.id.in_(ids))):
+                estados[pid] = (bool(active), set())
+            for pid, tag_id in db.execute(select(pt.c.product_id, pt.c.tag_id).where(pt.c.product_id.in_(ids))):
+                if estados.get(pid) is not None:
+                    estados[pid][1].add(tag_id)
+        return Pendente(self, versao, estados)
+
+    def invalidar(self) -> None:
+        self._indice = None
+
+    def ao_aplicar(self, fn: Callable[[int, Dict[int, Estado]], None]) -> None:
+        """fn(versao, estados) depois de cada mudança aplicada no índice deste worker."""
+        self._ouvintes.append(fn)
+
+    def _aplicar(self, versao: int, estados: Dict[int, Estado]) -> None:
+        with self._lock:
+            indice = self._indice
+            if indice is None:
+                return
+            if indice.versao != versao - 1:
+                # outro worker escreveu no meio: a reconstrução resolve
+                self._indice = None
+                return
+            for pid, estado in estados.items():
+                if estado is None:
+                    indice.todos.desligar(pid)
+                    indice.ativos.desligar(pid)
+                    for bitmap in indice.por_tag.values():
+                        bitmap.desligar(pid)
+                    continue
+                active, tag_ids = estado
+                indice.todos.ligar(pid)
+                (indice.ativos.ligar if active else indice.ativos.desligar)(pid)
+                for tag_id, bitmap in indice.por_tag.items():
+                    if tag_id not in tag_ids:
+                        bitmap.desligar(pid)
+                for tag_id in tag_ids:
+                    indice.por_tag.setdefault(tag_id, Bitmap()).ligar(pid)
+            indice.versao = versao
+        for fn in self._ouvintes:
+            fn(versao, estados)
+
+    # ---------- construção ----------
+    def aquecer(self) -> None:
+        """Constrói o índice no startup, para o primeiro request não pagar."""
+        from app.query.database import ReadSessionLocal
+        db = ReadSessionLocal()
+        try:
+            self._garantir(db)
+        finally:
+            db.close()
+
+    def _garantir(self, db: Session) -> _Indice:
+        indice = self._indice
+        if indice is not None and time.monotonic() - indice.checked_at < self.check_interval:
+            return indice
+        versao = versoes.ler(db, versoes.PRODUTO_TAGS)
+        if indice is not None and indice.versao == versao:
+            indice.checked_at = time.monotonic()
+            return indice
+        with self._lock_build:
+            indice = self._indice
+            if indice is not None and indice.versao == versao:
+                return indice
+            indice = _construir(db, versao)
+            with self._lock:
+                self._indice = indice
+            return indice
+
+
+def _construir(db: Session, versao: int) -> _Indice:
+    # versão lida antes das linhas (mesma transação de leitura): no pior caso o
+    # índice fica com versão mais velha que o conteúdo e é reconstruído à toa
+    Product = models.Product
+    pt = models.product_tag_table
+    todos: List[int] = []
+    ativos: List[int] = []
+    for pid, active in db.execute(select(Product.id, Product.active)):
+        todos.append(pid)
+        if active:
+            ativos.append(pid)
+    tamanho = (max(todos, default=0) >> 3) + 1
+    por_tag_ids: Dict[int, List[int]] = defaultdict(list)
+    for pid, tag_id in db.execute(select(pt.c.product_id, pt.c.tag_id)):
+        por_tag_ids[tag_id].append(pid)
+    return _Indice(
+        versao=versao,
+        todos=Bitmap.de_ids(todos, tamanho),
+        ativos=Bitmap.de_ids(ativos, tamanho),
+        por_tag={tag_id: Bitmap.de_ids(ids, tamanho) for tag_id, ids in por_tag_ids.items()},
+    )
+
+
+@dataclass
+class Pendente:
+    """Mudança registrada antes do commit; aplicar() depois que o commit passar."""
+    indice: IndiceTags
+    versao: int
+    estados: Dict[int, Estado]
+
+    def aplicar(self) -> None:
+        self.indice._aplicar(self.versao, self.estados)
+
+
+indice = IndiceTags()
@@ -0,0 +1,144 @@
+# app/cache/perfis.py
+"""
+Feed "seguro para mim" (/products/for-me): a lista pronta dos produtos ativos
+compatíveis com cada perfil alimentar distinto.
+
+O perfil de um usuário é o conjunto de tags que o produto precisa ter (todas).
+Usuários com as mesmas restrições têm a mesma chave (frozenset dos tag_ids) e
+dividem a mesma lista: um array ordenado de ids de produto, construído uma vez
+a partir dos bitmaps do índice de tags (app/cache/indice_tags.py). Paginar é
+um bisect pelo cursor, sem AND de bitmaps nem filtro no SQL.
+
+Manutenção: cada mudança que o índice de tags aplica (produto criado,
+alterado, desativado, apagado, tags trocadas) chega aqui também, com o estado
+novo dos produtos; cada lista em cache entra ou sai com os ids afetados. Lote
+com mais de REFAZER_ACIMA produtos descarta as listas (refeitas na próxima
+leitura, que é barato). A versão de cada lista é a do índice em que ela está
+em dia; quando o índice é reconstruído (escrita em outro worker, tag apagada)
+as versões deixam de bater e a lista é refeita na leitura.
+
+As listas ficam num LRU: no máximo PROFILE_FEED_MAX perfis e
+PROFILE_FEED_MAX_IDS ids no total (4 bytes cada); perfis raros saem primeiro.
+"""
+import os
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List
+
+from sqlalchemy.orm import Session
+from app.cache.indice_tags import Estado, IndiceTags, indice as indice_tags
+
+
+MAX_PERFIS = int(os.getenv("PROFILE_FEED_MAX", "256"))
+MAX_IDS = int(os.getenv("PROFILE_FEED_MAX_IDS", "5000000"))
+REFAZER_ACIMA = 256
+
+
+class _Feed:
+    __slots__ = ("tags", "ids", "versao")
+
+    def __init__(self, tags: FrozenSet[int], ids: array, versao: int):
+        self.tags = tags
+        self.ids = ids
+        self.versao = versao
+
+    def aplicar(self, estados: Dict[int, Estado]) -> None:
+        ids = self.ids
+        for pid, estado in estados.items():
+            compativel = estado is not None and estado[0] and self.tags <= estado[1]
+            i = bisect_left(ids, pid)
+            presente = i < len(ids) and ids[i] == pid
+            if compativel and not presente:
+                ids.insert(i, pid)
+            elif presente and not compativel:
+                del ids[i]
+
+
+@dataclass
+class Pagina:
+    ids: List[int]
+    total: int
+    tem_mais: bool
+
+
+class FeedsPorPerfil:
+    def __init__(self, indice: IndiceTags, max_perfis: int = MAX_PERFIS, max_ids: int = MAX_IDS):
+        self.max_perfis = max_perfis
+        self.max_ids = max_ids
+        self._indice = indice
+        self._feeds: "OrderedDict[FrozenSet[int], _Feed]" = OrderedDict()
+        self._total_ids = 0
+        self._lock = threading.Lock()
+        indice.ao_aplicar(self._aplicado)
+
+    def __len__(self) -> int:
+        return len(self._feeds)
+
+    @property
+    def total_ids(self) -> int:
+        return self._total_ids
+
+    # ---------- consulta ----------
+    def pagina(self, db: Session, tag_ids: Iterable[int], depois_de: int = 0, limite: int = 50) -> Pagina:
+        """Página dos produtos compatíveis com o perfil, em ordem de id, depois do cursor."""
+        chave = frozenset(tag_ids)
+        versao = self._indice.versao(db)
+        with self._lock:
+            feed = self._feeds.get(chave)
+            if feed is not None and feed.versao == versao:
+                self._feeds.move_to_end(chave)
+                return self._cortar(feed, depois_de, limite)
+        feed = self._construir(db, chave)
+        with self._lock:
+            return self._cortar(feed, depois_de, limite)
+
+    @staticmethod
+    def _cortar(feed: _Feed, depois_de: int, limite: int) -> Pagina:
+        i = bisect_right(feed.ids, depois_de)
+        ids = feed.ids[i:i + limite + 1].tolist()
+        return Pagina(ids=ids[:limite], total=len(feed.ids), tem_mais=len(ids) > limite)
+
+    def _construir(self, db: Session, chave: FrozenSet[int]) -> _Feed:
+        versao, ids = self._indice.ativos_com_todas(db, chave)
+        feed = _Feed(chave, array("i", ids), versao)
+        with self._lock:
+            antigo = self._feeds.pop(chave, None)
+            if antigo is not None:
+                self._total_ids -= len(antigo.ids)
+            self._feeds[chave] = feed
+            self._total_ids += len(feed.ids)
+            self._despejar()
+        return feed
+
+    def _despejar(self) -> None:
+        # o recém-construído é o último: sai por último, mesmo sozinho acima do limite
+        while len(self._feeds) > 1 and (len(self._feeds) > self.max_perfis or self._total_ids > self.max_ids):
+            _, feed = self._feeds.popitem(last=False)
+            self._total_ids -= len(feed.ids)
+
+    # ---------- manutenção ----------
+    def _aplicado(self, versao: int, estados: Dict[int, Estado]) -> None:
+        """Ouvinte do índice de tags (depois do commit de uma escrita deste worker)."""
+        with self._lock:
+            if len(estados) > REFAZER_ACIMA:
+                self._feeds.clear()
+                self._total_ids = 0
+                return
+            for feed in self._feeds.values():
+                if feed.versao != versao - 1:
+                    continue  # já estava velha: refeita na leitura
+                antes = len(feed.ids)
+                feed.aplicar(estados)
+                feed.versao = versao
+                self._total_ids += len(feed.ids) - antes
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._feeds.clear()
+            self._total_ids = 0
+
+
+feeds = FeedsPorPerfil(indice_tags)
@@ -0,0 +1,142 @@
+# app/cache/principais.py
+"""
+Cache do usuário autenticado (principal) usado por get_current_user.
+
+Dois níveis, ambos LRU com limite de tamanho:
+
+- tokens: sha256(token) -> (user_id, exp). Evita refazer o decode/verificação
+  do JWT a cada request; a entrada nunca vive além do exp do próprio token.
+- principais: user_id -> Principal(id, role, merchant_id), com TTL. Evita o
+  SELECT em users a cada request.
+
+Principal é imutável e não é um objeto ORM; quem precisa do User completo
+carrega com dependencies.get_current_user_model. Quem altera role ou loja do
+usuário chama invalidar(user_id) depois do commit. Outros workers enxergam a
+mudança quando o TTL vence; require_merchant/require_admin não esperam: com o
+role errado, ou sem merchant_id nas rotas de lojista, releem do banco antes
+de responder.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Generic, Hashable, Optional, Tuple, TypeVar
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.modelos import models
+
+
+PRINCIPAL_TTL_SECONDS = 30.0
+MAX_PRINCIPAIS = 10_000
+MAX_TOKENS = 10_000
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    role: str
+    merchant_id: Optional[int] = None
+
+
+V = TypeVar("V")
+
+class LRUComTTL(Generic[V]):
+    """Dicionário LRU limitado em que cada entrada tem seu próprio vencimento."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[Hashable, Tuple[V, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: V, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+# ---------- tokens ----------
+_tokens: LRUComTTL[str] = LRUComTTL(MAX_TOKENS)
+
+def digest_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+def subject_do_token(token: str) -> Optional[str]:
+    return _tokens.get(digest_token(token))
+
+def guardar_token(token: str, subject: str, exp: Optional[float]) -> None:
+    """Guarda o subject do token até o exp dele (sem exp, usa o TTL do principal)."""
+    ttl = (exp - time.time()) if exp is not None else PRINCIPAL_TTL_SECONDS
+    _tokens.set(digest_token(token), subject, ttl)
+
+
+# ---------- principais ----------
+_principais: LRUComTTL[Principal] = LRUComTTL(MAX_PRINCIPAIS)
+
+def _consulta_principal(user_id: int):
+    return (
+        select(models.User.id, models.User.role, models.Merchant.id.label("merchant_id"))
+        .outerjoin(models.Merchant, models.Merchant.user_id == models.User.id)
+        .where(models.User.id == user_id)
+        .limit(1)
+    )
+
+def carregar(db: Session, user_id: int) -> Optional[Principal]:
+    """Lê do banco (ignorando o cache) e atualiza o cache. None se o usuário não existe."""
+    return _guardar(user_id, db.execute(_consulta_principal(user_id)).first())
+
+def _guardar(user_id: int, row) -> Optional[Principal]:
+    if row is None:
+        _principais.pop(user_id)
+        return None
+    principal = Principal(id=row.id, role=row.role or "client", merchant_id=row.merchant_id)
+    _principais.set(user_id, principal, PRINCIPAL_TTL_SECONDS)
+    return principal
+
+def obter(db: Session, user_id: int) -> Optional[Principal]:
+    principal = _principais.get(user_id)
+    if principal is not None:
+        return principal
+    return carregar(db, user_id)
+
+async def obter_async(db: AsyncSession, user_id: int) -> Optional[Principal]:
+    principal = _principais.get(user_id)
+    if principal is not None:
+        return principal
+    return _guardar(user_id, (await db.execute(_consulta_principal(user_id))).first())
+
+def invalidar(user_id: int) -> None:
+    _principais.pop(user_id)
+
+def limpar() -> None:
+    _principais.clear()
+    _tokens.clear()
@@ -0,0 +1,133 @@
+# app/cache/registro_tags.py
+"""
+Registro em memória das DietaryTags (code -> id/label).
+
+As tags são um vocabulário pequeno que quase não muda, então a tabela inteira
+fica num snapshot imutável por worker. A validade do snapshot é a versão
+"tags" de catalog_versions (ver app/query/versoes.py):
+
+- o próprio worker invalida na hora, depois do commit em tags.py;
+- os outros workers percebem pela versão no banco: resolver() confere a versão
+  a cada chamada (1 SELECT por PK em vez de 1 SELECT por code) e listar()
+  confere no máximo a cada CHECK_INTERVAL_SECONDS.
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.modelos import models
+from app.query import versoes
+
+
+CHECK_INTERVAL_SECONDS = 2.0
+
+
+@dataclass(frozen=True)
+class TagInfo:
+    id: int
+    code: str
+    label: str
+
+
+class TagNaoEncontrada(KeyError):
+    def __init__(self, code: str):
+        super().__init__(code)
+        self.code = code
+
+
+@dataclass(frozen=True)
+class _Snapshot:
+    version: int
+    tags: Tuple[TagInfo, ...]
+    by_code: Dict[str, TagInfo]
+    checked_at: float
+
+
+class RegistroTags:
+    def __init__(self, check_interval: float = CHECK_INTERVAL_SECONDS):
+        self.check_interval = check_interval
+        self._snapshot: Optional[_Snapshot] = None
+        self._lock = threading.Lock()
+
+    # ---------- leitura ----------
+    def listar(self, db: Session) -> List[TagInfo]:
+        return list(self._garantir(db, conferir_versao=False).tags)
+
+    def resolver(self, db: Session, codes: Iterable[str]) -> List[TagInfo]:
+        """
+        Resolve uma lista de codes de uma vez, na ordem dada e sem repetidos.
+        Levanta TagNaoEncontrada com o primeiro code desconhecido.
+        """
+        codes = list(dict.fromkeys(codes))
+        if not codes:
+            return []
+        snapshot = self._garantir(db, conferir_versao=True)
+        try:
+            return [snapshot.by_code[code] for code in codes]
+        except KeyError as exc:
+            raise TagNaoEncontrada(exc.args[0])
+
+    def por_code(self, db: Session) -> Dict[str, TagInfo]:
+        """Mapa code -> TagInfo com a versão conferida (para resolver muitos codes em lote)."""
+        return dict(self._garantir(db, conferir_versao=True).by_code)
+
+    async def listar_async(self, db: AsyncSession) -> List[TagInfo]:
+        """listar() para os handlers async (AsyncSession)."""
+        return list((await self._garantir_async(db)).tags)
+
+    async def listar_com_versao_async(self, db: AsyncSession) -> Tuple[int, List[TagInfo]]:
+        """Tags e a versão de catalog_versions a que elas correspondem (para ETag)."""
+        snapshot = await self._garantir_async(db)
+        return snapshot.version, list(snapshot.tags)
+
+    # ---------- invalidação ----------
+    def invalidar(self) -> None:
+        self._snapshot = None
+
+    # ---------- interno ----------
+    def _vencido(self, snapshot: _Snapshot) -> bool:
+        return time.monotonic() - snapshot.checked_at >= self.check_interval
+
+    def _renovar(self, snapshot: _Snapshot) -> _Snapshot:
+        renovado = _Snapshot(snapshot.version, snapshot.tags, snapshot.by_code, time.monotonic())
+        self._snapshot = renovado
+        return renovado
+
+    def _publicar(self, version: int, rows) -> _Snapshot:
+        tags = tuple(TagInfo(id=r.id, code=r.code, label=r.label) for r in rows)
+        snapshot = _Snapshot(version, tags, {t.code: t for t in tags}, time.monotonic())
+        with self._lock:
+            self._snapshot = snapshot
+        return snapshot
+
+    def _garantir(self, db: Session, conferir_versao: bool) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and not conferir_versao and not self._vencido(snapshot):
+            return snapshot
+        # versão lida antes das linhas: no pior caso o snapshot fica com versão
+        # mais velha que o conteúdo e é recarregado à toa na próxima conferência
+        version = versoes.ler(db, versoes.TAGS)
+        if snapshot is not None and version == snapshot.version:
+            return self._renovar(snapshot)
+        return self._publicar(version, db.execute(_consulta_tags()).all())
+
+    async def _garantir_async(self, db: AsyncSession) -> _Snapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and not self._vencido(snapshot):
+            return snapshot
+        version = await versoes.ler_async(db, versoes.TAGS)
+        if snapshot is not None and version == snapshot.version:
+            return self._renovar(snapshot)
+        rows = (await db.execute(_consulta_tags())).all()
+        return self._publicar(version, rows)
+
+
+def _consulta_tags():
+    return select(models.DietaryTag.id, models.DietaryTag.code, models.DietaryTag.label).order_by(models.DietaryTag.id)
+
+
+registro = RegistroTags()
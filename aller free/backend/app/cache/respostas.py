@@ -0,0 +1,79 @@
+# app/cache/respostas.py
+"""
+Cache HTTP condicional (ETag / If-None-Match) das leituras do catálogo.
+
+O ETag de cada resposta é montado só com contadores de catalog_versions
+(ver app/query/versoes.py), que os handlers de escrita incrementam na mesma
+transação da mudança. Então o handler lê as versões (um SELECT por PK), e:
+
+- se o cliente mandou o mesmo ETag em If-None-Match, responde 304 sem
+  carregar nada pelo ORM;
+- se este worker já tem o corpo daquele ETag para a mesma URL, devolve os
+  bytes prontos;
+- senão monta, serializa e guarda no LRU (limitado em entradas e tamanho).
+
+Como a versão muda junto com o dado, não há TTL: uma entrada velha só deixa
+de ser usada porque o ETag calculado já não bate com o dela.
+"""
+import os
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request, Response
+from app.cache.principais import LRUComTTL
+
+
+MAX_RESPOSTAS = int(os.getenv("RESPONSE_CACHE_ENTRIES", "2000"))
+MAX_CORPO_BYTES = 256 * 1024
+# max-age=0 + must-revalidate: o navegador guarda, mas pergunta sempre (e ganha 304)
+CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "public, max-age=0, must-revalidate")
+_SEM_VENCIMENTO = float("inf")
+
+
+@dataclass(frozen=True)
+class Resposta:
+    etag: str
+    corpo: bytes
+
+
+_respostas: LRUComTTL[Resposta] = LRUComTTL(MAX_RESPOSTAS)
+
+
+def etag(*partes) -> str:
+    """ETag forte a partir das versões, ex.: etag("p", 12, 3, 7) -> '"p-12-3-7"'."""
+    return '"' + "-".join(str(p) for p in partes) + '"'
+
+def casa(if_none_match: Optional[str], atual: str) -> bool:
+    """Comparação fraca do If-None-Match (RFC 9110): ignora o prefixo W/."""
+    if not if_none_match:
+        return False
+    for candidato in if_none_match.split(","):
+        candidato = candidato.strip()
+        if candidato == "*" or candidato.removeprefix("W/") == atual:
+            return True
+    return False
+
+def _headers(atual: str) -> dict:
+    return {"ETag": atual, "Cache-Control": CACHE_CONTROL}
+
+async def servir(request: Request, atual: str, montar: Callable[[], Awaitable[bytes]]) -> Response:
+    """
+    Responde 304, o corpo já pronto do cache ou o corpo novo de montar()
+    (que pode levantar HTTPException, ex.: 404, e aí nada é guardado).
+    """
+    headers = _headers(atual)
+    if casa(request.headers.get("if-none-match"), atual):
+        return Response(status_code=304, headers=headers)
+
+    chave = request.url.path + "?" + request.url.query
+    guardada = _respostas.get(chave)
+    if guardada is not None and guardada.etag == atual:
+        return Response(guardada.corpo, media_type="application/json", headers=headers)
+
+    corpo = await montar()
+    if len(corpo) <= MAX_CORPO_BYTES:
+        _respostas.set(chave, Resposta(atual, corpo), _SEM_VENCIMENTO)
+    return Response(corpo, media_type="application/json", headers=headers)
+
+def limpar() -> None:
+    _respostas.clear()
@@ -0,0 +1,418 @@
+# app/cache/sugestoes.py
+"""
+Autocomplete da busca (GET /products/suggest): índice de prefixos em memória
+sobre os nomes de produto e os labels das DietaryTags.
+
+Normalização: minúsculas, sem acento, letras/dígitos separados por um espaço
+("Pão-de-Queijo" -> "pao de queijo"), a mesma para o índice e para o prefixo.
+
+Nomes: cada nome normalizado distinto é um termo, com peso = quantos produtos
+ativos têm esse nome (a popularidade que o banco conhece). O termo entra uma
+vez por início de palavra ("pao de queijo", "de queijo", "queijo"), então
+"quei" também sugere "Pão de queijo".
+
+A trie é achatada num array ordenado de chaves: tudo que começa com um
+prefixo é uma faixa contígua, achada com bisect, sem um dict por nó. Nos
+prefixos cuja faixa passa de LIMITE_FAIXA chaves (as primeiras letras, que
+casam com boa parte do catálogo) os TOPO_M termos mais pesados ficam
+pré-calculados em `topo`; nos outros a faixa é varrida, e por construção é
+curta. Uma consulta é então um dict lookup ou uma varredura de no máximo
+LIMITE_FAIXA chaves.
+
+Tags: são poucas, então os labels (do registro_tags, sempre atuais) são
+conferidos um a um; o peso é o número de produtos com a tag, contado na
+construção do índice.
+
+Memória: no máximo MAX_TERMOS termos (os mais populares; os demais entram na
+próxima construção se subirem), umas 3 chaves por termo, e um int por id de
+produto (produto -> termo, para descontar o peso antigo quando o produto
+muda). Números de 1M produtos: `python -m benchmark caches 1m sugestoes`.
+
+Atualização: as escritas de produto chamam registrar() antes do commit (lê
+nome/active dos afetados e incrementa a versão "suggest") e .aplicar()
+depois; o worker que escreveu ajusta os pesos e o topo na hora. Os outros
+percebem a versão nova (conferida a cada CHECK_INTERVAL_SECONDS) e
+reconstroem numa thread, no máximo a cada REBUILD_MIN_INTERVAL_SECONDS,
+servindo o índice anterior enquanto isso: sugestão de alguns segundos atrás
+não atrapalha ninguém.
+"""
+import heapq
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.modelos import models
+from app.query import versoes
+from app.cache.registro_tags import registro as registro_tags
+
+
+CHECK_INTERVAL_SECONDS = 2.0
+REBUILD_MIN_INTERVAL_SECONDS = float(os.getenv("SUGGEST_REBUILD_INTERVAL", "30"))
+MAX_TERMOS = int(os.getenv("SUGGEST_MAX_TERMS", "200000"))
+MAX_SUGESTOES = 20
+TOPO_M = 2 * MAX_SUGESTOES   # folga: um termo que cai no topo não obriga recalcular
+LIMITE_FAIXA = 256
+LOTE_LEITURA = 20_000
+_FIM = "\U0010ffff"          # maior que qualquer caractere: fim da faixa de um prefixo
+
+_SEPARADOR = re.compile(r"[\W_]+")
+_PALAVRA = re.compile(r"\S+")
+
+
+# ---------- normalização ----------
+def normalizar(texto: str) -> str:
+    texto = texto.lower()
+    if not texto.isascii():
+        texto = "".join(c for c in unicodedata.normalize("NFKD", texto) if not unicodedata.combining(c))
+    return _SEPARADOR.sub(" ", texto).strip()
+
+def _inicios(norma: str) -> List[str]:
+    """Chaves do termo: o texto a partir de cada início de palavra."""
+    return list(dict.fromkeys(norma[m.start():] for m in _PALAVRA.finditer(norma)))
+
+
+# ---------- topo pré-calculado de um prefixo ----------
+# ordem das sugestões: chave (-peso, nome normalizado), crescente. O desempate
+# pelo nome (e não pelo número do termo) faz o índice ajustado aos poucos e o
+# reconstruído do zero darem exatamente a mesma resposta
+Ordem = Callable[[int], Tuple[int, str]]
+
+class _Topo:
+    """Os TOPO_M melhores termos da faixa, em ordem."""
+
+    __slots__ = ("ids", "completo")
+
+    def __init__(self, ids: List[int], completo: bool):
+        self.ids = ids
+        self.completo = completo  # a lista tem todos os termos da faixa com peso > 0
+
+    def atualizar(self, termo: int, chave_antes: Tuple[int, str], ordem: Ordem) -> bool:
+        """Ajusta depois que o peso de `termo` mudou. False = não dá mais para confiar, descartar."""
+        ids, chave = self.ids, ordem(termo)
+        if termo in ids:
+            # quem não está na lista vem depois do último (como ele era antes da mudança)
+            ultimo = chave_antes if ids[-1] == termo else ordem(ids[-1])
+            if chave[0] >= 0 or (chave > ultimo and not self.completo):
+                ids.remove(termo)
+                if not self.completo and len(ids) < MAX_SUGESTOES:
+                    return False
+        elif chave[0] < 0 and (self.completo or chave < ordem(ids[-1])):
+            ids.append(termo)
+        else:
+            return True
+        ids.sort(key=ordem)
+        if len(ids) > TOPO_M:
+            del ids[TOPO_M:]
+            self.completo = False
+        return True
+
+def _melhores(termos: Iterable[int], pesos: array, ordem: Ordem, n: int) -> List[int]:
+    """Os n primeiros termos na ordem (sem repetir, só peso > 0)."""
+    return heapq.nsmallest(n, {t for t in termos if pesos[t] > 0}, key=ordem)
+
+
+# ---------- índice ----------
+class _Arvore:
+    def __init__(self, versao: int):
+        self.versao = versao
+        self.construida_em = time.monotonic()
+        self.chaves: List[str] = []       # ordenadas
+        self.alvos = array("i")           # termo de cada chave
+        self.textos: List[str] = []       # termo -> nome exibido
+        self.normas: List[str] = []       # termo -> nome normalizado
+        self.pesos = array("i")           # termo -> produtos ativos com o nome
+        self.por_norma: Dict[str, int] = {}
+        self.produto_termo = array("i")   # product id -> termo (-1: inativo/sem termo)
+        self.topo: Dict[str, _Topo] = {}
+        self.pesos_tags: Dict[int, int] = {}
+
+    def tamanho(self) -> int:
+        """Bytes aproximados das estruturas (as strings contam uma vez por lista)."""
+        total = sum(sys.getsizeof(x) for x in (
+            self.chaves, self.alvos, self.textos, self.normas, self.pesos,
+            self.por_norma, self.produto_termo, self.topo, self.pesos_tags,
+        ))
+        total += sum(sys.getsizeof(x) for lista in (self.chaves, self.textos, self.normas) for x in lista)
+        total += sum(sys.getsizeof(t.ids) for t in self.topo.values())
+        return total
+
+    def ordem(self, t: int) -> Tuple[int, str]:
+        return -self.pesos[t], self.normas[t]
+
+    # ---------- consulta ----------
+    def buscar(self, p: str, n: int) -> List[Tuple[str, int]]:
+        topo = self.topo.get(p)
+        if topo is not None:
+            ids = topo.ids
+        else:
+            lo = bisect_left(self.chaves, p)
+            hi = bisect_left(self.chaves, p + _FIM, lo)
+            if hi - lo > LIMITE_FAIXA:
+                # faixa cresceu com as escritas (ou o topo foi descartado): calcula uma vez
+                topo = self.topo[p] = self._calcular_topo(lo, hi)
+                ids = topo.ids
+            else:
+                ids = _melhores(self.alvos[lo:hi], self.pesos, self.ordem, n)
+        return [(self.textos[t], self.pesos[t]) for t in ids[:n]]
+
+    # ---------- escrita ----------
+    def termo(self, norma: str, texto: str) -> int:
+        """Índice do termo, criado (com peso 0) se não existir. -1 se o limite de termos foi atingido."""
+        t = self.por_norma.get(norma)
+        if t is not None:
+            return t
+        if len(self.textos) >= MAX_TERMOS:
+            return -1
+        t = len(self.textos)
+        self.por_norma[norma] = t
+        self.textos.append(texto)
+        self.normas.append(norma)
+        self.pesos.append(0)
+        for chave in _inicios(norma):
+            pos = bisect_left(self.chaves, chave)
+            self.chaves.insert(pos, chave)
+            self.alvos.insert(pos, t)
+        return t
+
+    def ajustar(self, t: int, delta: int) -> None:
+        antes = self.ordem(t)
+        self.pesos[t] += delta
+        vistos = set()
+        for chave in _inicios(self.normas[t]):
+            for tamanho in range(1, len(chave) + 1):
+                p = chave[:tamanho]
+                if p in vistos:
+                    continue
+                vistos.add(p)
+                topo = self.topo.get(p)
+                if topo is not None and not topo.atualizar(t, antes, self.ordem):
+                    del self.topo[p]
+
+    def definir_produto(self, product_id: int, t: int) -> None:
+        falta = product_id + 1 - len(self.produto_termo)
+        if falta > 0:
+            self.produto_termo.extend(array("i", [-1]) * falta)
+        self.produto_termo[product_id] = t
+
+    def termo_do_produto(self, product_id: int) -> int:
+        return self.produto_termo[product_id] if product_id < len(self.produto_termo) else -1
+
+    # ---------- construção ----------
+    def _calcular_topo(self, lo: int, hi: int) -> _Topo:
+        ids = _melhores(self.alvos[lo:hi], self.pesos, self.ordem, TOPO_M + 1)
+        completo = len(ids) <= TOPO_M
+        return _Topo(ids[:TOPO_M], completo)
+
+    def calcular_topos(self) -> None:
+        """Topo de todo prefixo cuja faixa passa de LIMITE_FAIXA (desce só pelas faixas grandes)."""
+        chaves = self.chaves
+        pendentes = [("", 0, len(chaves))]
+        while pendentes:
+            prefixo, lo, hi = pendentes.pop()
+            tamanho = len(prefixo) + 1
+            i = lo
+            while i < hi:
+                if len(chaves[i]) < tamanho:  # a própria chave == prefixo
+                    i += 1
+                    continue
+                p = chaves[i][:tamanho]
+                j = bisect_left(chaves, p + _FIM, i, hi)
+                if j - i > LIMITE_FAIXA:
+                    self.topo[p] = self._calcular_topo(i, j)
+                    pendentes.append((p, i, j))
+                i = j
+
+
+def _construir(db: Session, versao: int) -> _Arvore:
+    # Core na Connection: sem o custo do ORM por linha (1M linhas)
+    conn = db.connection()
+    cols = models.Product.__table__.c
+    arvore = _Arvore(versao)
+
+    # nome normalizado de cada produto ativo (ids provisórios por nome)
+    provisorio: Dict[str, int] = {}
+    contagem: List[int] = []
+    exibido: List[str] = []
+    normas_vistas: Dict[str, str] = {}
+    maior_id = conn.execute(select(func.max(cols.id))).scalar() or 0
+    produto_provisorio = array("i", [-1]) * (maior_id + 1)
+    ativos = select(cols.id, cols.name).where(cols.active.is_(True)).execution_options(yield_per=LOTE_LEITURA)
+    for bloco in conn.execute(ativos).partitions():
+        for pid, name in bloco:
+            norma = normas_vistas.get(name)
+            if norma is None:
+                norma = normas_vistas[name] = normalizar(name or "")
+            if not norma:
+                continue
+            k = provisorio.get(norma)
+            if k is None:
+                k = provisorio[norma] = len(contagem)
+                contagem.append(0)
+                exibido.append(name)
+            contagem[k] += 1
+            produto_provisorio[pid] = k
+    del normas_vistas
+
+    # os MAX_TERMOS mais populares viram termos
+    mantidos = range(len(contagem))
+    if len(contagem) > MAX_TERMOS:
+        mantidos = sorted(heapq.nlargest(MAX_TERMOS, mantidos, key=contagem.__getitem__))
+    normas = list(provisorio)
+    # provisório -> termo; a posição extra no fim faz o -1 (sem termo) continuar -1
+    final = array("i", [-1]) * (len(contagem) + 1)
+    for k in mantidos:
+        final[k] = len(arvore.textos)
+        arvore.por_norma[normas[k]] = final[k]
+        arvore.textos.append(exibido[k])
+        arvore.normas.append(normas[k])
+        arvore.pesos.append(contagem[k])
+    arvore.produto_termo = array("i", map(final.__getitem__, produto_provisorio))
+
+    pares = sorted((chave, t) for t, norma in enumerate(arvore.normas) for chave in _inicios(norma))
+    arvore.chaves = [chave for chave, _ in pares]
+    arvore.alvos = array("i", (t for _, t in pares))
+    arvore.calcular_topos()
+
+    pt = models.product_tag_table
+    arvore.pesos_tags = dict(conn.execute(select(pt.c.tag_id, func.count()).group_by(pt.c.tag_id)).all())
+    return arvore
+
+
+# ---------- serviço ----------
+class IndiceSugestoes:
+    def __init__(self, check_interval: float = CHECK_INTERVAL_SECONDS):
+        self.check_interval = check_interval
+        self._arvore: Optional[_Arvore] = None
+        self._conferido_em = 0.0
+        self._construindo = False
+        self._lock = threading.Lock()          # consulta x ajuste incremental
+        self._lock_build = threading.Lock()    # uma construção por vez
+        self._normas_tags: Dict[str, str] = {}
+
+    # ---------- consulta ----------
+    async def sugerir_async(self, db: AsyncSession, prefixo: str, limite: int = 10) -> List[Dict[str, Any]]:
+        """Até `limite` sugestões (nomes e tags) para o prefixo, da mais popular para a menos."""
+        p = normalizar(prefixo)
+        if not p:
+            return []
+        arvore = await self._garantir_async(db)
+        tags = await registro_tags.listar_async(db)
+        with self._lock:
+            produtos = arvore.buscar(p, limite)
+        sugestoes = [{"text": texto, "kind": "product", "tag": None, "weight": peso} for texto, peso in produtos]
+        for tag in tags:
+            if any(chave.startswith(p) for chave in _inicios(self._norma_tag(tag.label))):
+                sugestoes.append({"text": tag.label, "kind": "tag", "tag": tag.code, "weight": arvore.pesos_tags.get(tag.id, 0)})
+        if len(sugestoes) > len(produtos):
+            sugestoes.sort(key=lambda s: s["weight"], reverse=True)
+        return sugestoes[:limite]
+
+    def _norma_tag(self, label: str) -> str:
+        norma = self._normas_tags.get(label)
+        if norma is None:
+            norma = self._normas_tags[label] = normalizar(label)
+        return norma
+
+    # ---------- escrita ----------
+    def registrar(self, db: Session, product_ids: Iterable[int]) -> "Pendente":
+        """
+        Chamado pela escrita ANTES do commit: incrementa a versão "suggest" e lê
+        nome/active dos produtos afetados na mesma transação. Depois do commit,
+        chamar .aplicar() no retorno.
+        """
+        ids = list(dict.fromkeys(product_ids))
+        db.flush()
+        versao = versoes.bump(db, versoes.SUGESTOES)[0]
+        estados: Dict[int, Optional[Tuple[str, bool]]] = {pid: None for pid in ids}
+        if ids:
+            Product = models.Product
+            for pid, name, active in db.execute(select(Product.id, Product.name, Product.active).where(Product.id.in_(ids))):
+                estados[pid] = (name, bool(active))
+        return Pendente(self, versao, estados)
+
+    def _aplicar(self, versao: int, estados: Dict[int, Optional[Tuple[str, bool]]]) -> None:
+        with self._lock:
+            arvore = self._arvore
+            if arvore is None:
+                return
+            for pid, estado in estados.items():
+                novo = -1
+                if estado is not None and estado[1]:
+                    norma = normalizar(estado[0] or "")
+                    if norma:
+                        novo = arvore.termo(norma, estado[0])
+                antigo = arvore.termo_do_produto(pid)
+                if novo == antigo:
+                    continue
+                if antigo >= 0:
+                    arvore.ajustar(antigo, -1)
+                if novo >= 0:
+                    arvore.ajustar(novo, +1)
+                arvore.definir_produto(pid, novo)
+            # outro worker escreveu no meio: a versão fica para trás e a
+            # reconstrução em segundo plano traz o que falta
+            if arvore.versao == versao - 1:
+                arvore.versao = versao
+
+    # ---------- construção ----------
+    def aquecer(self) -> None:
+        """Constrói o índice no startup, para o primeiro request não pagar."""
+        self._construir_agora()
+
+    async def _garantir_async(self, db: AsyncSession) -> _Arvore:
+        arvore = self._arvore
+        agora = time.monotonic()
+        if arvore is not None and agora - self._conferido_em < self.check_interval:
+            return arvore
+        versao = await versoes.ler_async(db, versoes.SUGESTOES)
+        self._conferido_em = agora
+        if arvore is None:
+            return await run_in_threadpool(self._construir_agora)
+        if versao != arvore.versao:
+            self._reconstruir_em_segundo_plano(arvore)
+        return arvore
+
+    def _reconstruir_em_segundo_plano(self, arvore: _Arvore) -> None:
+        if self._construindo or time.monotonic() - arvore.construida_em < REBUILD_MIN_INTERVAL_SECONDS:
+            return
+        self._construindo = True
+        threading.Thread(target=self._construir_agora, name="sugestoes", daemon=True).start()
+
+    def _construir_agora(self) -> _Arvore:
+        from app.query.database import ReadSessionLocal
+        with self._lock_build:
+            db = ReadSessionLocal()
+            try:
+                # versão lida antes das linhas (mesma transação de leitura): no pior
+                # caso o índice fica com versão mais velha que o conteúdo e é
+                # reconstruído à toa
+                arvore = _construir(db, versoes.ler(db, versoes.SUGESTOES))
+            finally:
+                db.close()
+                self._construindo = False
+            with self._lock:
+                self._arvore = arvore
+            return arvore
+
+
+class Pendente:
+    """Mudança registrada antes do commit; aplicar() depois que o commit passar."""
+
+    def __init__(self, indice: IndiceSugestoes, versao: int, estados: Dict[int, Optional[Tuple[str, bool]]]):
+        self.indice, self.versao, self.estados = indice, versao, estados
+
+    def aplicar(self) -> None:
+        self.indice._aplicar(self.versao, self.estados)
+
+
+indice = IndiceSugestoes()
@@ -1,23 +1,21 @@
-from typing import Generator
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from jose import JWTError, jwt
-from app.query.database import SessionLocal
+from app.query.database import get_async_read_db, get_read_db, get_write_db
 from app.modelos import models
 from app.autenticacao import auth
+from app.cache import principais
+from app.cache.principais import Principal
 
 
 # === Security scheme para o Swagger e extração do header Authorization ===
 bearer_scheme = HTTPBearer(auto_error=True)  # faz o Swagger mostrar UM campo "Authorize"
 
 # === DB session dependency ===
-def get_db() -> Generator[Session, None, None]:
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# get_read_db/get_write_db vêm de app.query.database: usar o MESMO callable dos
+# endpoints faz o FastAPI reaproveitar a sessão do request
 
 # === Helpers para token decode ===
 def _decode_token_return_payload(token: str) -> dict:
@@ -31,38 +29,98 @@ def _decode_token_return_payload(token: str) -> dict:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+def _subject_do_token(token: str) -> str:
+    # decode do JWT só na primeira vez que o token aparece (cache por digest até o exp)
+    user_id = principais.subject_do_token(token)
+    if user_id is not None:
+        return user_id
+    payload = _decode_token_return_payload(token)
+    user_id = payload.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token sem subject")
+    principais.guardar_token(token, str(user_id), payload.get("exp"))
+    return str(user_id)
+
+def _user_pk(credentials: HTTPAuthorizationCredentials) -> int:
+    raw = credentials.credentials or ""
+    token = raw.split()[-1] if raw.lower().startswith("bearer") else raw
+
+    user_id = _subject_do_token(token)
+    try:
+        return int(user_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuário não encontrado")
+
 # === Dependências de autenticação que seus endpoints devem usar ===
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
-    db: Session = Depends(get_db),
-) -> models.User:
+    db: Session = Depends(get_read_db),
+) -> Principal:
     """
-    Extrai o token do header Authorization (Bearer ...) e devolve o User do DB.
+    Extrai o token do header Authorization (Bearer ...) e devolve o Principal
+    (id, role, merchant_id) do usuário, servido do cache quando possível.
     Aceita tanto "Bearer <token>" quanto apenas "<token>" (por precaução).
     """
-    raw = credentials.credentials or ""
-    token = raw.split()[-1] if raw.lower().startswith("bearer") else raw
+    principal = principais.obter(db, _user_pk(credentials))
+    db.close()  # não segura conexão de leitura entre as etapas do request (ver get_read_db)
+    if not principal:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuário não encontrado")
 
-    payload = _decode_token_return_payload(token)
-    user_id = payload.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token sem subject")
+    return principal
 
-    try:
-        user_pk = int(user_id)
-    except Exception:
-        user_pk = user_id
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(bearer_scheme),
+    db: AsyncSession = Depends(get_async_read_db),
+) -> Principal:
+    """
+    get_current_user para handlers "async def": não passa pelo threadpool.
+    """
+    principal = await principais.obter_async(db, _user_pk(credentials))
+    if not principal:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuário não encontrado")
 
-    user = db.query(models.User).filter(models.User.id == user_pk).first()
+    return principal
+
+def get_current_user_model(
+    current_user: Principal = Depends(get_current_user),
+    db: Session = Depends(get_write_db),
+) -> models.User:
+    """
+    Para endpoints que precisam do User completo (ORM) e não só do Principal.
+    """
+    user = db.get(models.User, current_user.id)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Usuário não encontrado")
-
     return user
 
-def require_merchant(current_user: models.User = Depends(get_current_user)) -> models.User:
+def _exigir_role(role: str, current_user: Principal, db: Session, com_loja: bool = False) -> Principal | None:
+    if current_user.role == role and (current_user.merchant_id is not None or not com_loja):
+        return current_user
+    # antes de negar (ou de seguir sem loja), confere no banco: o cache deste
+    # worker pode ser anterior a uma promoção ou a uma loja criada em outro
+    # worker (create_merchant). Role e loja só mudam nesse sentido (loja não
+    # troca de dono nem é apagada), então o que já está no cache vale
+    fresh = principais.carregar(db, current_user.id)
+    db.close()
+    if fresh is not None and fresh.role == role:
+        return fresh
+    return None
+
+def require_merchant(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_read_db)) -> Principal:
     """
-    Garante que o usuário autenticado seja 'merchant'.
+    Garante que o usuário autenticado seja 'merchant'. O merchant_id devolvido
+    é o do banco se o cache ainda não conhecia a loja.
     """
-    if getattr(current_user, "role", None) != "merchant":
+    principal = _exigir_role("merchant", current_user, db, com_loja=True)
+    if principal is None:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso restrito a lojistas")
-    return current_user
+    return principal
+
+def require_admin(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_read_db)) -> Principal:
+    """
+    Garante que o usuário autenticado seja 'admin'.
+    """
+    principal = _exigir_role("admin", current_user, db)
+    if principal is None:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso restrito a administradores")
+    return principal
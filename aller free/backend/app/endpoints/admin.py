@@ -0,0 +1,151 @@
+# endpoints/admin.py
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from app.modelos import models
+from app.esquemas import schemas
+from app.query.database import get_async_read_db, get_write_db
+from app.query import contadores, eventos, outbox
+from app.cache.registro_tags import registro as registro_tags
+from app.dependencias.dependencies import require_admin, Principal
+
+
+# painel do admin (dashboard/admin_dashboard.html): fila de verificação de
+# lojas e números do catálogo, lidos de admin_counters (ver app/query/contadores.py)
+router = APIRouter(tags=["admin"], default_response_class=ORJSONResponse)
+
+_lojas = models.Merchant.__table__
+
+# ---------- fila de verificação ----------
+@router.get("/lojistas/unverified", response_model=list[schemas.MerchantQueueItem])
+async def unverified_merchants(
+    response: Response,
+    after: Optional[int] = Query(None, ge=0, description="Último id da página anterior (header X-Next-After)"),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_read_db),
+    _admin: Principal = Depends(require_admin),
+):
+    """
+    Lojas ainda não verificadas, por ordem de cadastro (índice verified, id).
+    A resposta é a lista, como o painel espera; havendo mais, o header
+    X-Next-After traz o valor de `after` da próxima página.
+    """
+    stmt = (
+        select(_lojas.c.id, _lojas.c.user_id, _lojas.c.store_name)
+        .where(_lojas.c.verified.is_(False))
+        .order_by(_lojas.c.id)
+        .limit(limit + 1)
+    )
+    if after is not None:
+        stmt = stmt.where(_lojas.c.id > after)
+    rows = (await db.execute(stmt)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-After"] = str(rows[-1].id)
+    return [row._asdict() for row in rows]
+
+def _verificar(db: Session, ids: list[int]) -> schemas.VerifyReport:
+    """Marca as lojas dadas como verificadas num UPDATE só; contadores e eventos na mesma transação."""
+    existentes = set(db.execute(select(_lojas.c.id).where(_lojas.c.id.in_(ids))).scalars())
+    verificadas = db.execute(
+        update(_lojas)
+        .where(_lojas.c.id.in_(ids), _lojas.c.verified.is_(False))
+        .values(verified=True)
+        .returning(_lojas.c.id, _lojas.c.store_name, _lojas.c.verified)
+    ).all()
+    if verificadas:
+        contadores.lojas_verificadas(db, len(verificadas))
+        eventos.lojas(db, eventos.LOJA_VERIFICADA, verificadas)
+    db.commit()
+    novas = {row.id for row in verificadas}
+    return schemas.VerifyReport(
+        verified=sorted(novas),
+        already_verified=sorted(existentes - novas),
+        not_found=sorted(set(ids) - existentes),
+    )
+
+@router.patch("/lojistas/verify/{merchant_id}", response_model=schemas.MerchantOut)
+def verify_merchant(merchant_id: int, db: Session = Depends(get_write_db), _admin: Principal = Depends(require_admin)):
+    """Verifica uma loja. Verificar de novo não muda nada (200)."""
+    # lida antes do commit de _verificar, na mesma transação: depois dele um
+    # db.get abriria outro BEGIN IMMEDIATE só para montar a resposta
+    loja = db.execute(select(_lojas).where(_lojas.c.id == merchant_id)).one_or_none()
+    if loja is None:
+        raise HTTPException(status_code=404, detail="Merchant não encontrado")
+    _verificar(db, [merchant_id])
+    db.close()
+    return {**loja._asdict(), "verified": True}
+
+@router.post("/lojistas/verify", response_model=schemas.VerifyReport)
+def verify_merchants(payload: schemas.VerifyRequest, db: Session = Depends(get_write_db), _admin: Principal = Depends(require_admin)):
+    """Verifica várias lojas numa transação; ids inexistentes ou já verificados voltam no relatório."""
+    relatorio = _verificar(db, list(dict.fromkeys(payload.ids)))
+    db.close()
+    return relatorio
+
+# ---------- números do painel ----------
+@router.get("/admin/stats", response_model=schemas.AdminStats)
+async def admin_stats(db: AsyncSession = Depends(get_async_read_db), _admin: Principal = Depends(require_admin)):
+    nomes = [contadores.usuarios(p) for p in contadores.PAPEIS]
+    nomes += [contadores.LOJAS_VERIFICADAS, contadores.LOJAS_PENDENTES, contadores.PRODUTOS_ATIVOS]
+    globais = await contadores.ler_async(db, nomes)
+    por_tag = await contadores.por_ref_async(db, contadores.ATIVOS_POR_TAG)
+    tags = await registro_tags.listar_async(db)
+    return {
+        "users": {p: globais[contadores.usuarios(p)] for p in contadores.PAPEIS},
+        "merchants": {
+            "verified": globais[contadores.LOJAS_VERIFICADAS],
+            "unverified": globais[contadores.LOJAS_PENDENTES],
+        },
+        "active_products": globais[contadores.PRODUTOS_ATIVOS],
+        "tags": [
+            {"id": t.id, "code": t.code, "label": t.label, "active_products": por_tag.get(t.id, 0)}
+            for t in tags
+        ],
+    }
+
+@router.get("/admin/stats/merchants", response_model=list[schemas.MerchantStat])
+async def admin_stats_merchants(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_read_db),
+    _admin: Principal = Depends(require_admin),
+):
+    """Lojas com mais produtos ativos primeiro (só as que têm algum)."""
+    maiores = await contadores.maiores_async(db, contadores.ATIVOS_POR_LOJA, limit, offset)
+    lojas = {
+        row.id: row
+        for row in await db.execute(
+            select(_lojas.c.id, _lojas.c.store_name, _lojas.c.verified)
+            .where(_lojas.c.id.in_([merchant_id for merchant_id, _ in maiores]))
+        )
+    }
+    return [
+        {
+            "merchant_id": merchant_id,
+            "store_name": lojas[merchant_id].store_name if merchant_id in lojas else None,
+            "verified": bool(lojas[merchant_id].verified) if merchant_id in lojas else False,
+            "active_products": n,
+        }
+        for merchant_id, n in maiores
+    ]
+
+# ---------- outbox ----------
+@router.get("/admin/outbox", response_model=schemas.OutboxStatus)
+async def admin_outbox(
+    dead_limit: int = Query(20, ge=0, le=200),
+    db: AsyncSession = Depends(get_async_read_db),
+    _admin: Principal = Depends(require_admin),
+):
+    """Fila do outbox por tópico (pendentes, mortas, atraso) e as últimas mensagens dead com o erro."""
+    por_topico = await outbox.situacao_async(db)
+    return {
+        "topics": [
+            {"topic": topico, "pending": s.pendentes, "dead": s.mortas, "lag_seconds": round(s.atraso(), 3)}
+            for topico, s in sorted(por_topico.items())
+        ],
+        "dead": [row._asdict() for row in await outbox.mortas_async(db, dead_limit)] if dead_limit else [],
+    }
@@ -0,0 +1,92 @@
+# endpoints/carrinho.py
+from dataclasses import asdict
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.esquemas import schemas, serializacao
+from app.query import pedidos
+from app.query.database import get_async_read_db
+from app.cache.carrinhos import carrinhos, Carrinho, ErroCarrinho
+from app.dependencias.dependencies import get_current_user_async, Principal
+
+
+# rotas usadas por cadastros/usuarios/cart.html. O carrinho vive em memória e é
+# gravado em lotes (ver app/cache/carrinhos.py): nenhuma delas abre transação,
+# só o checkout
+router = APIRouter(prefix="/api", tags=["cart"], default_response_class=ORJSONResponse)
+
+# helper: formato de schemas.CartOut
+def _carrinho(carrinho: Carrinho) -> dict:
+    itens = [
+        {"id": i.product_id, "name": i.name, "price": i.unit_price, "quantity": i.quantity,
+         "subtotal": round(i.unit_price * i.quantity, 2)}
+        for i in carrinho.itens.values()
+    ]
+    return {"success": True, "items": itens, "total": carrinho.total, "version": carrinho.versao}
+
+def _erro(exc: ErroCarrinho) -> HTTPException:
+    return HTTPException(status_code=exc.status, detail=str(exc))
+
+@router.get("/cart", response_model=schemas.CartOut)
+async def get_cart(db: AsyncSession = Depends(get_async_read_db), current_user: Principal = Depends(get_current_user_async)):
+    return serializacao.resposta(_carrinho(await carrinhos.obter(db, current_user.id)))
+
+@router.post("/cart/add", response_model=schemas.CartOut)
+async def add_to_cart(
+    payload: schemas.CartAdd,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    try:
+        carrinho = await carrinhos.adicionar(db, current_user.id, payload.product_id, payload.quantity)
+    except ErroCarrinho as exc:
+        raise _erro(exc)
+    return serializacao.resposta(_carrinho(carrinho))
+
+@router.delete("/cart/remove/{product_id}", response_model=schemas.CartOut)
+async def remove_from_cart(
+    product_id: int,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    try:
+        carrinho = await carrinhos.remover(db, current_user.id, product_id)
+    except ErroCarrinho as exc:
+        raise _erro(exc)
+    return serializacao.resposta(_carrinho(carrinho))
+
+@router.post("/checkout", response_model=schemas.CheckoutOut, status_code=201)
+async def checkout(
+    payload: Optional[schemas.CheckoutRequest] = None,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: Principal = Depends(get_current_user_async),
+):
+    """
+    Fecha o pedido com os itens do carrinho. Preço e disponibilidade de todos
+    os itens são conferidos numa consulta só, na transação do pedido. 409 com
+    success=false quando algo mudou (o carrinho da resposta já vem corrigido):
+    o cliente confere e manda o checkout de novo.
+    """
+    versao = payload.version if payload is not None else None
+    try:
+        pedido = await carrinhos.fechar(db, current_user.id, versao)
+    except ErroCarrinho as exc:
+        if exc.status != 409:
+            raise _erro(exc)
+        conflito = {"detail": str(exc)}
+    except pedidos.ItensDivergentes as exc:
+        conflito = {
+            "detail": "Preço ou disponibilidade de itens mudou",
+            "changes": [
+                {k: v for k, v in asdict(d).items() if k != "name"} for d in exc.divergencias
+            ],
+        }
+    except pedidos.CarrinhoMudou:
+        conflito = {"detail": "O carrinho mudou; confira os itens"}
+    else:
+        return serializacao.resposta(
+            {"success": True, "order_id": pedido.order_id, "total": pedido.total}, status_code=201
+        )
+    carrinho = await carrinhos.obter(db, current_user.id)
+    return serializacao.resposta({"success": False, "changes": [], **conflito, "cart": _carrinho(carrinho)}, status_code=409)
@@ -0,0 +1,42 @@
+from typing import List, Optional
+from fastapi import APIRouter, Query, WebSocket, status
+from app.query.database import AsyncReadSessionLocal
+from app.cache.canal import canal, Filtro
+from app.cache.registro_tags import registro as registro_tags
+
+
+router = APIRouter(tags=["events"])
+
+# ---------- feed de mudanças do catálogo (ver app/cache/canal.py) ----------
+@router.websocket("/ws/catalog")
+async def catalog_feed(
+    websocket: WebSocket,
+    since: Optional[int] = Query(None, ge=0, description="Último seq recebido: repõe só o que faltou"),
+    merchant: List[int] = Query([], description="Só eventos destas lojas"),
+    tag: List[str] = Query([], description="Só eventos de produtos com estas tags (code)"),
+):
+    """
+    Empurra os eventos do catálogo (product.*, products.bulk, tag.*,
+    merchant.*) como frames JSON com seq. Sem filtro recebe tudo; com
+    merchant/tag, o que casar com qualquer um deles (eventos de tag vão
+    para todos). O cliente guarda o último seq e reconecta com ?since=.
+    """
+    tag_ids = []
+    if tag:
+        # sessão curta: o websocket fica aberto por horas, a conexão do pool não
+        async with AsyncReadSessionLocal() as db:
+            por_code = {t.code: t.id for t in await registro_tags.listar_async(db)}
+        faltando = [code for code in tag if code not in por_code]
+        if faltando:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=f"Tag '{faltando[0]}' não encontrada")
+            return
+        tag_ids = [por_code[code] for code in tag]
+
+    await websocket.accept()
+    assinante = await canal.entrar(websocket, Filtro(frozenset(merchant), frozenset(tag_ids)), since)
+    try:
+        # o cliente não manda nada de útil; o receive só serve para ver a desconexão
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+    finally:
+        canal.sair(assinante)
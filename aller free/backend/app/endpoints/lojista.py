@@ -1,19 +1,27 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from sqlalchemy import select
 from app.modelos import models
-from app.esquemas import schemas
-from app.query.database import get_db
-from app.dependencias.dependencies import get_current_user
+from app.esquemas import schemas, serializacao
+from app.query.database import get_async_read_db, get_read_db, get_write_db
+from app.query import contadores, eventos, geo, versoes
+from app.dependencias.dependencies import get_current_user_async, get_current_user_model, Principal
+from app.cache import principais
 
 
 router = APIRouter(prefix="/merchants", tags=["merchants"])
 
+def _coordenadas(latitude: Optional[float], longitude: Optional[float]) -> None:
+    if (latitude is None) != (longitude is None):
+        raise HTTPException(status_code=400, detail="Informe latitude e longitude juntas")
+
 @router.post("/", response_model=schemas.MerchantOut, status_code=201)
 def create_merchant(
     payload: schemas.MerchantCreate,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_write_db),
+    current_user: models.User = Depends(get_current_user_model),
 ):
     """
     Cria uma merchant associada ao usuário autenticado.
@@ -27,27 +35,78 @@ def create_merchant(
     if existing:
         raise HTTPException(status_code=400, detail="Usuário já tem uma loja")
 
-    # cria merchant
-    merchant = models.Merchant(user_id=current_user.id, store_name=payload.store_name)
+    _coordenadas(payload.latitude, payload.longitude)
+
+    # cria merchant (o trigger de geo.py põe a localização no índice espacial)
+    merchant = models.Merchant(
+        user_id=current_user.id,
+        store_name=payload.store_name,
+        latitude=payload.latitude,
+        longitude=payload.longitude,
+    )
     db.add(merchant)
+    db.flush()  # gera merchant.id para o evento do feed
+    eventos.loja(db, eventos.LOJA_CRIADA, merchant)
+    contadores.loja_criada(db)
 
     # atualiza role do usuário para 'merchant' (se já não for)
     if getattr(current_user, "role", None) != "merchant":
+        contadores.papel(db, current_user.role, "merchant")
         current_user.role = "merchant"
         db.add(current_user)  # marca para atualização
 
     # efetiva tudo numa única transação
     db.commit()
 
-    # refresh para retornar objetos com IDs atualizados
-    db.refresh(merchant)
-    db.refresh(current_user)
+    # role e merchant_id do principal mudaram: descarta o cache deste usuário
+    principais.invalidar(current_user.id)
+
+    db.close()  # libera o escritor antes da serialização (objetos continuam carregados)
+
+    return merchant
+
+# ---------- lojas próximas (R*Tree, ver app/query/geo.py) ----------
+@router.get("/nearby", response_model=schemas.MerchantNearbyPage)
+def nearby_merchants(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius: float = Query(geo.DEFAULT_RADIUS_KM, gt=0, le=geo.MAX_RADIUS_KM, description="Raio em km"),
+    tag: Optional[str] = Query(None, description="Só lojas com produto ativo com esta tag"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+):
+    lojas = geo.proximas(db, lat, lng, raio_km=radius, tag=tag, limit=limit + 1, offset=offset)
+    db.close()  # devolve a conexão antes da serialização (ver get_read_db)
+    return serializacao.resposta({"items": lojas[:limit], "limit": limit, "offset": offset, "has_more": len(lojas) > limit})
 
+@router.put("/me/location", response_model=schemas.MerchantOut)
+def update_my_location(
+    payload: schemas.MerchantLocation,
+    db: Session = Depends(get_write_db),
+    current_user: models.User = Depends(get_current_user_model),
+):
+    """
+    Muda a localização da loja do usuário; o índice espacial acompanha via
+    trigger. Na mesma transação: evento merchant.moved no feed e versão nova
+    da loja (muda o ETag das leituras por loja).
+    """
+    merchant = db.execute(
+        select(models.Merchant).where(models.Merchant.user_id == current_user.id)
+    ).scalar_one_or_none()
+    if not merchant:
+        raise HTTPException(status_code=404, detail="Merchant não encontrado")
+    merchant.latitude = payload.latitude
+    merchant.longitude = payload.longitude
+    eventos.localizacao(db, merchant)
+    versoes.bump(db, versoes.loja(merchant.id))
+    db.commit()
+    db.close()
     return merchant
 
 @router.get("/me", response_model=schemas.MerchantOut)
-def get_my_merchant(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    merchant = db.execute(select(models.Merchant).where(models.Merchant.user_id == current_user.id)).scalar_one_or_none()
+async def get_my_merchant(db: AsyncSession = Depends(get_async_read_db), current_user: Principal = Depends(get_current_user_async)):
+    merchant = (await db.execute(select(models.Merchant).where(models.Merchant.user_id == current_user.id))).scalar_one_or_none()
     if not merchant:
         raise HTTPException(status_code=404, detail="Merchant não encontrado")
     return merchant
@@ -0,0 +1,84 @@
+import os
+import secrets
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from app.query import metricas
+from app.query.database import engine, read_engine, async_read_engine
+from app.autenticacao import senhas
+from app.cache.canal import canal
+from app.cache.carrinhos import carrinhos
+from app.cache.perfis import feeds as feeds_perfis
+from app.query.outbox import trabalhador as trabalhador_outbox
+
+
+router = APIRouter(tags=["metrics"])
+
+# METRICS_TOKEN definido: /metrics exige "Authorization: Bearer <token>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# ---------- gauges lidos na hora da coleta ----------
+_POOLS = {"write": engine, "read": read_engine, "async_read": async_read_engine}
+
+def _pools(ler):
+    for nome, eng in _POOLS.items():
+        pool = eng.pool
+        if hasattr(pool, "checkedout"):
+            yield (nome,), ler(pool)
+
+metricas.registrar_gauge(
+    "db_pool_connections_in_use", "Conexões emprestadas do pool agora.", ("pool",),
+    lambda: _pools(lambda p: p.checkedout()),
+)
+metricas.registrar_gauge(
+    "db_pool_size", "Tamanho fixo do pool (sem overflow).", ("pool",),
+    lambda: _pools(lambda p: p.size()),
+)
+metricas.registrar_gauge(
+    "password_hash_pending", "Tarefas de bcrypt enfileiradas ou rodando.", (),
+    lambda: [((), senhas.pendentes())],
+)
+metricas.registrar_gauge(
+    "password_hash_max_pending", "Limite da fila do bcrypt (acima disso, 503).", (),
+    lambda: [((), senhas.MAX_PENDENTES)],
+)
+metricas.registrar_gauge(
+    "catalog_feed_subscribers", "Websockets abertos em /ws/catalog neste worker.", (),
+    lambda: [((), len(canal.assinantes))],
+)
+metricas.registrar_gauge(
+    "cart_store_entries", "Carrinhos em memória neste worker.", (),
+    lambda: [((), len(carrinhos))],
+)
+metricas.registrar_gauge(
+    "cart_store_pending", "Carrinhos com mudanças ainda não gravadas no banco.", (),
+    lambda: [((), carrinhos.pendentes)],
+)
+metricas.registrar_gauge(
+    "profile_feed_entries", "Perfis alimentares com o feed /products/for-me em cache neste worker.", (),
+    lambda: [((), len(feeds_perfis))],
+)
+metricas.registrar_gauge(
+    "profile_feed_ids", "Ids de produto guardados nos feeds por perfil (4 bytes cada).", (),
+    lambda: [((), feeds_perfis.total_ids)],
+)
+# situação da fila lida pelo trabalhador do outbox a cada OUTBOX_POLL_INTERVAL (vale para o banco todo)
+metricas.registrar_gauge(
+    "outbox_pending", "Mensagens do outbox ainda não processadas, por tópico.", ("topic",),
+    lambda: [((t,), s.pendentes) for t, s in trabalhador_outbox.situacao.items()],
+)
+metricas.registrar_gauge(
+    "outbox_dead", "Mensagens do outbox que esgotaram as tentativas, por tópico.", ("topic",),
+    lambda: [((t,), s.mortas) for t, s in trabalhador_outbox.situacao.items()],
+)
+metricas.registrar_gauge(
+    "outbox_lag_seconds", "Idade da mensagem pendente mais antiga, por tópico.", ("topic",),
+    lambda: [((t,), s.atraso()) for t, s in trabalhador_outbox.situacao.items()],
+)
+
+# async de propósito: roda no event loop, o mesmo thread que escreve as séries HTTP
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    if METRICS_TOKEN:
+        enviado = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        if not secrets.compare_digest(enviado, METRICS_TOKEN):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token de métricas inválido")
+    return Response(metricas.texto(), media_type=metricas.CONTENT_TYPE)
@@ -0,0 +1,43 @@
+# endpoints/perfil.py
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.orm import Session
+from app.esquemas import schemas
+from app.query.database import get_read_db, get_write_db
+from app.query import restricoes
+from app.cache.registro_tags import registro as registro_tags, TagNaoEncontrada
+from app.dependencias.dependencies import get_current_user, Principal
+
+
+# perfil alimentar do usuário logado: as tags que o produto precisa ter para
+# aparecer em GET /products/for-me (ver app/query/restricoes.py)
+router = APIRouter(prefix="/users/me", tags=["profile"], default_response_class=ORJSONResponse)
+
+# helper: formato de schemas.DietaryProfileOut
+def _perfil(db: Session, user_id: int) -> dict:
+    tags, apagadas = restricoes.perfil(db, user_id)
+    db.close()  # devolve a conexão antes da serialização
+    return {
+        "tags": [{"id": t.tag_id, "code": t.code, "label": t.label} for t in tags],
+        "removed_tags": apagadas,
+    }
+
+@router.get("/dietary-profile", response_model=schemas.DietaryProfileOut)
+def get_dietary_profile(db: Session = Depends(get_read_db), current_user: Principal = Depends(get_current_user)):
+    return _perfil(db, current_user.id)
+
+@router.put("/dietary-profile", response_model=schemas.DietaryProfileOut)
+def put_dietary_profile(
+    payload: schemas.DietaryProfileIn,
+    db: Session = Depends(get_write_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """Substitui o perfil inteiro pelos codes dados (404 se algum não existe)."""
+    try:
+        tags = sorted(registro_tags.resolver(db, payload.tags), key=lambda t: t.id)
+    except TagNaoEncontrada as exc:
+        raise HTTPException(status_code=404, detail=f"Tag '{exc.code}' não encontrada")
+    restricoes.gravar(db, current_user.id, [t.id for t in tags])
+    db.commit()
+    db.close()  # libera o escritor antes da serialização
+    return {"tags": [{"id": t.id, "code": t.code, "label": t.label} for t in tags], "removed_tags": 0}
@@ -1,19 +1,70 @@
 # endpoints/produto.py
+from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import select, update, delete
+from sqlalchemy import select
 from app.modelos import models
-from app.esquemas import schemas
-from app.query.database import get_db
-from app.dependencias.dependencies import get_current_user, require_merchant
+from app.esquemas import schemas, serializacao
+from app.query.database import get_async_read_db, get_read_db, get_write_db
+from app.query import catalogo, busca, contadores, eventos, exportacao, importacao, lote, restricoes, versoes, vitrine
+from app.cache import respostas
+from app.cache.indice_tags import indice as indice_tags
+from app.cache.perfis import feeds as feeds_perfis
+from app.cache.sugestoes import indice as indice_sugestoes, MAX_SUGESTOES
+from app.cache.registro_tags import registro as registro_tags, TagNaoEncontrada
+from app.dependencias.dependencies import get_current_user, require_merchant, Principal
 
 
-router = APIRouter(prefix="/products", tags=["products"])
+router = APIRouter(prefix="/products", tags=["products"], default_response_class=ORJSONResponse)
+
+# helper: executa a consulta paginada e traduz cursor inválido em 400
+def _pagina(db: Session, **filtros) -> catalogo.Pagina:
+    try:
+        pagina = catalogo.buscar_produtos(db, **filtros)
+    except catalogo.CursorInvalido:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    db.close()  # devolve a conexão antes da serialização (ver get_read_db)
+    return pagina
+
+async def _pagina_async(db: AsyncSession, **filtros) -> catalogo.Pagina:
+    try:
+        return await catalogo.buscar_produtos_async(db, **filtros)
+    except catalogo.CursorInvalido:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+# helper: lê o corpo pronto do produto (product_views, gravado nesta transação)
+# ainda antes do commit, comita, aplica os índices em memória e fecha a sessão:
+# responder não abre outra transação no escritor
+def _commitar(db: Session, product_id: int, *pendentes, status_code: int = 200):
+    corpo = vitrine.corpo(db, product_id)
+    db.commit()
+    for pendente in pendentes:
+        pendente.aplicar()
+    db.close()
+    return serializacao.resposta_json(corpo, status_code)
+
+# helper: resolve todos os codes num passo só (registro em memória) e devolve os ids
+def _resolver_tags(db: Session, codes: List[str]) -> List[int]:
+    try:
+        return [t.id for t in registro_tags.resolver(db, codes)]
+    except TagNaoEncontrada as exc:
+        raise HTTPException(status_code=404, detail=f"Tag '{exc.code}' não encontrada")
+
+# helper: refaz a linha do produto em product_views, grava o evento do feed,
+# soma os contadores do admin e invalida o ETag do produto e da listagem da
+# loja (antes do commit, na mesma transação)
+def _produto_mudou(db: Session, product: models.Product) -> None:
+    mudancas = vitrine.atualizar(db, [product.id])
+    eventos.produtos(db, mudancas)
+    contadores.produtos(db, mudancas)
+    versoes.bump(db, versoes.produto(product.id), versoes.loja(product.merchant_id))
 
 # ---------- create product (já existente, mantém behavior) ----------
 @router.post("/", response_model=schemas.ProductOut, status_code=201)
-def create_product(payload: schemas.ProductCreate, db: Session = Depends(get_db), current_user: models.User = Depends(require_merchant)):
+def create_product(payload: schemas.ProductCreate, db: Session = Depends(get_write_db), current_user: Principal = Depends(require_merchant)):
     # verifica merchant
     merchant = db.execute(select(models.Merchant).where(models.Merchant.id == payload.merchant_id)).scalar_one_or_none()
     if not merchant:
@@ -21,6 +72,9 @@ def create_product(payload: schemas.ProductCreate, db: Session = Depends(get_db)
     if merchant.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Você não é o proprietário dessa loja")
 
+    # resolve as tags antes de gravar: code inexistente não deixa produto pela metade
+    tag_ids = _resolver_tags(db, payload.tags or [])
+
     product = models.Product(
         merchant_id=payload.merchant_id,
         name=payload.name,
@@ -29,64 +83,248 @@ def create_product(payload: schemas.ProductCreate, db: Session = Depends(get_db)
         active=True
     )
     db.add(product)
-    db.commit()
-    db.refresh(product)
+    db.flush()  # gera product.id
 
     # associa tags por code (se informadas)
-    if payload.tags:
-        tags_objs: List[models.DietaryTag] = []
-        for code in payload.tags:
-            tag = db.execute(select(models.DietaryTag).where(models.DietaryTag.code == code)).scalar_one_or_none()
-            if not tag:
-                raise HTTPException(status_code=404, detail=f"Tag '{code}' não encontrada")
-            tags_objs.append(tag)
-        product.tags = tags_objs
-        db.add(product)
-        db.commit()
-        db.refresh(product)
+    if tag_ids:
+        catalogo.vincular_tags(db, product.id, tag_ids)
+
+    # só a listagem da loja muda; o id novo nunca teve ETag servido (o delete
+    # de um id que venha a ser reaproveitado já incrementou a versão dele)
+    mudancas = vitrine.atualizar(db, [product.id])
+    eventos.produtos(db, mudancas)
+    contadores.produtos(db, mudancas)
+    versoes.bump(db, versoes.loja(product.merchant_id))
+    indice = indice_tags.registrar(db, [product.id])
+    sugestoes = indice_sugestoes.registrar(db, [product.id])
+    return _commitar(db, product.id, indice, sugestoes, status_code=201)
+
+# ---------- bulk import (CSV / NDJSON) ----------
+@router.post("/import", response_model=schemas.ImportReport)
+def import_products(
+    file: UploadFile = File(..., description="CSV (name,price,description,tags) ou NDJSON, um produto por linha"),
+    format: Optional[str] = Query(None, description="csv | ndjson (padrão: pela extensão/content-type)"),
+    db: Session = Depends(get_write_db),
+    current_user: Principal = Depends(require_merchant),
+):
+    """
+    Importa os produtos do arquivo para a loja do usuário, em lotes de
+    importacao.BATCH_SIZE. Linhas inválidas voltam no relatório; as válidas
+    ficam gravadas mesmo que outras falhem.
+    """
+    if current_user.merchant_id is None:
+        raise HTTPException(status_code=404, detail="Merchant não encontrado")
+    formato = format or importacao.detectar_formato(file.filename, file.content_type)
+    if formato not in importacao.FORMATOS:
+        raise HTTPException(status_code=400, detail="Formato não suportado (use csv ou ndjson)")
 
-    return product
+    try:
+        relatorio = importacao.importar(db, importacao.ler(file.file, formato), current_user.merchant_id)
+    except importacao.FormatoInvalido as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    finally:
+        db.close()
+    return relatorio
+
+# ---------- batch mutations (update/delete/tags de vários produtos) ----------
+@router.post("/batch", response_model=schemas.BatchReport)
+def batch_products(payload: schemas.BatchRequest, db: Session = Depends(get_write_db), current_user: Principal = Depends(require_merchant)):
+    """
+    Aplica uma lista de operações numa transação só, com resultado por item.
+    mode=atomic (padrão): algum item falhou -> nada é gravado e a resposta é 409.
+    mode=best_effort: grava os itens válidos; os inválidos voltam com o erro.
+    """
+    try:
+        relatorio = lote.executar(db, payload.operations, current_user.id, atomico=payload.mode == "atomic")
+    finally:
+        db.close()
+    status_code = 409 if relatorio.mode == "atomic" and relatorio.failed else 200
+    return serializacao.resposta(relatorio, status_code=status_code)
 
 # ---------- list products (filtrar por q e tag) ----------
-@router.get("/", response_model=List[schemas.ProductOut])
-def list_products(q: Optional[str] = None, tag: Optional[str] = Query(None, description="Filter by tag code"), db: Session = Depends(get_db)):
-    stmt = select(models.Product)
-    products = db.execute(stmt).scalars().all()
+# rotas de leitura do catálogo são async (AsyncSession): não ocupam o threadpool
+@router.get("/", response_model=schemas.ProductPage)
+async def list_products(
+    q: Optional[str] = None,
+    tag: Optional[str] = Query(None, description="Filter by tag code"),
+    active: Optional[bool] = Query(None, description="Filter by active flag"),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    limit: int = Query(catalogo.DEFAULT_PAGE_SIZE, ge=1, le=catalogo.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    return serializacao.resposta_json(serializacao.pagina(await _pagina_async(db, q=q, tag=tag, active=active, cursor=cursor, limit=limit)))
+
+# ---------- filtro por várias tags (índice de bitmaps) + facetas ----------
+def _tag_ids(por_code: dict, valores: List[str]) -> List[int]:
+    # aceita ?tags=a&tags=b e também ?tags=a,b; code desconhecido vira um id
+    # que não está no índice (não casa com nada)
+    codes = [c.strip() for v in valores for c in v.split(",") if c.strip()]
+    return [por_code[c].id if c in por_code else -1 for c in codes]
+
+@router.get("/filter", response_model=schemas.ProductFacetPage)
+def filter_products(
+    tags: List[str] = Query([], description="Tem TODAS estas tags (AND)"),
+    any_tags: List[str] = Query([], description="Tem pelo menos UMA destas tags (OR)"),
+    exclude_tags: List[str] = Query([], description="Não tem NENHUMA destas tags (NOT)"),
+    active: Optional[bool] = Query(None, description="Filter by active flag"),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    limit: int = Query(catalogo.DEFAULT_PAGE_SIZE, ge=1, le=catalogo.MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Filtro combinado por restrições alimentares, resolvido no índice em
+    memória. Devolve também o total e, para cada tag, quantos produtos do
+    resultado a têm (contagem da barra de filtros).
+    """
+    try:
+        depois_de = catalogo.decode_cursor(cursor) if cursor else 0
+    except catalogo.CursorInvalido:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    por_code = registro_tags.por_code(db)
+    resultado = indice_tags.consultar(
+        db,
+        todas=_tag_ids(por_code, tags),
+        alguma=_tag_ids(por_code, any_tags),
+        nenhuma=_tag_ids(por_code, exclude_tags),
+        active=active, depois_de=depois_de, limite=limit,
+    )
+    items = catalogo.produtos_por_ids(db, resultado.ids)
+    db.close()  # devolve a conexão antes da serialização (ver get_read_db)
+    return serializacao.resposta_json(serializacao.com_itens(
+        items,
+        next_cursor=catalogo.encode_cursor(resultado.ids[-1]) if resultado.tem_mais else None,
+        total=resultado.total,
+        facets={t.code: resultado.facetas.get(t.id, 0) for t in por_code.values()},
+    ))
 
-    if q:
-        products = [p for p in products if q.lower() in (p.name or "").lower()]
+# ---------- "seguro para mim": feed do perfil alimentar ----------
+@router.get("/for-me", response_model=schemas.ProductProfilePage)
+def products_for_me(
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    limit: int = Query(catalogo.DEFAULT_PAGE_SIZE, ge=1, le=catalogo.MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(get_current_user),
+):
+    """
+    Produtos ativos com todas as tags do perfil alimentar do usuário
+    (PUT /users/me/dietary-profile), por ordem de id. A lista de cada perfil
+    distinto é montada uma vez e dividida por quem tem o mesmo perfil (ver
+    app/cache/perfis.py). Perfil vazio = catálogo ativo inteiro.
+    """
+    try:
+        depois_de = catalogo.decode_cursor(cursor) if cursor else 0
+    except catalogo.CursorInvalido:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    # lido a cada request: a troca do perfil vale já na próxima página
+    tag_ids = restricoes.tags_do_usuario(db, current_user.id)
+    resultado = feeds_perfis.pagina(db, tag_ids, depois_de, limit)
+    items = catalogo.produtos_por_ids(db, resultado.ids)
+    db.close()  # devolve a conexão antes da serialização (ver get_read_db)
+    return serializacao.resposta_json(serializacao.com_itens(
+        items,
+        next_cursor=catalogo.encode_cursor(resultado.ids[-1]) if resultado.tem_mais else None,
+        total=resultado.total,
+    ))
 
-    if tag:
-        products = [p for p in products if any(t.code == tag for t in (p.tags or []))]
+# ---------- full-text search (FTS5, ranking bm25) ----------
+@router.get("/search", response_model=List[schemas.ProductOut])
+def search_products(
+    q: str = Query(..., min_length=1, description="Texto livre; cada palavra casa por prefixo e sem acento"),
+    tag: Optional[str] = Query(None, description="Filter by tag code"),
+    active: Optional[bool] = Query(None, description="Filter by active flag"),
+    limit: int = Query(catalogo.DEFAULT_PAGE_SIZE, ge=1, le=catalogo.MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_read_db),
+):
+    products = busca.buscar(db, q, tag=tag, active=active, limit=limit, offset=offset)
+    db.close()  # devolve a conexão antes da serialização (ver get_read_db)
+    return serializacao.resposta_json(serializacao.lista(products))
 
-    return products
+# ---------- autocomplete (trie em memória) ----------
+@router.get("/suggest", response_model=List[schemas.Suggestion])
+async def suggest_products(
+    prefix: str = Query(..., min_length=1, max_length=100, description="O que já foi digitado na busca"),
+    limit: int = Query(10, ge=1, le=MAX_SUGESTOES),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Nomes de produto e tags que começam (em qualquer palavra, sem acento) com o
+    prefixo, dos mais populares para os menos. Servido do índice em memória
+    (app/cache/sugestoes.py), sem consultar o catálogo.
+    """
+    return serializacao.resposta(await indice_sugestoes.sugerir_async(db, prefix, limit))
+
+# ---------- streaming export (NDJSON / CSV) ----------
+@router.get("/export")
+def export_products(
+    format: str = Query("ndjson", description="ndjson | csv"),
+    merchant_id: Optional[int] = None,
+    tag: Optional[str] = Query(None, description="Filter by tag code"),
+    active: Optional[bool] = Query(None, description="Filter by active flag"),
+    updated_since: Optional[datetime] = Query(None, description="Só produtos alterados a partir deste instante (ISO 8601)"),
+):
+    """
+    Catálogo inteiro (ou filtrado) em streaming, ordenado por id, com as tags
+    de cada produto. A memória usada não cresce com o tamanho do catálogo.
+    """
+    media_type = exportacao.FORMATOS.get(format)
+    if media_type is None:
+        raise HTTPException(status_code=400, detail="Formato não suportado (use ndjson ou csv)")
+    corpo = exportacao.exportar(format, merchant_id=merchant_id, tag=tag, active=active, updated_since=updated_since)
+    headers = {"Content-Disposition": f'attachment; filename="products.{format}"'}
+    return StreamingResponse(corpo, media_type=media_type, headers=headers)
+
+# ---------- list products of current merchant (private) ----------
+# declarada antes de /{product_id} para "/me" não cair na rota do id
+@router.get("/me", response_model=schemas.ProductPage)
+def list_my_products(
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    limit: int = Query(catalogo.DEFAULT_PAGE_SIZE, ge=1, le=catalogo.MAX_PAGE_SIZE),
+    db: Session = Depends(get_read_db),
+    current_user: Principal = Depends(require_merchant),
+):
+    if current_user.merchant_id is None:
+        return serializacao.resposta_json(serializacao.pagina(catalogo.Pagina()))  # sem loja ainda
+    return serializacao.resposta_json(serializacao.pagina(_pagina(db, merchant_id=current_user.merchant_id, cursor=cursor, limit=limit)))
 
 # ---------- get product by id ----------
+# ETag = versão do produto + versão das tags (o corpo traz code/label das tags);
+# If-None-Match igual responde 304 só com a leitura das versões
 @router.get("/{product_id}", response_model=schemas.ProductOut)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = db.execute(select(models.Product).where(models.Product.id == product_id)).scalar_one_or_none()
-    if not product:
-        raise HTTPException(status_code=404, detail="Produto não encontrado")
-    return product
+async def get_product(product_id: int, request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    v = await versoes.ler_varios_async(db, [versoes.produto(product_id), versoes.TAGS])
+
+    async def montar() -> bytes:
+        corpo = await catalogo.produto_async(db, product_id)
+        if corpo is None:
+            raise HTTPException(status_code=404, detail="Produto não encontrado")
+        return corpo
+
+    etag = respostas.etag("p", product_id, v[versoes.produto(product_id)], v[versoes.TAGS])
+    return await respostas.servir(request, etag, montar)
 
 # ---------- list products by merchant (public) ----------
-@router.get("/merchant/{merchant_id}", response_model=List[schemas.ProductOut])
-def list_products_by_merchant(merchant_id: int, db: Session = Depends(get_db)):
-    products = db.execute(select(models.Product).where(models.Product.merchant_id == merchant_id)).scalars().all()
-    return products
+@router.get("/merchant/{merchant_id}", response_model=schemas.ProductPage)
+async def list_products_by_merchant(
+    merchant_id: int,
+    request: Request,
+    active: Optional[bool] = Query(None, description="Filter by active flag"),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    limit: int = Query(catalogo.DEFAULT_PAGE_SIZE, ge=1, le=catalogo.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    v = await versoes.ler_varios_async(db, [versoes.loja(merchant_id), versoes.TAGS])
 
-# ---------- list products of current merchant (private) ----------
-@router.get("/me", response_model=List[schemas.ProductOut])
-def list_my_products(db: Session = Depends(get_db), current_user: models.User = Depends(require_merchant)):
-    merchant = db.execute(select(models.Merchant).where(models.Merchant.user_id == current_user.id)).scalar_one_or_none()
-    if not merchant:
-        return []  # sem loja ainda
-    products = db.execute(select(models.Product).where(models.Product.merchant_id == merchant.id)).scalars().all()
-    return products
+    async def montar() -> bytes:
+        return serializacao.pagina(await _pagina_async(db, merchant_id=merchant_id, active=active, cursor=cursor, limit=limit))
+
+    # o ETag vale por URL, então cursor/limit/active não precisam entrar nele
+    etag = respostas.etag("m", merchant_id, v[versoes.loja(merchant_id)], v[versoes.TAGS])
+    return await respostas.servir(request, etag, montar)
 
 # ---------- add tags to a product ----------
 @router.post("/{product_id}/tags", response_model=schemas.ProductOut)
-def add_tags_to_product(product_id: int, tags: List[str], db: Session = Depends(get_db), current_user: models.User = Depends(require_merchant)):
+def add_tags_to_product(product_id: int, tags: List[str], db: Session = Depends(get_write_db), current_user: Principal = Depends(require_merchant)):
     product = db.execute(select(models.Product).where(models.Product.id == product_id)).scalar_one_or_none()
     if not product:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
@@ -94,23 +332,14 @@ def add_tags_to_product(product_id: int, tags: List[str], db: Session = Depends(
     if merchant.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Você não é o proprietário dessa loja")
 
-    tags_objs: List[models.DietaryTag] = list(product.tags or [])
-    for code in tags:
-        tag = db.execute(select(models.DietaryTag).where(models.DietaryTag.code == code)).scalar_one_or_none()
-        if not tag:
-            raise HTTPException(status_code=404, detail=f"Tag '{code}' não encontrada")
-        if tag not in tags_objs:
-            tags_objs.append(tag)
-
-    product.tags = tags_objs
-    db.add(product)
-    db.commit()
-    db.refresh(product)
-    return product
+    tag_ids = _resolver_tags(db, tags)
+    catalogo.vincular_tags(db, product.id, tag_ids)
+    _produto_mudou(db, product)
+    return _commitar(db, product.id, indice_tags.registrar(db, [product.id]))
 
 # ---------- remove a tag from a product ----------
 @router.delete("/{product_id}/tags/{tag_code}", response_model=schemas.ProductOut)
-def remove_tag_from_product(product_id: int, tag_code: str, db: Session = Depends(get_db), current_user: models.User = Depends(require_merchant)):
+def remove_tag_from_product(product_id: int, tag_code: str, db: Session = Depends(get_write_db), current_user: Principal = Depends(require_merchant)):
     product = db.execute(select(models.Product).where(models.Product.id == product_id)).scalar_one_or_none()
     if not product:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
@@ -118,21 +347,18 @@ def remove_tag_from_product(product_id: int, tag_code: str, db: Session = Depend
     if merchant.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Você não é o proprietário dessa loja")
 
-    tag = db.execute(select(models.DietaryTag).where(models.DietaryTag.code == tag_code)).scalar_one_or_none()
-    if not tag:
+    try:
+        (tag,) = registro_tags.resolver(db, [tag_code])
+    except TagNaoEncontrada:
         raise HTTPException(status_code=404, detail="Tag não encontrada")
 
-    current_tags = list(product.tags or [])
-    new_tags = [t for t in current_tags if t.id != tag.id]
-    product.tags = new_tags
-    db.add(product)
-    db.commit()
-    db.refresh(product)
-    return product
+    catalogo.desvincular_tag(db, product.id, tag.id)
+    _produto_mudou(db, product)
+    return _commitar(db, product.id, indice_tags.registrar(db, [product.id]))
 
 # ---------- partial update (PATCH) ----------
 @router.patch("/{product_id}", response_model=schemas.ProductOut)
-def update_product(product_id: int, payload: schemas.ProductCreate, db: Session = Depends(get_db), current_user: models.User = Depends(require_merchant)):
+def update_product(product_id: int, payload: schemas.ProductCreate, db: Session = Depends(get_write_db), current_user: Principal = Depends(require_merchant)):
     """
     Atualização parcial usando ProductCreate (pode enviar subset dos campos).
     Só o proprietário pode atualizar.
@@ -157,25 +383,21 @@ def update_product(product_id: int, payload: schemas.ProductCreate, db: Session
         updated = True
     if hasattr(payload, "tags") and payload.tags is not None:
         # se quiser sobrescrever tags totalmente:
-        tags_objs = []
-        for code in payload.tags:
-            tag = db.execute(select(models.DietaryTag).where(models.DietaryTag.code == code)).scalar_one_or_none()
-            if not tag:
-                raise HTTPException(status_code=404, detail=f"Tag '{code}' não encontrada")
-            tags_objs.append(tag)
-        product.tags = tags_objs
+        tag_ids = _resolver_tags(db, payload.tags)
+        catalogo.vincular_tags(db, product.id, tag_ids, substituir=True)
         updated = True
 
+    pendentes = ()
     if updated:
         db.add(product)
-        db.commit()
-        db.refresh(product)
+        _produto_mudou(db, product)
+        pendentes = (indice_tags.registrar(db, [product.id]), indice_sugestoes.registrar(db, [product.id]))
 
-    return product
+    return _commitar(db, product_id, *pendentes)
 
 # ---------- delete product ----------
 @router.delete("/{product_id}", status_code=204)
-def delete_product(product_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(require_merchant)):
+def delete_product(product_id: int, db: Session = Depends(get_write_db), current_user: Principal = Depends(require_merchant)):
     product = db.execute(select(models.Product).where(models.Product.id == product_id)).scalar_one_or_none()
     if not product:
         raise HTTPException(status_code=404, detail="Produto não encontrado")
@@ -184,5 +406,10 @@ def delete_product(product_id: int, db: Session = Depends(get_db), current_user:
         raise HTTPException(status_code=403, detail="Você não é o proprietário dessa loja")
 
     db.delete(product)
+    _produto_mudou(db, product)
+    indice = indice_tags.registrar(db, [product_id])
+    sugestoes = indice_sugestoes.registrar(db, [product_id])
     db.commit()
+    indice.aplicar()
+    sugestoes.aplicar()
     return None
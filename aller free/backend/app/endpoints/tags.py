@@ -1,23 +1,23 @@
 # endpoints/tags.py
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import delete, select
 from app.modelos import models
-from app.esquemas import schemas
-from app.query.database import get_db
-from app.dependencias.dependencies import get_current_user
+from app.esquemas import schemas, serializacao
+from app.query.database import get_async_read_db, get_write_db
+from app.query import contadores, eventos, restricoes, versoes, vitrine
+from app.cache.registro_tags import registro as registro_tags
+from app.cache.indice_tags import indice as indice_tags
+from app.cache import respostas
+from app.dependencias.dependencies import get_current_user, require_admin, Principal
 
 
-router = APIRouter(prefix="/tags", tags=["tags"])
-
-# helper simples: checa role admin
-def require_admin(current_user: models.User = Depends(get_current_user)) -> models.User:
-    if getattr(current_user, "role", None) != "admin":
-        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Acesso restrito a administradores")
-    return current_user
+router = APIRouter(prefix="/tags", tags=["tags"], default_response_class=ORJSONResponse)
 
 @router.post("/", response_model=schemas.TagOut, status_code=201)
-def create_tag(payload: schemas.TagCreate, db: Session = Depends(get_db), current_user = Depends(get_current_user)):
+def create_tag(payload: schemas.TagCreate, db: Session = Depends(get_write_db), current_user = Depends(get_current_user)):
     """
     Cria uma tag de restrição alimentar.
     Por enquanto qualquer usuário autenticado pode criar; se quiser, trocamos para admin-only.
@@ -25,19 +25,30 @@ def create_tag(payload: schemas.TagCreate, db: Session = Depends(get_db), curren
     existing = db.execute(select(models.DietaryTag).where(models.DietaryTag.code == payload.code)).scalar_one_or_none()
     if existing:
         raise HTTPException(status_code=400, detail="Tag já existe")
-    tag = models.DietaryTag(code=payload.code, label=payload.label)
+    # id nunca reutilizado: perfis alimentares guardam o id de tags apagadas
+    tag = models.DietaryTag(id=restricoes.proximo_id_de_tag(db), code=payload.code, label=payload.label)
     db.add(tag)
+    db.flush()  # gera tag.id para o evento
+    eventos.tag(db, eventos.TAG_CRIADA, tag)
+    versoes.bump(db, versoes.TAGS)
     db.commit()
-    db.refresh(tag)
+    registro_tags.invalidar()
+    db.close()  # libera o escritor antes da serialização (tag continua carregada)
     return tag
 
 @router.get("/", response_model=list[schemas.TagOut])
-def list_tags(db: Session = Depends(get_db)):
-    tags = db.execute(select(models.DietaryTag)).scalars().all()
-    return tags
+async def list_tags(request: Request, db: AsyncSession = Depends(get_async_read_db)):
+    # servido do registro em memória; só relê a tabela quando a versão muda.
+    # ETag = versão "tags" do snapshot, então If-None-Match igual vira 304
+    version, tags = await registro_tags.listar_com_versao_async(db)
+
+    async def montar() -> bytes:
+        return serializacao.dumps([serializacao.tag(t.id, t.code, t.label) for t in tags])
+
+    return await respostas.servir(request, respostas.etag("t", version), montar)
 
 @router.put("/{tag_id}", response_model=schemas.TagOut)
-def update_tag(tag_id: int, payload: schemas.TagCreate, db: Session = Depends(get_db), _admin: models.User = Depends(require_admin)):
+def update_tag(tag_id: int, payload: schemas.TagCreate, db: Session = Depends(get_write_db), _admin: Principal = Depends(require_admin)):
     """
     Atualiza uma tag (code e label). Somente admin pode acessar.
     """
@@ -52,19 +63,37 @@ def update_tag(tag_id: int, payload: schemas.TagCreate, db: Session = Depends(ge
     tag.code = payload.code
     tag.label = payload.label
     db.add(tag)
+    # code/label vão no corpo pronto de cada produto com a tag: remontados
+    # aqui, para o ETag novo nunca servir um corpo com o label antigo
+    vitrine.atualizar(db, vitrine.produtos_da_tag(db, tag.id))
+    eventos.tag(db, eventos.TAG_ALTERADA, tag)
+    versoes.bump(db, versoes.TAGS)
     db.commit()
-    db.refresh(tag)
+    registro_tags.invalidar()
+    db.close()  # libera o escritor antes da serialização (tag continua carregada)
     return tag
 
 @router.delete("/{tag_id}", status_code=204)
-def delete_tag(tag_id: int, db: Session = Depends(get_db), _admin: models.User = Depends(require_admin)):
+def delete_tag(tag_id: int, db: Session = Depends(get_write_db), _admin: Principal = Depends(require_admin)):
     """
     Remove a tag. Somente admin.
-    Atenção: se tag estiver associada a produtos, ela será desassociada automaticamente pelo SQLAlchemy.
+    Os produtos com a tag perdem o vínculo, o corpo pronto e a contagem por
+    tag no painel do admin na mesma transação.
     """
     tag = db.execute(select(models.DietaryTag).where(models.DietaryTag.id == tag_id)).scalar_one_or_none()
     if not tag:
         raise HTTPException(status_code=404, detail="Tag não encontrada")
+    product_ids = vitrine.produtos_da_tag(db, tag.id)  # antes do delete levar os vínculos
+    # vínculos num DELETE só (o cascade do ORM carregaria cada produto da tag)
+    pt = models.product_tag_table
+    db.execute(delete(pt).where(pt.c.tag_id == tag.id))
     db.delete(tag)
+    # os produtos perdem a tag: sai dos contadores de produtos ativos por tag
+    contadores.produtos(db, vitrine.atualizar(db, product_ids))
+    eventos.tag(db, eventos.TAG_APAGADA, tag)
+    # sem os vínculos o índice de bitmaps é refeito
+    versoes.bump(db, versoes.TAGS, versoes.PRODUTO_TAGS)
     db.commit()
+    registro_tags.invalidar()
+    indice_tags.invalidar()
     return None
@@ -1,30 +1,95 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import select, update
 from app.modelos import models
-from app.autenticacao import auth
+from app.autenticacao import auth, senhas
 from app.esquemas import schemas
-from app.query.database import get_db
+from app.query import contadores
+from app.query.database import get_read_db, get_write_db
 
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-@router.post("/register", response_model=schemas.UserOut, status_code=201)
-def register(payload: schemas.RegisterIn, db: Session = Depends(get_db)):
-    existing = db.execute(select(models.User).where(models.User.email == payload.email)).scalar_one_or_none()
-    if existing:
+# register/login são async: o bcrypt vai para o pool de processos (senhas.py) e
+# o acesso ao banco, que é síncrono, roda no threadpool só pelo tempo da query
+
+# helper: traduz a recusa do controle de admissão em 429/503
+def _recusar(exc: Exception) -> HTTPException:
+    if isinstance(exc, senhas.LimiteExcedido):
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Muitas tentativas, tente novamente em instantes",
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Servidor ocupado, tente novamente em instantes",
+        headers={"Retry-After": str(senhas.Sobrecarga.retry_after)},
+    )
+
+def _buscar_por_email(db: Session, email: str) -> Optional[models.User]:
+    return db.execute(select(models.User).where(models.User.email == email)).scalar_one_or_none()
+
+def _criar_usuario(db: Session, payload: schemas.RegisterIn, hashed: str) -> models.User:
+    # confere de novo: outro register com o mesmo email pode ter entrado enquanto o hash rodava
+    if _buscar_por_email(db, payload.email):
         raise HTTPException(status_code=400, detail="Email já cadastrado")
-    hashed = auth.hash_password(payload.password)
     user = models.User(email=payload.email, password=hashed, name=payload.name, role=payload.role)
     db.add(user)
+    contadores.usuario(db, payload.role)
     db.commit()
-    db.refresh(user)
+    db.close()  # libera o escritor antes da serialização (user continua carregado)
     return user
 
+def _trocar_hash(db: Session, user_id: int, novo_hash: str) -> None:
+    db.execute(update(models.User).where(models.User.id == user_id).values(password=novo_hash))
+    db.commit()
+
+@router.post("/register", response_model=schemas.UserOut, status_code=201)
+async def register(
+    payload: schemas.RegisterIn,
+    request: Request,
+    read_db: Session = Depends(get_read_db),
+    db: Session = Depends(get_write_db),
+):
+    existing = await run_in_threadpool(_buscar_por_email, read_db, payload.email)
+    if existing:
+        raise HTTPException(status_code=400, detail="Email já cadastrado")
+    try:
+        senhas.admitir(request.client.host if request.client else None, payload.email)
+        hashed = await senhas.hash_async(payload.password)
+    except (senhas.LimiteExcedido, senhas.Sobrecarga) as exc:
+        raise _recusar(exc)
+    return await run_in_threadpool(_criar_usuario, db, payload, hashed)
+
 @router.post("/login", response_model=schemas.TokenOut)
-def login(payload: schemas.LoginIn, db: Session = Depends(get_db)):
-    user = db.execute(select(models.User).where(models.User.email == payload.email)).scalar_one_or_none()
-    if not user or not auth.verify_password(payload.password, user.password):
+async def login(
+    payload: schemas.LoginIn,
+    request: Request,
+    read_db: Session = Depends(get_read_db),
+    db: Session = Depends(get_write_db),
+):
+    try:
+        senhas.admitir(request.client.host if request.client else None, payload.email)
+    except (senhas.LimiteExcedido, senhas.Sobrecarga) as exc:
+        raise _recusar(exc)
+
+    user = await run_in_threadpool(_buscar_por_email, read_db, payload.email)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciais inválidas")
+    try:
+        ok, novo_hash = await senhas.verificar_async(payload.password, user.password)
+    except senhas.Sobrecarga as exc:
+        raise _recusar(exc)
+    if not ok:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Credenciais inválidas")
-    token = auth.create_access_token({"sub": str(user.id), "role": user.role})
+    # lê antes de um eventual commit (que expira o objeto)
+    claims = {"sub": str(user.id), "role": user.role}
+    if novo_hash:
+        # BCRYPT_ROUNDS mudou: grava o hash no custo novo
+        await run_in_threadpool(_trocar_hash, db, user.id, novo_hash)
+
+    token = auth.create_access_token(claims)
     return schemas.TokenOut(access_token=token)
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from datetime import datetime
+from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from typing import Dict, Literal, Optional, List
 
 
 # ---------- Usuário ----------
@@ -23,21 +24,36 @@ class UserOut(BaseModel):
     name: Optional[str] = None
     role: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # ---------- Merchant ----------
 class MerchantCreate(BaseModel):
     store_name: str
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+class MerchantLocation(BaseModel):
+    latitude: float = Field(..., ge=-90, le=90)
+    longitude: float = Field(..., ge=-180, le=180)
 
 class MerchantOut(BaseModel):
     id: int
     user_id: int
     store_name: str
     verified: bool
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class MerchantNearby(MerchantOut):
+    distance_km: float
 
-    class Config:
-        orm_mode = True
+class MerchantNearbyPage(BaseModel):
+    items: List[MerchantNearby]
+    limit: int
+    offset: int
+    has_more: bool
 
 # ---------- Tag (restrição alimentar) ----------
 class TagCreate(BaseModel):
@@ -49,8 +65,7 @@ class TagOut(BaseModel):
     code: str
     label: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 # ---------- Product ----------
 class ProductCreate(BaseModel):
@@ -69,6 +84,172 @@ class ProductOut(BaseModel):
     price: float
     active: bool
     tags: List[TagOut] = []
+    store_name: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class Suggestion(BaseModel):
+    text: str
+    kind: Literal["product", "tag"]
+    tag: Optional[str] = None  # code da tag, quando kind == "tag"
+    weight: int
+
+class ProductPage(BaseModel):
+    items: List[ProductOut] = []
+    # token opaco para buscar a próxima página (None = acabou)
+    next_cursor: Optional[str] = None
+
+class ProductFacetPage(ProductPage):
+    # total de produtos que casam com o filtro (todas as páginas)
+    total: int = 0
+    # code da tag -> quantos produtos do resultado têm a tag
+    facets: Dict[str, int] = {}
+
+class ProductProfilePage(ProductPage):
+    # produtos compatíveis com o perfil (todas as páginas)
+    total: int = 0
+
+# ---------- Perfil alimentar ----------
+class DietaryProfileIn(BaseModel):
+    # codes das tags que o produto precisa ter (todas); lista vazia limpa o perfil
+    tags: List[str] = Field(..., max_length=50)
+
+class DietaryProfileOut(BaseModel):
+    tags: List[TagOut]
+    # tags do perfil que foram apagadas: enquanto houver, /products/for-me fica vazio
+    removed_tags: int = 0
+
+# ---------- Operações em lote ----------
+class BatchOperation(BaseModel):
+    op: Literal["update", "delete", "add_tags", "remove_tags"]
+    id: int
+    # update: só os campos enviados mudam; tags em update substitui todas
+    name: Optional[str] = None
+    description: Optional[str] = None
+    price: Optional[float] = None
+    active: Optional[bool] = None
+    tags: Optional[List[str]] = None
+
+class BatchRequest(BaseModel):
+    # atomic: qualquer item com erro desfaz o lote inteiro; best_effort: grava os que derem certo
+    mode: Literal["atomic", "best_effort"] = "atomic"
+    operations: List[BatchOperation] = Field(..., min_length=1, max_length=1000)
+
+class BatchItemResult(BaseModel):
+    index: int
+    id: int
+    op: str
+    status: int
+    error: Optional[str] = None
+
+class BatchReport(BaseModel):
+    mode: str
+    committed: bool
+    applied: int
+    failed: int
+    results: List[BatchItemResult]
+
+# ---------- Importação em massa ----------
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+class ImportReport(BaseModel):
+    total: int
+    imported: int
+    failed: int
+    # no máximo as primeiras 1000 linhas com erro
+    errors: List[ImportRowError] = []
+
+    model_config = ConfigDict(from_attributes=True)
+
+# ---------- Carrinho e checkout ----------
+class CartAdd(BaseModel):
+    product_id: int
+    quantity: int = Field(1, ge=1, le=99)
+
+class CartItemOut(BaseModel):
+    id: int  # product_id (é o que cart.html usa para remover)
+    name: str
+    price: float  # preço de quando entrou no carrinho
+    quantity: int
+    subtotal: float
+
+class CartOut(BaseModel):
+    success: bool = True
+    items: List[CartItemOut]
+    total: float
+    # hash do conteúdo; mandar no checkout garante que o pedido é o que o cliente viu
+    version: str
+
+class CheckoutRequest(BaseModel):
+    version: Optional[str] = None
+
+class CheckoutChange(BaseModel):
+    product_id: int
+    reason: Literal["unavailable", "price_changed"]
+    old_price: float
+    price: Optional[float] = None
+
+class CheckoutOut(BaseModel):
+    success: bool
+    order_id: Optional[int] = None
+    total: Optional[float] = None
+    detail: Optional[str] = None
+    # success=false: o que mudou desde que os itens entraram no carrinho (que já vem corrigido)
+    changes: List[CheckoutChange] = []
+    cart: Optional[CartOut] = None
+
+# ---------- Admin: fila de verificação e contadores ----------
+class MerchantQueueItem(BaseModel):
+    id: int
+    user_id: int
+    store_name: str
+
+class VerifyRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=1000)
+
+class VerifyReport(BaseModel):
+    verified: List[int]
+    already_verified: List[int]
+    not_found: List[int]
+
+class TagStat(BaseModel):
+    id: int
+    code: str
+    label: str
+    active_products: int
+
+class AdminStats(BaseModel):
+    users: Dict[str, int]         # por papel: client, merchant, admin
+    merchants: Dict[str, int]     # verified, unverified
+    active_products: int
+    tags: List[TagStat]
+
+class MerchantStat(BaseModel):
+    merchant_id: int
+    store_name: Optional[str] = None
+    verified: bool
+    active_products: int
+
+# ---------- Admin: outbox ----------
+class OutboxTopic(BaseModel):
+    topic: str
+    pending: int
+    dead: int
+    # segundos desde que a pendente mais antiga foi enfileirada
+    lag_seconds: float
+
+class OutboxDead(BaseModel):
+    id: int
+    topic: str
+    key: str
+    attempts: int
+    created_at: datetime
+    last_error: Optional[str] = None
 
-    class Config:
-        orm_mode = True
+class OutboxStatus(BaseModel):
+    topics: List[OutboxTopic]
+    dead: List[OutboxDead]
@@ -0,0 +1,67 @@
+# app/esquemas/serializacao.py
+"""
+Serialização rápida das leituras do catálogo.
+
+As listagens não passam mais objeto ORM -> ProductOut (validação campo a campo)
+-> encoder JSON da stdlib. As consultas devolvem linhas (tuplas do Core) e
+aqui elas viram dicts com o formato exato de schemas.ProductOut, codificados
+com orjson. Os dados vêm do banco, então não há o que validar; o response_model
+das rotas continua valendo para a documentação.
+
+As leituras do catálogo nem chegam a montar o dict: saem prontas de
+product_views (app/query/vitrine.py) e só são coladas aqui (lista, com_itens).
+
+Comparação antes/depois (tempo por 1k produtos):
+    python -m benchmark serializacao [--produtos N]
+"""
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import orjson
+from fastapi import Response
+
+
+def tag(tag_id: int, code: str, label: str) -> Dict[str, Any]:
+    return {"id": tag_id, "code": code, "label": label}
+
+def produto(row: Sequence, tags: List[Dict[str, Any]], store_name: Optional[str] = None) -> Dict[str, Any]:
+    """row = (id, merchant_id, name, description, price, active), na ordem de catalogo.COLUNAS."""
+    id_, merchant_id, name, description, price, active = row[:6]
+    return {
+        "id": id_,
+        "merchant_id": merchant_id,
+        "name": name,
+        "description": description,
+        "price": price,
+        "active": bool(active),
+        "tags": tags,
+        "store_name": store_name,
+    }
+
+def produtos(rows: Iterable[Sequence], tags_por_produto: Dict[int, List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    return [produto(r, tags_por_produto.get(r[0], [])) for r in rows]
+
+def dumps(conteudo: Any) -> bytes:
+    # orjson já serializa dataclass (ex.: lote.RelatorioLote) sem conversão
+    return orjson.dumps(conteudo)
+
+def resposta(conteudo: Any, status_code: int = 200) -> Response:
+    """Response pronta: o FastAPI não revalida contra o response_model."""
+    return resposta_json(dumps(conteudo), status_code)
+
+def resposta_json(corpo: bytes, status_code: int = 200) -> Response:
+    return Response(corpo, status_code=status_code, media_type="application/json")
+
+
+# ---------- JSON já codificado (product_views.body) ----------
+# os corpos prontos são colados como bytes, sem decodificar e codificar de novo
+def lista(corpos: List[bytes]) -> bytes:
+    return b"[" + b",".join(corpos) + b"]"
+
+def com_itens(corpos: List[bytes], **campos: Any) -> bytes:
+    """{"items": [corpos...], **campos}."""
+    resto = b"," + orjson.dumps(campos)[1:] if campos else b"}"
+    return b'{"items":' + lista(corpos) + resto
+
+def pagina(pagina: Any) -> bytes:
+    """catalogo.Pagina (items = corpos prontos) no formato de ProductPage."""
+    return com_itens(pagina.items, next_cursor=pagina.next_cursor)
@@ -1,4 +1,5 @@
-from sqlalchemy import Table, Column, Integer, String, Float, Boolean, ForeignKey
+from datetime import datetime
+from sqlalchemy import Table, Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from app.query.database import Base
 
@@ -20,15 +21,24 @@ class Merchant(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     store_name = Column(String, nullable=False)
     verified = Column(Boolean, default=False)
+    # graus decimais (WGS84); lojas sem localização ficam fora de /merchants/nearby.
+    # O índice espacial é o R*Tree merchants_rtree (ver app/query/geo.py)
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
 
     user = relationship("User", backref="merchant")
 
+    # fila de verificação do admin (WHERE verified = 0 ORDER BY id)
+    __table_args__ = (Index("ix_merchants_verified_id", "verified", "id"),)
+
 # ---------- Product <-> Tag many-to-many ----------
 product_tag_table = Table(
     "product_tag",
     Base.metadata,
     Column("product_id", Integer, ForeignKey("products.id"), primary_key=True),
     Column("tag_id", Integer, ForeignKey("dietary_tags.id"), primary_key=True),
+    # filtro por tag: acha os produtos de uma tag sem tocar na tabela products
+    Index("ix_product_tag_tag_id_product_id", "tag_id", "product_id"),
 )
 
 # ---------- DietaryTag ----------
@@ -40,6 +50,15 @@ class DietaryTag(Base):
 
     products = relationship("Product", secondary=product_tag_table, back_populates="tags")
 
+# ---------- perfil alimentar do usuário ----------
+# tags que o produto precisa ter (todas) para servir ao usuário (GET /products/for-me)
+user_dietary_tag_table = Table(
+    "user_dietary_tags",
+    Base.metadata,
+    Column("user_id", Integer, ForeignKey("users.id"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("dietary_tags.id"), primary_key=True),
+)
+
 # ---------- Product ----------
 class Product(Base):
     __tablename__ = "products"
@@ -49,5 +68,134 @@ class Product(Base):
     description = Column(String, nullable=True)
     price = Column(Float, default=0.0)
     active = Column(Boolean, default=True)
+    # UTC; também muda quando as tags do produto mudam (ver catalogo.vincular_tags).
+    # Nulo nos produtos criados antes da coluna existir.
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=True)
 
     tags = relationship("DietaryTag", secondary=product_tag_table, back_populates="products")
+
+    # índices da paginação por cursor (keyset por id) do catálogo
+    # e da exportação incremental (updated_since)
+    __table_args__ = (
+        Index("ix_products_active_id", "active", "id"),
+        Index("ix_products_merchant_id_id", "merchant_id", "id"),
+        Index("ix_products_updated_at", "updated_at"),
+    )
+
+# ---------- modelo de leitura do catálogo ----------
+# uma linha por produto com o ProductOut já codificado em JSON (tags e nome da
+# loja incluídos), mantida pelas escritas na mesma transação (ver app/query/vitrine.py).
+# merchant_id, name e active repetem products para os filtros do catálogo
+class ProductView(Base):
+    __tablename__ = "product_views"
+    id = Column(Integer, primary_key=True)  # = products.id
+    merchant_id = Column(Integer, nullable=False)
+    name = Column(String, nullable=False)
+    active = Column(Boolean, nullable=False)
+    body = Column(LargeBinary, nullable=False)
+
+    __table_args__ = (
+        Index("ix_product_views_active_id", "active", "id"),
+        Index("ix_product_views_merchant_id_id", "merchant_id", "id"),
+    )
+
+# ---------- versões do catálogo ----------
+# contador por chave ("tags", ...) incrementado na mesma transação da escrita;
+# caches em memória de cada worker comparam com ele para saber se estão velhos
+class CatalogVersion(Base):
+    __tablename__ = "catalog_versions"
+    key = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+# ---------- contadores do painel do admin ----------
+# usuários por papel, lojas verificadas/pendentes, produtos ativos por loja e
+# por tag; somados pelas escritas na mesma transação (ver app/query/contadores.py).
+# ref_id = id da loja/tag nos contadores por entidade, 0 nos globais
+class AdminCounter(Base):
+    __tablename__ = "admin_counters"
+    name = Column(String, primary_key=True)
+    ref_id = Column(Integer, primary_key=True, default=0)
+    value = Column(Integer, nullable=False, default=0)
+
+    # maiores primeiro (lojas com mais produtos ativos), sem ordenar em memória
+    __table_args__ = (Index("ix_admin_counters_name_value", "name", "value", "ref_id"),)
+
+# ---------- log de mudanças do catálogo ----------
+# um evento do feed /ws/catalog por linha (ver app/query/eventos.py), gravado na
+# mesma transação da escrita. AUTOINCREMENT: o seq nunca é reaproveitado, nem
+# depois da poda do log
+class CatalogEvent(Base):
+    __tablename__ = "catalog_events"
+    seq = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)
+    merchant_id = Column(Integer, nullable=True)
+    tag_ids = Column(String, nullable=False, default="")  # ids separados por espaço
+    body = Column(LargeBinary, nullable=False)            # JSON do evento, sem o seq
+
+    __table_args__ = {"sqlite_autoincrement": True}
+
+# ---------- carrinho ----------
+# a cópia quente do carrinho fica na memória de cada worker e é gravada aqui em
+# lotes (ver app/cache/carrinhos.py). version sobe a cada gravação e no checkout:
+# é o controle de concorrência otimista entre workers
+class Cart(Base):
+    __tablename__ = "carts"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+# nome e preço de quando o item entrou no carrinho; o checkout confere com products
+class CartItem(Base):
+    __tablename__ = "cart_items"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    name = Column(String, nullable=False)
+    unit_price = Column(Float, nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+# ---------- pedidos ----------
+class Order(Base):
+    __tablename__ = "orders"
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    total = Column(Float, nullable=False)
+    status = Column(String, nullable=False, default="placed")
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    # pedidos do usuário, do mais novo para o mais antigo
+    __table_args__ = (Index("ix_orders_user_id_id", "user_id", "id"),)
+
+# cópia do produto no momento da compra: o pedido não muda se o produto mudar
+class OrderItem(Base):
+    __tablename__ = "order_items"
+    order_id = Column(Integer, ForeignKey("orders.id"), primary_key=True)
+    product_id = Column(Integer, ForeignKey("products.id"), primary_key=True)
+    merchant_id = Column(Integer, nullable=False)
+    name = Column(String, nullable=False)
+    unit_price = Column(Float, nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+# ---------- outbox ----------
+# efeitos de uma escrita que não precisam acontecer dentro do request, gravados
+# na mesma transação da mudança e processados depois (ver app/query/outbox.py).
+# key é a chave de idempotência: o mesmo efeito enfileirado duas vezes vira uma
+# mensagem só
+class OutboxMessage(Base):
+    __tablename__ = "outbox"
+    id = Column(Integer, primary_key=True)
+    topic = Column(String, nullable=False)
+    key = Column(String, nullable=False, unique=True)
+    payload = Column(LargeBinary, nullable=False)             # JSON
+    status = Column(String, nullable=False, default="pending")  # pending | done | dead
+    attempts = Column(Integer, nullable=False, default=0)
+    available_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = Column(DateTime, nullable=True)
+    last_error = Column(String, nullable=True)
+
+    __table_args__ = (
+        # próximas a processar (status = pending, available_at <= agora) e poda das concluídas
+        Index("ix_outbox_status_available_at", "status", "available_at", "id"),
+        Index("ix_outbox_status_processed_at", "status", "processed_at"),
+        {"sqlite_autoincrement": True},
+    )
@@ -0,0 +1,144 @@
+# app/query/busca.py
+"""
+Busca textual de produtos com SQLite FTS5.
+
+products_fts é uma tabela FTS5 de conteúdo externo espelhando products.name e
+products.description. Triggers no banco mantêm o índice sincronizado a cada
+INSERT/UPDATE/DELETE em products (create, PATCH e delete do produto.py entram
+na mesma transação). O tokenizer remove acentos, então "glúten" e "gluten"
+batem no mesmo termo.
+
+Reconstrução offline (bancos antigos ou índice divergente):
+    python -m app.query.busca rebuild
+"""
+import re
+import sys
+from typing import List, Optional
+
+from sqlalchemy import Connection, Engine, column, func, literal_column, select, table, text
+from sqlalchemy.orm import Session
+from app.modelos import models
+from app.query import catalogo
+
+
+FTS_TABLE = "products_fts"
+
+# pesos do bm25 por coluna: nome vale mais que descrição
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name,
+        description,
+        content='products',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# ---------- instalação / rebuild ----------
+def instalar(engine: Engine) -> None:
+    """
+    Cria a tabela FTS e os triggers se ainda não existirem.
+    Se a tabela acabou de ser criada num banco que já tinha produtos, popula o índice.
+    """
+    with engine.begin() as conn:
+        instalar_em(conn)
+
+def instalar_em(conn: Connection) -> None:
+    """instalar() dentro de uma transação já aberta."""
+    existed = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": FTS_TABLE},
+    ).first() is not None
+    for ddl in _DDL:
+        conn.execute(text(ddl))
+    if not existed:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+def rebuild(engine: Engine) -> None:
+    """Reconstrói o índice inteiro a partir da tabela products."""
+    with engine.begin() as conn:
+        for ddl in _DDL:
+            conn.execute(text(ddl))
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+
+# ---------- consulta ----------
+def montar_match(termos: str) -> Optional[str]:
+    """
+    Converte o texto digitado numa expressão MATCH segura: cada palavra vira
+    um termo entre aspas com prefixo (*), todos obrigatórios (AND implícito).
+    Devolve None se não sobrar nenhuma palavra.
+    """
+    tokens = _TOKEN_RE.findall(termos or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{t}"*' for t in tokens)
+
+def buscar(
+    db: Session,
+    termos: str,
+    *,
+    tag: Optional[str] = None,
+    active: Optional[bool] = None,
+    limit: int = catalogo.DEFAULT_PAGE_SIZE,
+    offset: int = 0,
+) -> List[bytes]:
+    """
+    Produtos que casam com `termos`, do mais relevante (bm25) para o menos,
+    já codificados no formato de ProductOut (product_views.body).
+    """
+    match = montar_match(termos)
+    if match is None:
+        return []
+    View = models.ProductView
+    fts = table(FTS_TABLE, column("rowid"))
+    fts_ref = literal_column(FTS_TABLE)
+    stmt = (
+        select(View.body)
+        .join(fts, fts.c.rowid == View.id)
+        .where(fts_ref.op("MATCH")(match))
+    )
+    stmt = catalogo.filtrar_produtos(stmt, tag=tag, active=active, modelo=View)
+    stmt = stmt.order_by(func.bm25(fts_ref, NAME_WEIGHT, DESCRIPTION_WEIGHT)).limit(limit).offset(offset)
+    return list(db.execute(stmt).scalars())
+
+
+# ---------- CLI ----------
+def main(argv: List[str]) -> int:
+    from app.query.database import engine
+
+    if argv[:1] != ["rebuild"]:
+        print("uso: python -m app.query.busca rebuild")
+        return 2
+    rebuild(engine)
+    print(f"{FTS_TABLE} reconstruída")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
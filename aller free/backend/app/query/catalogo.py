@@ -0,0 +1,239 @@
+# app/query/catalogo.py
+"""
+Consultas do catálogo de produtos executadas direto no banco.
+
+Os filtros (nome, tag, loja, active) e a ordenação ficam no SQL e a paginação
+é por cursor (keyset): cada página continua a partir do último id entregue,
+então o custo de uma página não depende de quantas páginas vieram antes.
+
+As leituras saem de product_views (ver app/query/vitrine.py): cada produto já
+está codificado no formato de ProductOut, então uma página é um SELECT numa
+tabela só e os corpos (bytes) vão direto para a resposta. Objetos ORM ficam
+para a escrita.
+"""
+import base64
+import binascii
+from dataclasses import dataclass, field
+from datetime import datetime
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+from app.modelos import models
+from app.esquemas import serializacao
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class CursorInvalido(ValueError):
+    """Cursor de paginação que não foi gerado por encode_cursor."""
+
+
+@dataclass
+class Pagina:
+    items: List[bytes] = field(default_factory=list)  # product_views.body de cada produto
+    next_cursor: Optional[str] = None
+
+
+# colunas de products na ordem que serializacao.produto espera
+COLUNAS = (
+    models.Product.id,
+    models.Product.merchant_id,
+    models.Product.name,
+    models.Product.description,
+    models.Product.price,
+    models.Product.active,
+)
+
+
+# ---------- cursor ----------
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode("ascii")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = int(base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii"))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise CursorInvalido(cursor)
+    if last_id < 0:
+        raise CursorInvalido(cursor)
+    return last_id
+
+
+# ---------- carregamento ----------
+def com_tags():
+    """
+    Carrega as tags de todos os produtos do resultado num único SELECT ... IN,
+    em vez de um lazy-load por produto na serialização do ProductOut.
+    """
+    return selectinload(models.Product.tags)
+
+def _consulta_tags(product_ids: List[int]):
+    pt = models.product_tag_table
+    tag = models.DietaryTag.__table__
+    return (
+        select(pt.c.product_id, tag.c.id, tag.c.code, tag.c.label)
+        .join(tag, tag.c.id == pt.c.tag_id)
+        .where(pt.c.product_id.in_(product_ids))
+        .order_by(pt.c.product_id, tag.c.id)
+    )
+
+def _agrupar_tags(rows) -> Dict[int, List[Dict[str, Any]]]:
+    por_produto = defaultdict(list)
+    for product_id, tag_id, code, label in rows:
+        por_produto[product_id].append(serializacao.tag(tag_id, code, label))
+    return por_produto
+
+def tags_dos_produtos(db, product_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """
+    Tags (já como dicts de TagOut) dos produtos dados, num SELECT só.
+    Aceita Session ou Connection.
+    """
+    if not product_ids:
+        return {}
+    return _agrupar_tags(db.execute(_consulta_tags(product_ids)).all())
+
+
+# ---------- filtros ----------
+def filtrar_produtos(
+    stmt,
+    *,
+    q: Optional[str] = None,
+    tag: Optional[str] = None,
+    merchant_id: Optional[int] = None,
+    active: Optional[bool] = None,
+    modelo=models.Product,
+):
+    """
+    Aplica os filtros do catálogo a um select que tenha `modelo` no FROM
+    (models.Product ou models.ProductView, que têm as mesmas colunas de filtro).
+    A tag é resolvida pelo índice (tag_id, product_id) de product_tag.
+    """
+    Product = modelo
+    if merchant_id is not None:
+        stmt = stmt.where(Product.merchant_id == merchant_id)
+    if active is not None:
+        stmt = stmt.where(Product.active == active)
+    if q:
+        # lower()/LIKE do SQLite só dobram ASCII ("pão" não acharia "PÃO"):
+        # minusculas é o str.lower do Python, registrada em cada conexão
+        # (app/query/database.py), e instr não tem curinga para escapar
+        stmt = stmt.where(func.instr(func.minusculas(Product.name), q.lower()) > 0)
+    if tag:
+        pt = models.product_tag_table
+        tag_ids = select(models.DietaryTag.id).where(models.DietaryTag.code == tag)
+        stmt = stmt.where(
+            Product.id.in_(select(pt.c.product_id).where(pt.c.tag_id.in_(tag_ids)))
+        )
+    return stmt
+
+
+# ---------- página ----------
+def _consulta_pagina(*, q, tag, merchant_id, active, cursor, limit):
+    View = models.ProductView
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    stmt = filtrar_produtos(select(View.id, View.body), q=q, tag=tag, merchant_id=merchant_id, active=active, modelo=View)
+    if cursor:
+        stmt = stmt.where(View.id > decode_cursor(cursor))
+    return stmt.order_by(View.id).limit(limit + 1), limit
+
+def _cortar(rows: list, limit: int) -> Pagina:
+    """Descarta a linha extra (limit + 1); rows = (id, body)."""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0])
+    return Pagina(items=[r[1] for r in rows], next_cursor=next_cursor)
+
+def buscar_produtos(
+    db: Session,
+    *,
+    q: Optional[str] = None,
+    tag: Optional[str] = None,
+    merchant_id: Optional[int] = None,
+    active: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Pagina:
+    """
+    Devolve uma página de produtos ordenada por id.
+    Busca limit + 1 linhas só para saber se existe próxima página.
+    """
+    stmt, limit = _consulta_pagina(q=q, tag=tag, merchant_id=merchant_id, active=active, cursor=cursor, limit=limit)
+    return _cortar(db.execute(stmt).all(), limit)
+
+async def buscar_produtos_async(
+    db: AsyncSession,
+    *,
+    q: Optional[str] = None,
+    tag: Optional[str] = None,
+    merchant_id: Optional[int] = None,
+    active: Optional[bool] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> Pagina:
+    """Mesma consulta de buscar_produtos, numa AsyncSession."""
+    stmt, limit = _consulta_pagina(q=q, tag=tag, merchant_id=merchant_id, active=active, cursor=cursor, limit=limit)
+    return _cortar((await db.execute(stmt)).all(), limit)
+
+async def produto_async(db: AsyncSession, product_id: int) -> Optional[bytes]:
+    """Um produto já codificado no formato de ProductOut, ou None."""
+    View = models.ProductView
+    return (await db.execute(select(View.body).where(View.id == product_id))).scalar_one_or_none()
+
+def produtos_por_ids(db: Session, product_ids: List[int]) -> List[bytes]:
+    """Produtos codificados dos ids dados (ex.: página vinda do índice de tags), ordenados por id."""
+    if not product_ids:
+        return []
+    View = models.ProductView
+    return list(db.execute(select(View.body).where(View.id.in_(product_ids)).order_by(View.id)).scalars())
+
+
+# ---------- escrita de tags ----------
+def vincular_tags(db: Session, product_id: int, tag_ids: List[int], substituir: bool = False) -> None:
+    """
+    Grava as associações product_tag direto pelos ids (já resolvidos no registro
+    de tags), sem carregar os objetos DietaryTag. Não comita.
+    """
+    pt = models.product_tag_table
+    if substituir:
+        db.execute(delete(pt).where(pt.c.product_id == product_id))
+        existentes = set()
+    else:
+        existentes = set(db.execute(select(pt.c.tag_id).where(pt.c.product_id == product_id)).scalars())
+    novos = [tag_id for tag_id in dict.fromkeys(tag_ids) if tag_id not in existentes]
+    if novos:
+        db.execute(insert(pt), [{"product_id": product_id, "tag_id": tag_id} for tag_id in novos])
+    if substituir or novos:
+        tocar(db, product_id)
+
+def desvincular_tag(db: Session, product_id: int, tag_id: int) -> None:
+    pt = models.product_tag_table
+    result = db.execute(delete(pt).where(pt.c.product_id == product_id, pt.c.tag_id == tag_id))
+    if result.rowcount:
+        tocar(db, product_id)
+
+def tocar(db: Session, product_id: int) -> None:
+    """Marca o produto como alterado (updated_at) quando só as tags mudaram."""
+    db.execute(
+        update(models.Product)
+        .where(models.Product.id == product_id)
+        .values(updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+def tocar_varios(db: Session, product_ids: Iterable[int]) -> None:
+    """tocar() de vários produtos num UPDATE só."""
+    product_ids = list(product_ids)
+    if product_ids:
+        db.execute(
+            update(models.Product)
+            .where(models.Product.id.in_(product_ids))
+            .values(updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
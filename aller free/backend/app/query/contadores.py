@@ -0,0 +1,197 @@
+# app/query/contadores.py
+"""
+Contadores do painel do admin (tabela admin_counters).
+
+Contar usuários por papel, lojas pendentes ou produtos ativos por loja/tag
+era um COUNT com GROUP BY sobre a tabela inteira a cada abertura do painel.
+Aqui cada número é uma linha (name, ref_id) -> value, somada pelas próprias
+escritas, antes do commit e na mesma transação:
+
+- usuario(db, role) no register; papel(db, antes, depois) quando o papel muda;
+- loja_criada(db) e lojas_verificadas(db, n);
+- produtos(db, mudancas): com o que vitrine.atualizar devolveu, o mesmo que
+  vai para o feed. Cada corpo ativo antes conta -1 na loja e em cada tag dele,
+  cada corpo ativo depois conta +1: criação, edição, troca de tags, exclusão,
+  lote, importação e tag apagada caem no mesmo caminho.
+
+Linhas por loja/tag que chegam a zero são apagadas: o painel lista só quem
+tem produto ativo.
+
+Deriva (escrita direta no banco, bug numa rota):
+    python -m app.query.contadores check     # compara com as tabelas de origem
+    python -m app.query.contadores repair    # recalcula tudo (GROUP BY) e regrava
+"""
+import sys
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.modelos import models
+from app.query.vitrine import Mudanca
+
+
+LOJAS_VERIFICADAS = "merchants:verified"
+LOJAS_PENDENTES = "merchants:unverified"
+PRODUTOS_ATIVOS = "products:active"
+# ref_id = merchant_id / tag_id
+ATIVOS_POR_LOJA = "products:active:merchant"
+ATIVOS_POR_TAG = "products:active:tag"
+POR_ENTIDADE = (ATIVOS_POR_LOJA, ATIVOS_POR_TAG)
+
+PAPEIS = ("client", "merchant", "admin")
+
+def usuarios(role: Optional[str]) -> str:
+    return f"users:{role or 'client'}"
+
+_contadores = models.AdminCounter.__table__
+
+Chave = Tuple[str, int]
+
+
+# ---------- escrita (mesma transação da mudança) ----------
+def somar(db, deltas: Dict[Chave, int]) -> None:
+    """Soma os deltas (cria a linha na primeira vez) num executemany só. Não comita."""
+    linhas = [{"name": name, "ref_id": ref_id, "value": n} for (name, ref_id), n in deltas.items() if n]
+    if not linhas:
+        return
+    stmt = sqlite_insert(_contadores)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_contadores.c.name, _contadores.c.ref_id],
+        set_={"value": _contadores.c.value + stmt.excluded.value},
+    )
+    db.execute(stmt, linhas)
+    if any(linha["name"] in POR_ENTIDADE for linha in linhas):
+        db.execute(delete(_contadores).where(_contadores.c.name.in_(POR_ENTIDADE), _contadores.c.value == 0))
+
+def usuario(db, role: Optional[str]) -> None:
+    somar(db, {(usuarios(role), 0): 1})
+
+def papel(db, antes: Optional[str], depois: Optional[str]) -> None:
+    if usuarios(antes) != usuarios(depois):
+        somar(db, {(usuarios(antes), 0): -1, (usuarios(depois), 0): 1})
+
+def loja_criada(db) -> None:
+    somar(db, {(LOJAS_PENDENTES, 0): 1})
+
+def lojas_verificadas(db, n: int) -> None:
+    somar(db, {(LOJAS_VERIFICADAS, 0): n, (LOJAS_PENDENTES, 0): -n})
+
+def produtos(db, mudancas: Iterable[Mudanca]) -> None:
+    deltas: Counter = Counter()
+    for m in mudancas:
+        for corpo, sinal in ((m.antes, -1), (m.depois, 1)):
+            if corpo is None:
+                continue
+            produto = orjson.loads(corpo)
+            if not produto["active"]:
+                continue
+            deltas[(PRODUTOS_ATIVOS, 0)] += sinal
+            deltas[(ATIVOS_POR_LOJA, produto["merchant_id"])] += sinal
+            for tag in produto["tags"]:
+                deltas[(ATIVOS_POR_TAG, tag["id"])] += sinal
+    somar(db, deltas)
+
+
+# ---------- leitura ----------
+async def ler_async(db: AsyncSession, names: Iterable[str]) -> Dict[str, int]:
+    """Contadores globais (ref_id 0) pelo nome; 0 para os que não existem."""
+    names = list(names)
+    stmt = select(_contadores.c.name, _contadores.c.value).where(
+        _contadores.c.name.in_(names), _contadores.c.ref_id == 0
+    )
+    encontrados = dict((await db.execute(stmt)).all())
+    return {name: encontrados.get(name, 0) for name in names}
+
+async def por_ref_async(db: AsyncSession, name: str) -> Dict[int, int]:
+    """ref_id -> value de um contador por entidade (só os diferentes de zero)."""
+    stmt = select(_contadores.c.ref_id, _contadores.c.value).where(_contadores.c.name == name)
+    return dict((await db.execute(stmt)).all())
+
+async def maiores_async(db: AsyncSession, name: str, limit: int, offset: int = 0) -> List[Tuple[int, int]]:
+    """(ref_id, value) em ordem decrescente de value (índice name, value, ref_id)."""
+    stmt = (
+        select(_contadores.c.ref_id, _contadores.c.value)
+        .where(_contadores.c.name == name)
+        .order_by(_contadores.c.value.desc(), _contadores.c.ref_id.desc())
+        .limit(limit).offset(offset)
+    )
+    return (await db.execute(stmt)).all()
+
+
+# ---------- conferência / reconstrução ----------
+def calcular(conn) -> Dict[Chave, int]:
+    """Todos os contadores a partir das tabelas de origem (GROUP BY; uso offline)."""
+    User, Merchant, Product = models.User, models.Merchant, models.Product
+    pt = models.product_tag_table
+    esperado: Dict[Chave, int] = {}
+    for role, n in conn.execute(select(User.role, func.count()).group_by(User.role)):
+        chave = (usuarios(role), 0)
+        esperado[chave] = esperado.get(chave, 0) + n
+    for verified, n in conn.execute(select(Merchant.verified, func.count()).group_by(Merchant.verified)):
+        chave = (LOJAS_VERIFICADAS if verified else LOJAS_PENDENTES, 0)
+        esperado[chave] = esperado.get(chave, 0) + n
+    ativos = Product.active.is_(True)
+    esperado[(PRODUTOS_ATIVOS, 0)] = conn.execute(select(func.count()).where(ativos)).scalar_one()
+    for merchant_id, n in conn.execute(
+        select(Product.merchant_id, func.count()).where(ativos).group_by(Product.merchant_id)
+    ):
+        esperado[(ATIVOS_POR_LOJA, merchant_id)] = n
+    for tag_id, n in conn.execute(
+        select(pt.c.tag_id, func.count())
+        .join(Product, Product.id == pt.c.product_id)
+        .where(ativos)
+        .group_by(pt.c.tag_id)
+    ):
+        esperado[(ATIVOS_POR_TAG, tag_id)] = n
+    return {chave: n for chave, n in esperado.items() if n}
+
+def verificar(conn) -> Dict[Chave, Tuple[int, int]]:
+    """Contadores divergentes: chave -> (gravado, esperado)."""
+    esperado = calcular(conn)
+    gravado = {
+        (name, ref_id): value
+        for name, ref_id, value in conn.execute(select(_contadores.c.name, _contadores.c.ref_id, _contadores.c.value))
+        if value
+    }
+    return {
+        chave: (gravado.get(chave, 0), esperado.get(chave, 0))
+        for chave in gravado.keys() | esperado.keys()
+        if gravado.get(chave, 0) != esperado.get(chave, 0)
+    }
+
+def reconstruir(conn) -> int:
+    """Regrava a tabela inteira. Devolve quantos contadores ficaram."""
+    esperado = calcular(conn)
+    conn.execute(delete(_contadores))
+    if esperado:
+        conn.execute(
+            insert(_contadores),
+            [{"name": name, "ref_id": ref_id, "value": n} for (name, ref_id), n in esperado.items()],
+        )
+    return len(esperado)
+
+
+# ---------- CLI ----------
+def main(argv: List[str]) -> int:
+    from app.query.database import engine
+
+    comando = argv[0] if argv else ""
+    if comando in ("check", "repair"):
+        # BEGIN IMMEDIATE do escritor: nenhuma escrita entra entre o cálculo e a gravação
+        with engine.begin() as conn:
+            divergentes = verificar(conn)
+            print(f"{len(divergentes)} contadores divergentes")
+            for (name, ref_id), (gravado, esperado) in sorted(divergentes.items())[:20]:
+                print(f"  {name}[{ref_id}]: gravado {gravado}, esperado {esperado}")
+            if comando == "repair" and divergentes:
+                print(f"admin_counters recalculada ({reconstruir(conn)} contadores)")
+                return 0
+        return 1 if divergentes else 0
+    print("uso: python -m app.query.contadores [check | repair]")
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,19 +1,188 @@
 import os
-from sqlalchemy import create_engine
+from dataclasses import dataclass
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from app.query import instrumentacao, metricas
 
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_PATH = os.path.join(BASE_DIR, "database.db")
-DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+# DATABASE_URL do ambiente tem prioridade sobre o database.db ao lado deste arquivo
+DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{DATABASE_PATH}")
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# só SQLite: FTS5, R*Tree, os PRAGMAs abaixo, BEGIN IMMEDIATE e os INSERT ...
+# ON CONFLICT de versoes/contadores/pedidos/outbox (dialeto sqlite) não têm
+# equivalente aqui para outro banco
+if make_url(DATABASE_URL).get_backend_name() != "sqlite":
+    raise RuntimeError(f"DATABASE_URL precisa ser SQLite: {make_url(DATABASE_URL).render_as_string()}")
+
+
+# ---------- perfil do SQLite ----------
+@dataclass(frozen=True)
+class PerfilSQLite:
+    """
+    PRAGMAs aplicados em toda conexão nova. Cada campo pode vir do ambiente
+    (SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE_KIB, SQLITE_READ_POOL_SIZE,
+    SQLITE_READ_POOL_OVERFLOW).
+    """
+    journal_mode: str = "WAL"          # leitores não bloqueiam o escritor e vice-versa
+    synchronous: str = "NORMAL"        # seguro com WAL; fsync só no checkpoint
+    busy_timeout_ms: int = 5000        # espera pelo lock em vez de "database is locked"
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size_kib: int = 64 * 1024
+    read_pool_size: int = 8
+    # conexões extras de leitura para os handlers sync: com folga do tamanho do
+    # threadpool do AnyIO (40), nenhum thread fica parado esperando conexão
+    read_pool_overflow: int = 40
+
+    @classmethod
+    def do_ambiente(cls) -> "PerfilSQLite":
+        padrao = cls()
+        return cls(
+            journal_mode=os.getenv("SQLITE_JOURNAL_MODE", padrao.journal_mode),
+            synchronous=os.getenv("SQLITE_SYNCHRONOUS", padrao.synchronous),
+            busy_timeout_ms=int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", padrao.busy_timeout_ms)),
+            mmap_size=int(os.getenv("SQLITE_MMAP_SIZE", padrao.mmap_size)),
+            cache_size_kib=int(os.getenv("SQLITE_CACHE_SIZE_KIB", padrao.cache_size_kib)),
+            read_pool_size=int(os.getenv("SQLITE_READ_POOL_SIZE", padrao.read_pool_size)),
+            read_pool_overflow=int(os.getenv("SQLITE_READ_POOL_OVERFLOW", padrao.read_pool_overflow)),
+        )
+
+    def pragmas(self, somente_leitura: bool) -> list:
+        pragmas = [
+            f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}",
+            f"PRAGMA synchronous = {self.synchronous}",
+            f"PRAGMA mmap_size = {int(self.mmap_size)}",
+            f"PRAGMA cache_size = {-int(self.cache_size_kib)}",  # negativo = KiB
+        ]
+        if somente_leitura:
+            pragmas.append("PRAGMA query_only = ON")
+        else:
+            # journal_mode fica gravado no arquivo; basta o escritor pedir
+            pragmas.insert(0, f"PRAGMA journal_mode = {self.journal_mode}")
+        return pragmas
+
+
+PERFIL = PerfilSQLite.do_ambiente()
+
+def _eh_sqlite_em_arquivo(url) -> bool:
+    return url.database not in (None, "", ":memory:")
+
+def _criar_engine(url: str, somente_leitura: bool):
+    em_arquivo = _eh_sqlite_em_arquivo(make_url(url))
+    kwargs = {"connect_args": {"check_same_thread": False}}
+    if em_arquivo:
+        # QueuePool que mede a espera no checkout (db_pool_checkout_seconds em /metrics)
+        kwargs["poolclass"] = metricas.pool_medido(QueuePool, "read" if somente_leitura else "write")
+        if somente_leitura:
+            kwargs.update(pool_size=PERFIL.read_pool_size, max_overflow=PERFIL.read_pool_overflow, pool_timeout=30)
+        else:
+            # escritor: uma conexão só, então as transações de escrita do processo
+            # entram em fila no pool em vez de disputar o lock do arquivo
+            kwargs.update(pool_size=1, max_overflow=0, pool_timeout=30)
+    eng = create_engine(url, **kwargs)
+    _instalar_perfil(eng, em_arquivo, somente_leitura)
+    return eng
+
+def _minusculas(texto):
+    return texto.lower() if texto is not None else None
+
+def _instalar_perfil(eng, em_arquivo: bool, somente_leitura: bool) -> None:
+    """PRAGMAs na conexão nova + BEGIN explícito (vale para engine sync e async.sync_engine)."""
+
+    @event.listens_for(eng, "connect")
+    def _on_connect(dbapi_conn, _record):
+        # controle de transação fica com o SQLAlchemy (ver _on_begin)
+        dbapi_conn.isolation_level = None
+        # lower() do SQLite só conhece ASCII; o filtro por nome usa esta
+        dbapi_conn.create_function("minusculas", 1, _minusculas, deterministic=True)
+        cursor = dbapi_conn.cursor()
+        for pragma in (PERFIL.pragmas(somente_leitura) if em_arquivo else []):
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(eng, "begin")
+    def _on_begin(conn):
+        # escrita pega o lock já no BEGIN: sem upgrade de leitura->escrita no meio
+        # da transação, que no SQLite falha na hora sem respeitar busy_timeout
+        conn.exec_driver_sql("BEGIN" if somente_leitura else "BEGIN IMMEDIATE")
+
+    instrumentacao.instalar(eng)  # contagem de SQL por request (ver APP_DEBUG)
+
+
+engine = _criar_engine(DATABASE_URL, somente_leitura=False)
+if not _eh_sqlite_em_arquivo(make_url(DATABASE_URL)):
+    read_engine = engine  # :memory: não é compartilhado entre conexões
+else:
+    read_engine = _criar_engine(DATABASE_URL, somente_leitura=True)
+
+# expire_on_commit=False no escritor: o que a transação gravou continua carregado
+# depois do commit. Reler (refresh) abriria outra transação, com BEGIN IMMEDIATE,
+# só para devolver o que o handler já sabe
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
-def get_db():
+# ---------- engine async (aiosqlite) ----------
+# usado pelos GETs do catálogo que já são "async def"; o resto continua no sync
+def _url_async(url: str) -> str:
+    return make_url(url).set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _url_async(DATABASE_URL))
+
+def _criar_async_engine(url: str):
+    em_arquivo = _eh_sqlite_em_arquivo(make_url(url))
+    kwargs = {
+        "pool_size": PERFIL.read_pool_size,
+        "max_overflow": 0,
+        "poolclass": metricas.pool_medido(AsyncAdaptedQueuePool, "async_read"),
+    } if em_arquivo else {}
+    eng = create_async_engine(url, **kwargs)
+    _instalar_perfil(eng.sync_engine, em_arquivo, somente_leitura=True)
+    return eng
+
+async_read_engine = _criar_async_engine(ASYNC_DATABASE_URL)
+# expire_on_commit=False: objeto carregado não pode disparar I/O implícito fora de um await
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+
+async def fechar_async() -> None:
+    # as conexões do aiosqlite têm thread própria (não-daemon): fechar no shutdown
+    await async_read_engine.dispose()
+
+# === DB session dependencies ===
+# get_write_db: mutações (pool do escritor, uma transação por vez)
+# get_read_db: GETs (pool de conexões query_only)
+# get_async_read_db: GETs "async def" do catálogo (AsyncSession, mesmo perfil)
+#
+# get_write_db/get_read_db são geradores async de propósito: o FastAPI roda o
+# teardown de dependência sync no threadpool, e com o pool de conexões limitado
+# isso trava (todos os threads esperando conexão, e a conexão só volta quando um
+# thread livre rodar o db.close()). Aqui o close roda direto no event loop.
+# Pelo mesmo motivo os handlers sync fecham a sessão logo depois da última
+# consulta: a sessão segura a conexão até o fim da transação, e entre o handler
+# e a serialização (que também roda no threadpool) o request troca de thread.
+# close() não expira nada: os objetos já carregados continuam servindo a resposta.
+async def get_write_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+async def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+# nome antigo, mantido para o código que ainda não escolheu leitura/escrita
+get_db = get_write_db
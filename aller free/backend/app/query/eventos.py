@@ -0,0 +1,174 @@
+# app/query/eventos.py
+"""
+Log de mudanças do catálogo (tabela catalog_events), lido pelo feed /ws/catalog
+(app/cache/canal.py).
+
+As escritas chamam, antes do commit e na mesma transação da mudança,
+
+- produtos(db, mudancas): com o que vitrine.atualizar devolveu. Produto novo
+  vira product.created (com o ProductOut inteiro), alterado vira
+  product.updated (só os campos que mudaram), apagado vira product.deleted.
+  Mais de CATALOG_FEED_MAX_PER_WRITE produtos numa escrita (lote grande,
+  importação) viram um products.bulk por loja: o cliente recarrega a loja;
+- tag(db, tipo, tag): tag criada, renomeada ou apagada. Os produtos com a tag
+  não geram evento próprio: o cliente aplica o novo label (ou tira a tag) nos
+  produtos que já tem;
+- loja(db, tipo, merchant) / lojas(db, tipo, merchants): loja criada ou
+  verificada; localizacao(db, merchant): loja mudou de lugar.
+
+Cada evento é uma linha com seq (AUTOINCREMENT), as colunas que os filtros de
+assinatura usam (merchant_id e os ids de tag, antes e depois da mudança) e o
+corpo JSON já codificado, sem o seq: o canal põe o seq na frente sem recodificar.
+
+O log é limitado aos últimos CATALOG_FEED_RETAIN eventos. A poda não roda no
+request: a gravação que passa de um bloco de RETER // 10 seqs enfileira no
+outbox (tópico catalog_events.prune) o corte, e o trabalhador apaga depois do
+commit. Entre um corte e outro o log pode ter até um bloco a mais. Cliente que
+volta com um seq mais antigo que o início do log recebe {"type": "reset"} e
+recarrega as listas.
+"""
+import os
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import orjson
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.modelos import models
+from app.query import outbox
+from app.query.vitrine import Mudanca
+
+
+RETER = int(os.getenv("CATALOG_FEED_RETAIN", "10000"))
+MAX_POR_ESCRITA = int(os.getenv("CATALOG_FEED_MAX_PER_WRITE", "200"))
+
+PRODUTO_CRIADO = "product.created"
+PRODUTO_ALTERADO = "product.updated"
+PRODUTO_APAGADO = "product.deleted"
+PRODUTOS_EM_MASSA = "products.bulk"
+TAG_CRIADA = "tag.created"
+TAG_ALTERADA = "tag.updated"
+TAG_APAGADA = "tag.deleted"
+LOJA_CRIADA = "merchant.created"
+LOJA_VERIFICADA = "merchant.verified"
+LOJA_MOVIDA = "merchant.moved"
+
+PODAR = "catalog_events.prune"
+
+_eventos = models.CatalogEvent.__table__
+COLUNAS = (_eventos.c.seq, _eventos.c.kind, _eventos.c.merchant_id, _eventos.c.tag_ids, _eventos.c.body)
+
+
+# ---------- aviso depois do commit ----------
+# o canal do worker se registra aqui: um commit deste processo que gravou
+# eventos acorda a leitura do log sem esperar o próximo poll
+_ouvintes: List[Callable[[], None]] = []
+
+def ao_commit(fn: Callable[[], None]) -> None:
+    _ouvintes.append(fn)
+
+def _avisar(_session) -> None:
+    for fn in _ouvintes:
+        fn()
+
+
+# ---------- gravação ----------
+def _linha(tipo: str, corpo: Dict, merchant_id: Optional[int] = None, tag_ids: Iterable[int] = ()) -> Dict:
+    return {
+        "kind": tipo,
+        "merchant_id": merchant_id,
+        "tag_ids": " ".join(map(str, sorted(set(tag_ids)))),
+        "body": orjson.dumps({"type": tipo, **corpo}),
+    }
+
+def gravar(db, linhas: List[Dict]) -> None:
+    """Insere os eventos e, passando de um bloco, enfileira a poda. Aceita Session ou Connection. Não comita."""
+    if not linhas:
+        return
+    db.execute(insert(_eventos), linhas)
+    ultimo = db.execute(select(func.max(_eventos.c.seq))).scalar()
+    if ultimo > RETER:
+        # uma mensagem por bloco: as outras gravações do mesmo bloco caem na chave repetida
+        bloco = max(1, RETER // 10)
+        outbox.enfileirar(db, PODAR, f"{PODAR}:{ultimo // bloco}", {"ate": ultimo - RETER})
+    if isinstance(db, Session) and "eventos" not in db.info:
+        db.info["eventos"] = True
+        event.listen(db, "after_commit", _avisar)
+
+@outbox.tratador(PODAR)
+def _podar(db: Session, mensagem: outbox.Mensagem) -> None:
+    # o seq só cresce: a poda é um corte por faixa da PK
+    db.execute(delete(_eventos).where(_eventos.c.seq <= mensagem.payload["ate"]))
+
+def _tags(corpo: Dict) -> List[int]:
+    return [t["id"] for t in corpo["tags"]]
+
+def produtos(db, mudancas: Sequence[Mudanca]) -> None:
+    if len(mudancas) > MAX_POR_ESCRITA:
+        gravar(db, _em_massa(mudancas))
+        return
+    linhas = []
+    for m in mudancas:
+        antes = orjson.loads(m.antes) if m.antes is not None else None
+        depois = orjson.loads(m.depois) if m.depois is not None else None
+        if antes is None:
+            corpo = {"id": m.id, "merchant_id": depois["merchant_id"], "product": depois}
+            linhas.append(_linha(PRODUTO_CRIADO, corpo, depois["merchant_id"], _tags(depois)))
+        elif depois is None:
+            corpo = {"id": m.id, "merchant_id": antes["merchant_id"]}
+            linhas.append(_linha(PRODUTO_APAGADO, corpo, antes["merchant_id"], _tags(antes)))
+        else:
+            campos = {k: v for k, v in depois.items() if antes.get(k) != v}
+            corpo = {"id": m.id, "merchant_id": depois["merchant_id"], "changes": campos}
+            linhas.append(_linha(PRODUTO_ALTERADO, corpo, depois["merchant_id"], _tags(antes) + _tags(depois)))
+    gravar(db, linhas)
+
+def _em_massa(mudancas: Sequence[Mudanca]) -> List[Dict]:
+    """Um products.bulk por loja, com as contagens e as tags envolvidas."""
+    contagens: Dict[int, Dict[str, int]] = defaultdict(lambda: {"created": 0, "updated": 0, "deleted": 0})
+    tags: Dict[int, set] = defaultdict(set)
+    for m in mudancas:
+        corpos = [orjson.loads(c) for c in (m.antes, m.depois) if c is not None]
+        merchant_id = corpos[-1]["merchant_id"]
+        for corpo in corpos:
+            tags[merchant_id].update(_tags(corpo))
+        chave = "created" if m.antes is None else "deleted" if m.depois is None else "updated"
+        contagens[merchant_id][chave] += 1
+    return [
+        _linha(PRODUTOS_EM_MASSA, {"merchant_id": merchant_id, **contagem}, merchant_id, tags[merchant_id])
+        for merchant_id, contagem in contagens.items()
+    ]
+
+def tag(db, tipo: str, dietary_tag: models.DietaryTag) -> None:
+    t = dietary_tag
+    gravar(db, [_linha(tipo, {"tag": {"id": t.id, "code": t.code, "label": t.label}}, tag_ids=[t.id])])
+
+def loja(db, tipo: str, merchant: models.Merchant) -> None:
+    lojas(db, tipo, [merchant])
+
+def lojas(db, tipo: str, merchants: Iterable) -> None:
+    """Um evento por loja; aceita objetos ORM ou linhas com id, store_name e verified."""
+    gravar(db, [
+        _linha(tipo, {"merchant": {"id": m.id, "store_name": m.store_name, "verified": bool(m.verified)}}, m.id)
+        for m in merchants
+    ])
+
+def localizacao(db, merchant: models.Merchant) -> None:
+    m = merchant
+    gravar(db, [_linha(LOJA_MOVIDA, {"merchant": {"id": m.id, "latitude": m.latitude, "longitude": m.longitude}}, m.id)])
+
+
+# ---------- leitura ----------
+async def ultimo_seq_async(db: AsyncSession) -> int:
+    return (await db.execute(select(func.max(_eventos.c.seq)))).scalar_one_or_none() or 0
+
+async def limites_async(db: AsyncSession) -> Tuple[Optional[int], Optional[int]]:
+    """Menor e maior seq ainda no log ((None, None) se vazio)."""
+    menor, maior = (await db.execute(select(func.min(_eventos.c.seq), func.max(_eventos.c.seq)))).one()
+    return menor, maior
+
+async def desde_async(db: AsyncSession, seq: int, limite: int) -> List[Tuple]:
+    """Eventos com seq > `seq`, em ordem: (seq, kind, merchant_id, tag_ids, body)."""
+    stmt = select(*COLUNAS).where(_eventos.c.seq > seq).order_by(_eventos.c.seq).limit(limite)
+    return (await db.execute(stmt)).all()
@@ -0,0 +1,117 @@
+# app/query/exportacao.py
+"""
+Exportação do catálogo em streaming (NDJSON ou CSV).
+
+As linhas de products vêm do banco em blocos de CHUNK_SIZE (yield_per) e as
+tags de cada bloco num único SELECT ... IN, então a memória fica no tamanho de
+um bloco, qualquer que seja o catálogo. Cada bloco já sai codificado para o
+StreamingResponse. Tudo roda numa transação de leitura só, ou seja, o arquivo
+inteiro é um retrato consistente do catálogo.
+
+O CSV usa as mesmas colunas da importação (tags separadas por "|"), então um
+export pode ser reimportado em outra loja.
+"""
+import csv
+import io
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+
+from sqlalchemy import Connection, String, select, type_coerce
+from app.modelos import models
+from app.query import catalogo
+from app.esquemas import serializacao
+from app.query.database import ReadSessionLocal
+from app.query.importacao import SEPARADOR_TAGS
+
+
+CHUNK_SIZE = 1000
+
+FORMATOS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+COLUNAS_CSV = ["id", "merchant_id", "name", "description", "price", "active", "tags", "updated_at"]
+
+
+def _utc(valor: Optional[datetime]) -> Optional[datetime]:
+    # updated_at é gravado em UTC sem fuso
+    if valor is not None and valor.tzinfo is not None:
+        return valor.astimezone(timezone.utc).replace(tzinfo=None)
+    return valor
+
+def _consulta(*, merchant_id, tag, active, updated_since):
+    # Core (colunas da Table, executado na Connection): sem o custo do ORM por linha
+    Product = models.Product
+    cols = Product.__table__.c
+    lojas = models.Merchant.__table__.c
+    # updated_at sai como o texto gravado pelo SQLite: o parse para datetime de
+    # cada linha custaria mais que a serialização inteira
+    stmt = select(
+        cols.id, cols.merchant_id, cols.name, cols.description, cols.price, cols.active,
+        type_coerce(cols.updated_at, String).label("updated_at"),
+        lojas.store_name,  # o registro do NDJSON tem o mesmo formato de ProductOut
+    ).join(models.Merchant.__table__, lojas.id == cols.merchant_id)
+    stmt = catalogo.filtrar_produtos(stmt, tag=tag, merchant_id=merchant_id, active=active)
+    if updated_since is not None:
+        stmt = stmt.where(Product.updated_at >= _utc(updated_since))
+    return stmt.order_by(Product.id).execution_options(yield_per=CHUNK_SIZE)
+
+def _blocos(conn: Connection, stmt) -> Iterator[tuple]:
+    for bloco in conn.execute(stmt).partitions():
+        yield bloco, catalogo.tags_dos_produtos(conn, [r.id for r in bloco])
+
+def _iso(valor: Optional[str]) -> Optional[str]:
+    # "2024-01-31 12:00:00.000000" -> "2024-01-31T12:00:00.000000"
+    return valor.replace(" ", "T", 1) if valor else None
+
+
+# ---------- codificação ----------
+def _ndjson(conn: Connection, stmt) -> Iterator[bytes]:
+    for bloco, tags in _blocos(conn, stmt):
+        linhas = []
+        for row in bloco:
+            item = serializacao.produto(row, tags.get(row[0], []), row[7])
+            item["updated_at"] = _iso(row[6])
+            linhas.append(serializacao.dumps(item))
+        yield b"\n".join(linhas) + b"\n"
+
+def _csv(conn: Connection, stmt) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUNAS_CSV)
+    for bloco, tags in _blocos(conn, stmt):
+        writer.writerows(
+            [
+                id_, merchant_id, name, description or "", price, int(bool(active)),
+                SEPARADOR_TAGS.join(t["code"] for t in tags.get(id_, [])),
+                _iso(updated_at) or "",
+            ]
+            for id_, merchant_id, name, description, price, active, updated_at, _store_name in bloco
+        )
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def exportar(
+    formato: str,
+    *,
+    merchant_id: Optional[int] = None,
+    tag: Optional[str] = None,
+    active: Optional[bool] = None,
+    updated_since: Optional[datetime] = None,
+) -> Iterator[bytes]:
+    """
+    Gerador com os bytes do arquivo, bloco a bloco. Abre a própria sessão de
+    leitura (a do request já foi fechada quando o streaming começa) e a fecha
+    no fim ou quando o cliente desconecta.
+    """
+    stmt = _consulta(merchant_id=merchant_id, tag=tag, active=active, updated_since=updated_since)
+    db = ReadSessionLocal()
+    try:
+        yield from (_csv if formato == "csv" else _ndjson)(db.connection(), stmt)
+    finally:
+        db.close()
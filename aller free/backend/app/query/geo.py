@@ -0,0 +1,209 @@
+# app/query/geo.py
+"""
+Localização das lojas: índice espacial (SQLite R*Tree) sobre merchants.
+
+merchants_rtree guarda o ponto (latitude, longitude) de cada loja como uma
+caixa de tamanho zero. Triggers no banco mantêm o índice sincronizado a cada
+INSERT/UPDATE/DELETE em merchants (criar a loja ou mudar a localização entra
+na mesma transação), no mesmo esquema do FTS de app/query/busca.py.
+
+A busca por proximidade pega no R*Tree só as lojas dentro do retângulo que
+envolve o círculo do raio, calcula a distância real (haversine) dessas
+candidatas, descarta as de fora do círculo e ordena.
+
+Reconstrução offline (bancos antigos ou índice divergente):
+    python -m app.query.geo rebuild
+"""
+import math
+import sys
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Connection, Engine, and_, column, exists, or_, select, table, text
+from sqlalchemy.orm import Session
+from app.modelos import models
+
+
+RTREE_TABLE = "merchants_rtree"
+RAIO_TERRA_KM = 6371.0088
+KM_POR_GRAU_LAT = 111.32
+
+DEFAULT_RADIUS_KM = 10.0
+MAX_RADIUS_KM = 200.0
+
+_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE_TABLE} USING rtree(
+        id,
+        min_lat, max_lat,
+        min_lng, max_lng
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS merchants_rtree_ai AFTER INSERT ON merchants
+    WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+        INSERT INTO {RTREE_TABLE}(id, min_lat, max_lat, min_lng, max_lng)
+        VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS merchants_rtree_ad AFTER DELETE ON merchants BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS merchants_rtree_au AFTER UPDATE OF latitude, longitude ON merchants BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = old.id;
+        INSERT INTO {RTREE_TABLE}(id, min_lat, max_lat, min_lng, max_lng)
+        SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+        WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+    END
+    """,
+]
+
+_REBUILD = [
+    f"DELETE FROM {RTREE_TABLE}",
+    f"""
+    INSERT INTO {RTREE_TABLE}(id, min_lat, max_lat, min_lng, max_lng)
+    SELECT id, latitude, latitude, longitude, longitude FROM merchants
+    WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+    """,
+]
+
+
+# ---------- instalação / rebuild ----------
+def instalar(engine: Engine) -> None:
+    """
+    Cria o R*Tree e os triggers se ainda não existirem.
+    Se o índice acabou de ser criado num banco que já tinha lojas, popula.
+    """
+    with engine.begin() as conn:
+        instalar_em(conn)
+
+def instalar_em(conn: Connection) -> None:
+    """instalar() dentro de uma transação já aberta."""
+    existed = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": RTREE_TABLE},
+    ).first() is not None
+    for ddl in _DDL:
+        conn.execute(text(ddl))
+    if not existed:
+        for stmt in _REBUILD:
+            conn.execute(text(stmt))
+
+def rebuild(engine: Engine) -> None:
+    """Reconstrói o índice inteiro a partir da tabela merchants."""
+    with engine.begin() as conn:
+        for ddl in _DDL:
+            conn.execute(text(ddl))
+        for stmt in _REBUILD:
+            conn.execute(text(stmt))
+
+
+# ---------- geometria ----------
+def distancia_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Distância em km pela fórmula de haversine."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * RAIO_TERRA_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def _caixa(lat: float, lng: float, raio_km: float):
+    """
+    Retângulo (lat_min, lat_max, faixas de longitude) que contém o círculo.
+    Perto dos polos pega todas as longitudes; perto do antimeridiano quebra
+    em duas faixas.
+    """
+    dlat = raio_km / KM_POR_GRAU_LAT
+    lat_min, lat_max = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    cos_lat = math.cos(math.radians(max(abs(lat_min), abs(lat_max))))
+    if cos_lat < 1e-6 or raio_km / (KM_POR_GRAU_LAT * cos_lat) >= 180.0:
+        return lat_min, lat_max, [(-180.0, 180.0)]
+    dlng = raio_km / (KM_POR_GRAU_LAT * cos_lat)
+    lng_min, lng_max = lng - dlng, lng + dlng
+    if lng_min < -180.0:
+        return lat_min, lat_max, [(lng_min + 360.0, 180.0), (-180.0, lng_max)]
+    if lng_max > 180.0:
+        return lat_min, lat_max, [(lng_min, 180.0), (-180.0, lng_max - 360.0)]
+    return lat_min, lat_max, [(lng_min, lng_max)]
+
+
+# ---------- consulta ----------
+COLUNAS = (
+    models.Merchant.id,
+    models.Merchant.user_id,
+    models.Merchant.store_name,
+    models.Merchant.verified,
+    models.Merchant.latitude,
+    models.Merchant.longitude,
+)
+
+_rtree = table(RTREE_TABLE, column("id"), column("min_lat"), column("max_lat"), column("min_lng"), column("max_lng"))
+
+def proximas(
+    db: Session,
+    lat: float,
+    lng: float,
+    *,
+    raio_km: float = DEFAULT_RADIUS_KM,
+    tag: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+) -> List[Dict[str, Any]]:
+    """
+    Lojas a até raio_km de (lat, lng), da mais perto para a mais longe, já no
+    formato de schemas.MerchantNearby. Com tag, só as que têm pelo menos um
+    produto ativo com aquela tag.
+    """
+    Merchant = models.Merchant
+    rt = _rtree
+    lat_min, lat_max, faixas = _caixa(lat, lng, raio_km)
+    # teste de sobreposição: o R*Tree guarda float32 arredondado para fora,
+    # então "contido em" poderia perder um ponto exatamente na borda
+    stmt = (
+        select(*COLUNAS)
+        .join(rt, rt.c.id == Merchant.id)
+        .where(rt.c.max_lat >= lat_min, rt.c.min_lat <= lat_max)
+        .where(or_(*[and_(rt.c.max_lng >= a, rt.c.min_lng <= b) for a, b in faixas]))
+    )
+    if tag:
+        Product = models.Product
+        pt = models.product_tag_table
+        tag_ids = select(models.DietaryTag.id).where(models.DietaryTag.code == tag)
+        stmt = stmt.where(
+            exists()
+            .where(Product.merchant_id == Merchant.id, Product.active.is_(True))
+            .where(Product.id == pt.c.product_id, pt.c.tag_id.in_(tag_ids))
+        )
+    candidatas = []
+    for id_, user_id, store_name, verified, m_lat, m_lng in db.execute(stmt):
+        # distância com o valor exato da tabela (o do R*Tree é aproximado)
+        d = distancia_km(lat, lng, m_lat, m_lng)
+        if d <= raio_km:
+            candidatas.append({
+                "id": id_,
+                "user_id": user_id,
+                "store_name": store_name,
+                "verified": bool(verified),
+                "latitude": m_lat,
+                "longitude": m_lng,
+                "distance_km": round(d, 3),
+            })
+    candidatas.sort(key=lambda c: (c["distance_km"], c["id"]))
+    return candidatas[offset:offset + limit]
+
+
+# ---------- CLI ----------
+def main(argv: List[str]) -> int:
+    from app.query.database import engine
+
+    if argv[:1] != ["rebuild"]:
+        print("uso: python -m app.query.geo rebuild")
+        return 2
+    rebuild(engine)
+    print(f"{RTREE_TABLE} reconstruída")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
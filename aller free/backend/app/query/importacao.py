@@ -0,0 +1,200 @@
+# app/query/importacao.py
+"""
+Importação em massa de produtos (CSV ou NDJSON) para a loja do lojista.
+
+O arquivo é lido linha a linha (nunca inteiro na memória), cada linha é
+validada com schemas.ProductCreate e as válidas são gravadas em lotes:
+um INSERT executemany em products (ids atribuídos no lote) e outro em
+product_tag por lote, e um commit por lote. Entre um lote e outro o escritor
+fica livre, então as outras escritas da API não esperam a importação inteira.
+
+Formato CSV: cabeçalho com name, price, description, tags (codes separados
+por "|") e, opcional, merchant_id. No NDJSON cada linha é um objeto JSON com
+os mesmos campos e tags como lista.
+"""
+import csv
+import io
+import json
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import IO, Iterable, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+from app.modelos import models
+from app.esquemas import schemas
+from app.query import contadores, eventos, versoes, vitrine
+from app.cache.registro_tags import registro as registro_tags
+from app.cache.indice_tags import indice as indice_tags
+from app.cache.sugestoes import indice as indice_sugestoes
+
+
+BATCH_SIZE = 1000
+MAX_ERROS_RELATADOS = 1000
+# pausa curta depois de cada commit para quem está na fila do escritor entrar
+PAUSA_ENTRE_LOTES = 0.002
+SEPARADOR_TAGS = "|"
+
+FORMATOS = ("csv", "ndjson")
+
+
+class FormatoInvalido(ValueError):
+    """Arquivo que não dá para ler como CSV/NDJSON (cabeçalho, encoding...)."""
+
+
+@dataclass
+class ErroLinha:
+    line: int
+    error: str
+
+
+@dataclass
+class Relatorio:
+    total: int = 0
+    imported: int = 0
+    failed: int = 0
+    errors: List[ErroLinha] = field(default_factory=list)
+
+    def falhou(self, linha: int, mensagem: str) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_ERROS_RELATADOS:
+            self.errors.append(ErroLinha(line=linha, error=mensagem))
+
+
+# ---------- leitura ----------
+def detectar_formato(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    nome = (filename or "").lower()
+    tipo = (content_type or "").lower()
+    if nome.endswith((".ndjson", ".jsonl")) or "ndjson" in tipo or "jsonl" in tipo:
+        return "ndjson"
+    if nome.endswith(".csv") or "csv" in tipo:
+        return "csv"
+    return None
+
+@contextmanager
+def _texto(arquivo: IO[bytes], newline: Optional[str]):
+    # detach no fim: fechar o wrapper fecharia o arquivo do upload junto
+    wrapper = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline=newline)
+    try:
+        yield wrapper
+    except UnicodeDecodeError:
+        raise FormatoInvalido("Arquivo precisa estar em UTF-8")
+    finally:
+        wrapper.detach()
+
+def ler_csv(arquivo: IO[bytes]) -> Iterator[Tuple[int, dict]]:
+    with _texto(arquivo, newline="") as texto:
+        leitor = csv.DictReader(texto)
+        if not leitor.fieldnames or "name" not in leitor.fieldnames:
+            raise FormatoInvalido("CSV precisa de cabeçalho com a coluna 'name'")
+        for row in leitor:
+            dados = {k: v for k, v in row.items() if k and v not in (None, "")}
+            if "tags" in dados:
+                dados["tags"] = [c.strip() for c in dados["tags"].split(SEPARADOR_TAGS) if c.strip()]
+            yield leitor.line_num, dados
+
+def ler_ndjson(arquivo: IO[bytes]) -> Iterator[Tuple[int, object]]:
+    with _texto(arquivo, newline=None) as texto:
+        for numero, linha in enumerate(texto, start=1):
+            if not linha.strip():
+                continue
+            try:
+                yield numero, json.loads(linha)
+            except ValueError as exc:
+                yield numero, exc
+
+def ler(arquivo: IO[bytes], formato: str) -> Iterator[Tuple[int, object]]:
+    return ler_csv(arquivo) if formato == "csv" else ler_ndjson(arquivo)
+
+
+# ---------- validação ----------
+def _mensagem(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in e['loc']) or 'linha'}: {e['msg']}" for e in exc.errors())
+
+def _validar(dados: object, merchant_id: int, tags: dict) -> Tuple[Optional[dict], Optional[List[int]], Optional[str]]:
+    """Devolve (linha de products, tag_ids, None) ou (None, None, erro)."""
+    if isinstance(dados, ValueError):
+        return None, None, f"JSON inválido: {dados}"
+    if not isinstance(dados, dict):
+        return None, None, "Esperado um objeto JSON por linha"
+    dados.setdefault("merchant_id", merchant_id)
+    try:
+        payload = schemas.ProductCreate.model_validate(dados)
+    except ValidationError as exc:
+        return None, None, _mensagem(exc)
+    if payload.merchant_id != merchant_id:
+        return None, None, "Você não é o proprietário dessa loja"
+    tag_ids = []
+    for code in dict.fromkeys(payload.tags or []):
+        tag = tags.get(code)
+        if tag is None:
+            return None, None, f"Tag '{code}' não encontrada"
+        tag_ids.append(tag.id)
+    row = {
+        "merchant_id": merchant_id,
+        "name": payload.name,
+        "description": payload.description,
+        "price": payload.price,
+        "active": True,
+    }
+    return row, tag_ids, None
+
+
+# ---------- gravação ----------
+def _gravar_lote(db: Session, rows: List[dict], tag_ids: List[List[int]]) -> None:
+    # ids atribuídos aqui: a sessão do escritor abre com BEGIN IMMEDIATE, então
+    # ninguém mais insere em products até o commit. INSERT ... RETURNING com
+    # ordem garantida sairia linha a linha no SQLite; assim o lote vira um
+    # executemany só.
+    ultimo = db.execute(select(func.coalesce(func.max(models.Product.id), 0))).scalar_one()
+    for offset, row in enumerate(rows, start=1):
+        row["id"] = ultimo + offset
+    db.execute(insert(models.Product.__table__), rows)
+    vinculos = [{"product_id": row["id"], "tag_id": tid} for row, tids in zip(rows, tag_ids) for tid in tids]
+    if vinculos:
+        db.execute(insert(models.product_tag_table), vinculos)
+    ids = [row["id"] for row in rows]
+    mudancas = vitrine.atualizar(db, ids)
+    eventos.produtos(db, mudancas)
+    contadores.produtos(db, mudancas)
+    versoes.bump(db, versoes.loja(rows[0]["merchant_id"]))
+    indice = indice_tags.registrar(db, ids)
+    sugestoes = indice_sugestoes.registrar(db, ids)
+    db.commit()
+    indice.aplicar()
+    sugestoes.aplicar()
+
+def importar(
+    db: Session,
+    linhas: Iterable[Tuple[int, object]],
+    merchant_id: int,
+    tamanho_lote: int = BATCH_SIZE,
+) -> Relatorio:
+    """
+    Valida e grava as linhas em lotes de tamanho_lote (um commit por lote).
+    Linhas inválidas vão para o relatório e não impedem as outras.
+    """
+    relatorio = Relatorio()
+    tags = registro_tags.por_code(db)
+    db.commit()  # solta o escritor até o primeiro lote
+    rows: List[dict] = []
+    tag_ids: List[List[int]] = []
+    for numero, dados in linhas:
+        relatorio.total += 1
+        row, ids, erro = _validar(dados, merchant_id, tags)
+        if erro is not None:
+            relatorio.falhou(numero, erro)
+            continue
+        rows.append(row)
+        tag_ids.append(ids)
+        if len(rows) >= tamanho_lote:
+            _gravar_lote(db, rows, tag_ids)
+            relatorio.imported += len(rows)
+            rows, tag_ids = [], []
+            time.sleep(PAUSA_ENTRE_LOTES)
+    if rows:
+        _gravar_lote(db, rows, tag_ids)
+        relatorio.imported += len(rows)
+    return relatorio
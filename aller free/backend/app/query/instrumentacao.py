@@ -0,0 +1,126 @@
+# app/query/instrumentacao.py
+"""
+Contagem de statements SQL (e tempo gasto neles) por request.
+
+instalar(engine) pendura dois listeners no engine. Quem quiser medir abre um
+escopo:
+
+    with contar() as c:          # só o contexto atual (usado pelo middleware)
+        ...
+    with capturar() as c:        # tudo que rodar no engine, de qualquer thread
+        ...
+    with assert_max_queries(2):  # modo teste: estoura AssertionError se passar
+        client.get("/products/")
+
+Com APP_DEBUG=1 o main.py registra middleware_contagem, que devolve
+X-SQL-Count e X-SQL-Time-Ms em toda resposta.
+
+observar(fn) registra um callback (statement, segundos) chamado em todo
+statement, de qualquer thread (é por onde as métricas de /metrics recebem
+o SQL, ver app/query/metricas.py).
+"""
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Iterator, List, Optional
+
+from sqlalchemy import Engine, event
+
+
+DEBUG = os.getenv("APP_DEBUG", "").lower() in ("1", "true", "yes")
+
+@dataclass
+class Contagem:
+    statements: int = 0
+    seconds: float = 0.0
+    # só preenchido quando guardar_sql=True (usado nas asserções para mostrar o que rodou)
+    sql: List[str] = field(default_factory=list)
+    tempos: List[float] = field(default_factory=list)  # segundos de cada item de sql
+    guardar_sql: bool = False
+
+    def registrar(self, statement: str, elapsed: float) -> None:
+        self.statements += 1
+        self.seconds += elapsed
+        if self.guardar_sql:
+            self.sql.append(statement)
+            self.tempos.append(elapsed)
+
+
+_atual: ContextVar[Optional[Contagem]] = ContextVar("sql_contagem", default=None)
+_globais: List[Contagem] = []
+_observadores: List[Callable[[str, float], None]] = []
+_lock = threading.Lock()
+
+
+# ---------- listeners ----------
+# o início fica no contexto de execução do statement: statement que falha não
+# chega ao "after" e o contexto dele é descartado junto, sem sobrar nada na
+# conexão para parear com o próximo
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._sql_inicio = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._sql_inicio
+    atual = _atual.get()
+    if atual is not None:
+        atual.registrar(statement, elapsed)
+    if _globais:
+        with _lock:
+            for contagem in _globais:
+                contagem.registrar(statement, elapsed)
+    for observador in _observadores:
+        observador(statement, elapsed)
+
+def observar(callback: Callable[[str, float], None]) -> None:
+    if callback not in _observadores:
+        _observadores.append(callback)
+
+def instalar(engine: Engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---------- escopos ----------
+@contextmanager
+def contar(guardar_sql: bool = False) -> Iterator[Contagem]:
+    contagem = Contagem(guardar_sql=guardar_sql)
+    token = _atual.set(contagem)
+    try:
+        yield contagem
+    finally:
+        _atual.reset(token)
+
+@contextmanager
+def capturar(guardar_sql: bool = False) -> Iterator[Contagem]:
+    contagem = Contagem(guardar_sql=guardar_sql)
+    with _lock:
+        _globais.append(contagem)
+    try:
+        yield contagem
+    finally:
+        with _lock:
+            _globais.remove(contagem)
+
+@contextmanager
+def assert_max_queries(limite: int) -> Iterator[Contagem]:
+    """Falha se o bloco executar mais de `limite` statements (pega regressões de N+1)."""
+    with capturar(guardar_sql=True) as contagem:
+        yield contagem
+    if contagem.statements > limite:
+        executados = "\n".join(contagem.sql)
+        raise AssertionError(
+            f"{contagem.statements} statements SQL executados, limite {limite}:\n{executados}"
+        )
+
+
+# ---------- middleware (modo debug) ----------
+async def middleware_contagem(request, call_next):
+    with contar() as contagem:
+        response = await call_next(request)
+    response.headers["X-SQL-Count"] = str(contagem.statements)
+    response.headers["X-SQL-Time-Ms"] = f"{contagem.seconds * 1000:.2f}"
+    return response
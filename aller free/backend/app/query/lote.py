@@ -0,0 +1,239 @@
+# app/query/lote.py
+"""
+Operações em lote sobre produtos (POST /products/batch).
+
+Em vez de uma rota (e um commit) por produto:
+
+- a posse de todos os ids é conferida numa consulta só (products JOIN merchants);
+- os codes de tag vêm do registro em memória (registro_tags.por_code);
+- as operações válidas rodam em ordem, todas na mesma transação. Operações
+  seguidas do mesmo tipo (e sem repetir produto) formam um grupo gravado com
+  executemany / IN: 500 trocas de preço são um UPDATE executemany, 500
+  add_tags são um SELECT dos vínculos, um INSERT executemany e um UPDATE do
+  updated_at;
+- product_views (vitrine.atualizar), o log do feed (eventos.produtos), os
+  contadores do admin (contadores.produtos), as versões de cache
+  (versoes.bump_muitos), o índice de tags (indice_tags.registrar) e o de
+  autocomplete (indice_sugestoes.registrar) são atualizados uma vez para o
+  lote inteiro.
+
+Modos:
+- atomic: qualquer item com erro (na validação ou ao gravar) desfaz tudo e
+  os itens que estavam certos voltam com status 409 ("não aplicado");
+- best_effort: grava os itens válidos e devolve o erro de cada inválido.
+  Cada grupo roda num SAVEPOINT; se a gravação de um grupo falhar (a
+  validação já foi feita antes, então é erro de banco), só ele é desfeito.
+"""
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.orm import Session
+from app.modelos import models
+from app.esquemas import schemas
+from app.query import catalogo, contadores, eventos, versoes, vitrine
+from app.cache.registro_tags import registro as registro_tags
+from app.cache.indice_tags import indice as indice_tags
+from app.cache.sugestoes import indice as indice_sugestoes
+
+
+CAMPOS_UPDATE = ("name", "description", "price", "active")
+NAO_APLICADO = "não aplicado: outro item do lote falhou (modo atomic)"
+
+
+class ErroItem(Exception):
+    def __init__(self, status: int, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+
+
+@dataclass
+class ResultadoItem:
+    index: int
+    id: int
+    op: str
+    status: int = 200
+    error: Optional[str] = None
+
+
+@dataclass
+class _Acao:
+    item: ResultadoItem
+    valores: Dict[str, Any] = field(default_factory=dict)  # update
+    tag_ids: Optional[List[int]] = None                     # tags / update com tags
+
+    def chave(self) -> Tuple:
+        return (self.item.op, tuple(sorted(self.valores)), self.tag_ids is None)
+
+
+@dataclass
+class RelatorioLote:
+    mode: str
+    committed: bool = False
+    applied: int = 0
+    failed: int = 0
+    results: List[ResultadoItem] = field(default_factory=list)
+
+
+# ---------- validação ----------
+def _donos(db: Session, product_ids: List[int]) -> Dict[int, Tuple[int, int]]:
+    """product_id -> (merchant_id, user_id do dono), numa consulta só."""
+    Product, Merchant = models.Product, models.Merchant
+    rows = db.execute(
+        select(Product.id, Product.merchant_id, Merchant.user_id)
+        .join(Merchant, Merchant.id == Product.merchant_id)
+        .where(Product.id.in_(product_ids))
+    )
+    return {pid: (merchant_id, user_id) for pid, merchant_id, user_id in rows}
+
+def _tag_ids(por_code: Dict, codes: List[str]) -> List[int]:
+    faltando = [code for code in codes if code not in por_code]
+    if faltando:
+        raise ErroItem(404, f"Tag '{faltando[0]}' não encontrada")
+    return [por_code[code].id for code in dict.fromkeys(codes)]
+
+def _planejar(item: ResultadoItem, op: schemas.BatchOperation, por_code: Dict) -> _Acao:
+    """Confere o conteúdo da operação e devolve o que gravar."""
+    if op.op == "delete":
+        return _Acao(item)
+    if op.op in ("add_tags", "remove_tags"):
+        if not op.tags:
+            raise ErroItem(422, f"'{op.op}' precisa de tags")
+        return _Acao(item, tag_ids=_tag_ids(por_code, op.tags))
+
+    valores = {campo: getattr(op, campo) for campo in CAMPOS_UPDATE if getattr(op, campo) is not None}
+    if not valores and op.tags is None:
+        raise ErroItem(422, "'update' sem campos para alterar")
+    return _Acao(item, valores=valores, tag_ids=_tag_ids(por_code, op.tags) if op.tags is not None else None)
+
+def _grupos(acoes: List[_Acao]) -> Iterator[List[_Acao]]:
+    """Ações seguidas com a mesma chave e sem produto repetido (a ordem do lote vale)."""
+    grupo: List[_Acao] = []
+    ids: Set[int] = set()
+    for acao in acoes:
+        if grupo and (acao.chave() != grupo[0].chave() or acao.item.id in ids):
+            yield grupo
+            grupo, ids = [], set()
+        grupo.append(acao)
+        ids.add(acao.item.id)
+    if grupo:
+        yield grupo
+
+
+# ---------- escrita ----------
+_pt = models.product_tag_table
+
+def _vinculos(db: Session, product_ids: List[int]) -> Set[Tuple[int, int]]:
+    return set(db.execute(select(_pt.c.product_id, _pt.c.tag_id).where(_pt.c.product_id.in_(product_ids))).tuples())
+
+def _gravar(db: Session, grupo: List[_Acao]) -> None:
+    op = grupo[0].item.op
+    ids = [acao.item.id for acao in grupo]
+
+    if op == "delete":
+        db.execute(delete(_pt).where(_pt.c.product_id.in_(ids)))
+        db.execute(delete(models.Product.__table__).where(models.Product.id.in_(ids)))
+        return
+
+    if op == "update":
+        if grupo[0].valores:
+            # SET só das colunas do grupo (as mesmas em todos); updated_at pelo onupdate
+            db.execute(
+                update(models.Product.__table__).where(models.Product.id == bindparam("_id")),
+                [{"_id": acao.item.id, **acao.valores} for acao in grupo],
+            )
+        if grupo[0].tag_ids is not None:
+            db.execute(delete(_pt).where(_pt.c.product_id.in_(ids)))
+            pares = [{"product_id": a.item.id, "tag_id": t} for a in grupo for t in a.tag_ids]
+            if pares:
+                db.execute(insert(_pt), pares)
+            catalogo.tocar_varios(db, ids)
+        return
+
+    existentes = _vinculos(db, ids)
+    if op == "add_tags":
+        novos = [(a.item.id, t) for a in grupo for t in a.tag_ids if (a.item.id, t) not in existentes]
+        if novos:
+            db.execute(insert(_pt), [{"product_id": pid, "tag_id": t} for pid, t in novos])
+            catalogo.tocar_varios(db, {pid for pid, _ in novos})
+    else:  # remove_tags
+        alvo = [(a.item.id, t) for a in grupo for t in a.tag_ids if (a.item.id, t) in existentes]
+        if alvo:
+            db.execute(
+                delete(_pt).where(_pt.c.product_id == bindparam("pid"), _pt.c.tag_id == bindparam("tid")),
+                [{"pid": pid, "tid": t} for pid, t in alvo],
+            )
+            catalogo.tocar_varios(db, {pid for pid, _ in alvo})
+
+
+# ---------- execução ----------
+def executar(db: Session, operacoes: List[schemas.BatchOperation], user_id: int, atomico: bool) -> RelatorioLote:
+    relatorio = RelatorioLote(mode="atomic" if atomico else "best_effort")
+    donos = _donos(db, list({op.id for op in operacoes}))
+    por_code = registro_tags.por_code(db) if any(op.tags for op in operacoes) else {}
+
+    acoes: List[_Acao] = []
+    apagados: Set[int] = set()
+    for i, op in enumerate(operacoes):
+        item = ResultadoItem(index=i, id=op.id, op=op.op)
+        relatorio.results.append(item)
+        try:
+            dono = donos.get(op.id)
+            if dono is None or op.id in apagados:
+                raise ErroItem(404, "Produto não encontrado")
+            if dono[1] != user_id:
+                raise ErroItem(403, "Você não é o proprietário dessa loja")
+            acoes.append(_planejar(item, op, por_code))
+            if op.op == "delete":
+                apagados.add(op.id)
+        except ErroItem as exc:
+            item.status, item.error = exc.status, str(exc)
+
+    if atomico and len(acoes) < len(operacoes):
+        return _abortar(db, relatorio)
+
+    afetados: List[int] = []
+    for grupo in _grupos(acoes):
+        try:
+            if atomico:
+                _gravar(db, grupo)  # sem savepoint: um erro desfaz a transação toda
+            else:
+                with db.begin_nested():
+                    _gravar(db, grupo)
+        except Exception as exc:
+            for acao in grupo:
+                acao.item.status, acao.item.error = 500, f"Erro ao gravar: {exc.__class__.__name__}"
+            if atomico:
+                return _abortar(db, relatorio)
+            continue
+        for acao in grupo:
+            acao.item.status = 204 if acao.item.op == "delete" else 200
+            afetados.append(acao.item.id)
+
+    if afetados:
+        mudancas = vitrine.atualizar(db, afetados)
+        eventos.produtos(db, mudancas)
+        contadores.produtos(db, mudancas)
+        merchants = {donos[pid][0] for pid in afetados}
+        versoes.bump_muitos(db, [versoes.produto(pid) for pid in afetados] + [versoes.loja(m) for m in merchants])
+        indice = indice_tags.registrar(db, afetados)
+        sugestoes = indice_sugestoes.registrar(db, afetados)
+        db.commit()
+        indice.aplicar()
+        sugestoes.aplicar()
+        relatorio.committed = True
+    else:
+        db.rollback()
+    return _contar(relatorio)
+
+def _abortar(db: Session, relatorio: RelatorioLote) -> RelatorioLote:
+    db.rollback()
+    for item in relatorio.results:
+        if item.error is None:
+            item.status, item.error = 409, NAO_APLICADO
+    return _contar(relatorio)
+
+def _contar(relatorio: RelatorioLote) -> RelatorioLote:
+    relatorio.applied = sum(1 for item in relatorio.results if item.error is None) if relatorio.committed else 0
+    relatorio.failed = len(relatorio.results) - relatorio.applied
+    return relatorio
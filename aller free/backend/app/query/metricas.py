@@ -0,0 +1,227 @@
+# app/query/metricas.py
+"""
+Métricas do processo em formato texto do Prometheus (exposto em /metrics).
+
+- middleware (ASGI puro, sem BaseHTTPMiddleware): histograma de latência por
+  método, rota (template, ex. "/products/{product_id}") e status, e requests
+  em andamento. Essas séries só são tocadas no thread do event loop (o
+  /metrics é async), então dispensam lock;
+- SQL: contagem e histograma de duração por tipo de statement (select,
+  insert, ...), alimentados pelos listeners de app/query/instrumentacao.py;
+- pool: tempo de espera no checkout de conexão (pool_medido) e, na hora da
+  coleta, conexões em uso de cada pool;
+- fila do pool de hash de senha (app/autenticacao/senhas.py), também na coleta;
+- outbox (app/query/outbox.py): mensagens processadas por tópico e resultado.
+
+Log de requests lentos: com SLOW_REQUEST_MS > 0, todo request que passar do
+limite vai para o logger "app.lento" com os statements SQL que executou e o
+tempo de cada um.
+
+Tudo é por processo: com vários workers do uvicorn cada um expõe os seus
+números. O custo no caminho do request são duas leituras de relógio, um
+bisect e alguns incrementos (python -m benchmark metricas).
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from app.query import instrumentacao
+
+
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))
+BUCKETS_HTTP = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_SQL = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+SEM_ROTA = "unmatched"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+logger = logging.getLogger("app.lento")
+
+Rotulos = Tuple[str, ...]
+
+
+# ---------- tipos de métrica ----------
+class Contador:
+    def __init__(self, nome: str, ajuda: str, rotulos: Rotulos):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, rotulos
+        self._valores: Dict[Rotulos, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, valores: Rotulos, n: float = 1) -> None:
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0) + n
+
+    def linhas(self) -> Iterable[str]:
+        yield f"# HELP {self.nome} {self.ajuda}"
+        yield f"# TYPE {self.nome} counter"
+        for valores, total in sorted(self._valores.items()):
+            yield f"{self.nome}{_rotulos(self.rotulos, valores)} {_numero(total)}"
+
+
+class Histograma:
+    def __init__(self, nome: str, ajuda: str, rotulos: Rotulos, buckets: Tuple[float, ...]):
+        self.nome, self.ajuda, self.rotulos, self.buckets = nome, ajuda, rotulos, buckets
+        # valores dos rótulos -> [contagem por bucket (não cumulativa) ..., +Inf, soma]
+        self._series: Dict[Rotulos, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valores: Rotulos, segundos: float) -> None:
+        with self._lock:
+            self.observar_no_loop(valores, segundos)
+
+    def observar_no_loop(self, valores: Rotulos, segundos: float) -> None:
+        """Sem lock: só para métricas escritas e lidas no thread do event loop."""
+        serie = self._series.get(valores)
+        if serie is None:
+            serie = self._series[valores] = [0] * (len(self.buckets) + 2)
+        serie[bisect_left(self.buckets, segundos)] += 1
+        serie[-1] += segundos
+
+    def linhas(self) -> Iterable[str]:
+        yield f"# HELP {self.nome} {self.ajuda}"
+        yield f"# TYPE {self.nome} histogram"
+        with self._lock:
+            series = {k: list(v) for k, v in self._series.items()}
+        for valores, serie in sorted(series.items()):
+            acumulado = 0
+            for limite, n in zip(self.buckets + (float("inf"),), serie):
+                acumulado += n
+                le = "+Inf" if limite == float("inf") else _numero(limite)
+                yield f"{self.nome}_bucket{_rotulos(self.rotulos + ('le',), valores + (le,))} {acumulado}"
+            yield f"{self.nome}_sum{_rotulos(self.rotulos, valores)} {_numero(serie[-1])}"
+            yield f"{self.nome}_count{_rotulos(self.rotulos, valores)} {acumulado}"
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _rotulos(nomes: Rotulos, valores: Rotulos) -> str:
+    if not nomes:
+        return ""
+    return "{" + ",".join(f'{n}="{_escapar(str(v))}"' for n, v in zip(nomes, valores)) + "}"
+
+def _numero(valor: float) -> str:
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+# ---------- registro ----------
+# o _count do histograma já é a contagem de requests por rota e status
+HTTP_DURACAO = Histograma(
+    "http_request_duration_seconds", "Latência dos requests HTTP por rota e status.",
+    ("method", "route", "status"), BUCKETS_HTTP,
+)
+SQL_DURACAO = Histograma(
+    "db_statement_duration_seconds", "Duração dos statements SQL por tipo.", ("operation",), BUCKETS_SQL,
+)
+POOL_ESPERA = Histograma(
+    "db_pool_checkout_seconds", "Espera para pegar conexão do pool.", ("pool",), BUCKETS_SQL,
+)
+REQUESTS_LENTOS = Contador("http_slow_requests_total", "Requests acima de SLOW_REQUEST_MS.", ("method", "route"))
+OUTBOX_MENSAGENS = Contador(
+    "outbox_messages_total", "Mensagens do outbox processadas por tópico e resultado.", ("topic", "result"),
+)
+
+_em_andamento = 0
+
+# gauges lidos só na coleta: nome -> (ajuda, função que devolve [(valores dos rótulos, valor)], rótulos)
+_gauges: Dict[str, Tuple[str, Rotulos, Callable[[], Iterable[Tuple[Rotulos, float]]]]] = {}
+
+def registrar_gauge(nome: str, ajuda: str, rotulos: Rotulos, ler: Callable[[], Iterable[Tuple[Rotulos, float]]]) -> None:
+    _gauges[nome] = (ajuda, rotulos, ler)
+
+def texto() -> str:
+    """Todas as métricas no formato de exposição do Prometheus."""
+    linhas = [
+        "# HELP http_requests_in_flight Requests HTTP em andamento.",
+        "# TYPE http_requests_in_flight gauge",
+        f"http_requests_in_flight {_em_andamento}",
+    ]
+    for nome, (ajuda, rotulos, ler) in _gauges.items():
+        linhas.append(f"# HELP {nome} {ajuda}")
+        linhas.append(f"# TYPE {nome} gauge")
+        for valores, valor in ler():
+            linhas.append(f"{nome}{_rotulos(rotulos, valores)} {_numero(valor)}")
+    for metrica in (HTTP_DURACAO, REQUESTS_LENTOS, SQL_DURACAO, POOL_ESPERA, OUTBOX_MENSAGENS):
+        linhas.extend(metrica.linhas())
+    return "\n".join(linhas) + "\n"
+
+
+# ---------- SQL ----------
+def _observar_sql(statement: str, segundos: float) -> None:
+    SQL_DURACAO.observar((_operacao(statement),), segundos)
+
+def _operacao(statement: str) -> str:
+    # primeira palavra, sem alocar a string inteira em minúsculas
+    palavra = statement.lstrip()[:8].split(None, 1)
+    return palavra[0].lower() if palavra else "other"
+
+instrumentacao.observar(_observar_sql)
+
+
+# ---------- pool ----------
+def pool_medido(base: type, nome: str) -> type:
+    """Subclasse do pool do SQLAlchemy que mede a espera no connect() (checkout)."""
+
+    def connect(self):
+        inicio = time.perf_counter()
+        try:
+            return base.connect(self)
+        finally:
+            POOL_ESPERA.observar((nome,), time.perf_counter() - inicio)
+
+    return type(f"{base.__name__}Medido", (base,), {"connect": connect})
+
+
+# ---------- middleware ----------
+class MiddlewareMetricas:
+    """Middleware ASGI: latência por rota, status, em andamento e log de lentos."""
+
+    def __init__(self, app, slow_request_ms: float = SLOW_REQUEST_MS):
+        self.app = app
+        self.limite_lento = slow_request_ms / 1000 if slow_request_ms > 0 else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        global _em_andamento
+        status = 500
+
+        async def send_com_status(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        _em_andamento += 1
+        contagem = None
+        inicio = time.perf_counter()
+        try:
+            if self.limite_lento is None:
+                await self.app(scope, receive, send_com_status)
+            else:
+                with instrumentacao.contar(guardar_sql=True) as contagem:
+                    await self.app(scope, receive, send_com_status)
+        finally:
+            duracao = time.perf_counter() - inicio
+            _em_andamento -= 1
+            rota = scope.get("route")
+            rotulos = (scope["method"], rota.path if rota is not None else SEM_ROTA)
+            HTTP_DURACAO.observar_no_loop(rotulos + (status,), duracao)
+            if contagem is not None and duracao >= self.limite_lento:
+                _registrar_lento(scope, rotulos, status, duracao, contagem)
+
+def _registrar_lento(scope, rotulos: Rotulos, status: int, duracao: float, contagem: instrumentacao.Contagem) -> None:
+    REQUESTS_LENTOS.inc(rotulos)
+    query = scope.get("query_string", b"").decode("latin-1")
+    caminho = scope["path"] + ("?" + query if query else "")
+    statements = "\n".join(
+        f"  {segundos * 1000:8.2f} ms  {' '.join(sql.split())}" for sql, segundos in zip(contagem.sql, contagem.tempos)
+    )
+    logger.warning(
+        "request lento: %s %s -> %s em %.1f ms, %d statements SQL (%.1f ms)\n%s",
+        scope["method"], caminho, status, duracao * 1000, contagem.statements, contagem.seconds * 1000, statements,
+    )
@@ -0,0 +1,607 @@
+# app/query/migracoes.py
+"""
+Migrações versionadas do esquema.
+
+A versão do banco fica na tabela schema_migrations (uma linha por migração
+aplicada). MIGRACOES é a lista ordenada; cada migração roda na sua própria
+transação e grava a sua linha nela, então ou entra inteira ou não entra.
+
+Várias instâncias subindo juntas (ex.: 8 workers do uvicorn) não disputam o
+esquema: aplicar() pega um lock exclusivo num arquivo ao lado do banco
+(<banco>.migrate.lock), relê a versão já com o lock e só então roda o que
+faltar. Quem chega depois encontra tudo aplicado e sai.
+
+Uso recomendado: rodar antes de subir os workers
+
+    python -m app.query.migracoes upgrade     # aplica o que faltar
+    python -m app.query.migracoes status      # versão do banco x do código
+    python -m app.query.migracoes check       # modelos sem migração?
+
+e no startup (main.py) cada worker só confere a versão (preparar()). Se o
+banco estiver atrasado, o worker aplica sob o lock, ou com
+MIGRATE_ON_STARTUP=0 recusa subir.
+
+Bancos criados antes das migrações (create_all + ALTER no import do main.py)
+não precisam de tratamento especial: todas as migrações daqui são idempotentes
+(IF NOT EXISTS, coluna só se faltar) e convergem para o mesmo esquema.
+
+Mudou um modelo? Acrescente uma migração no fim da lista; nunca edite uma que
+já foi publicada. Migração não chama código do app (vitrine, busca...): a DDL
+e o SQL de que ela precisa ficam copiados nela, senão mudar o módulo depois
+mudaria o que a migração antiga faz.
+"""
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Iterator, List, Optional
+
+import orjson
+from sqlalchemy import Connection, Engine, inspect, text
+
+
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "1").lower() in ("1", "true", "yes")
+TABELA = "schema_migrations"
+
+
+class BancoDesatualizado(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Migracao:
+    versao: int
+    nome: str
+    aplicar: Callable[[Connection], None]
+
+
+MIGRACOES: List[Migracao] = []
+
+def migracao(versao: int, nome: str):
+    def registrar(fn: Callable[[Connection], None]):
+        assert versao == len(MIGRACOES) + 1, f"migração {versao} fora de ordem"
+        MIGRACOES.append(Migracao(versao, nome, fn))
+        return fn
+    return registrar
+
+def versao_do_codigo() -> int:
+    return MIGRACOES[-1].versao if MIGRACOES else 0
+
+
+# ---------- helpers das migrações ----------
+def _executar(conn: Connection, *ddl: str) -> None:
+    for stmt in ddl:
+        conn.execute(text(stmt))
+
+def _existe(conn: Connection, tabela: str) -> bool:
+    return conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": tabela},
+    ).first() is not None
+
+def _adicionar_coluna(conn: Connection, tabela: str, coluna: str, tipo: str) -> None:
+    existentes = {row[1] for row in conn.execute(text(f'PRAGMA table_info("{tabela}")'))}
+    if coluna not in existentes:
+        conn.execute(text(f'ALTER TABLE "{tabela}" ADD COLUMN "{coluna}" {tipo}'))
+
+
+# ---------- migrações ----------
+@migracao(1, "esquema inicial")
+def _m0001(conn: Connection) -> None:
+    _executar(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER NOT NULL,
+            email VARCHAR NOT NULL,
+            password VARCHAR NOT NULL,
+            role VARCHAR,
+            name VARCHAR,
+            PRIMARY KEY (id)
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_users_email ON users (email)",
+        "CREATE INDEX IF NOT EXISTS ix_users_id ON users (id)",
+        """
+        CREATE TABLE IF NOT EXISTS merchants (
+            id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            store_name VARCHAR NOT NULL,
+            verified BOOLEAN,
+            PRIMARY KEY (id),
+            FOREIGN KEY(user_id) REFERENCES users (id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_merchants_id ON merchants (id)",
+        """
+        CREATE TABLE IF NOT EXISTS dietary_tags (
+            id INTEGER NOT NULL,
+            code VARCHAR NOT NULL,
+            label VARCHAR NOT NULL,
+            PRIMARY KEY (id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_dietary_tags_id ON dietary_tags (id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_dietary_tags_code ON dietary_tags (code)",
+        """
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER NOT NULL,
+            merchant_id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            description VARCHAR,
+            price FLOAT,
+            active BOOLEAN,
+            PRIMARY KEY (id),
+            FOREIGN KEY(merchant_id) REFERENCES merchants (id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_products_id ON products (id)",
+        """
+        CREATE TABLE IF NOT EXISTS product_tag (
+            product_id INTEGER NOT NULL,
+            tag_id INTEGER NOT NULL,
+            PRIMARY KEY (product_id, tag_id),
+            FOREIGN KEY(product_id) REFERENCES products (id),
+            FOREIGN KEY(tag_id) REFERENCES dietary_tags (id)
+        )
+        """,
+    )
+
+@migracao(2, "índices da paginação e do filtro por tag")
+def _m0002(conn: Connection) -> None:
+    _executar(
+        conn,
+        "CREATE INDEX IF NOT EXISTS ix_products_active_id ON products (active, id)",
+        "CREATE INDEX IF NOT EXISTS ix_products_merchant_id_id ON products (merchant_id, id)",
+        "CREATE INDEX IF NOT EXISTS ix_product_tag_tag_id_product_id ON product_tag (tag_id, product_id)",
+    )
+
+@migracao(3, "busca textual (FTS5)")
+def _m0003(conn: Connection) -> None:
+    # mesma DDL de app/query/busca.py na época, copiada: a migração não muda se
+    # o módulo mudar depois
+    nova = not _existe(conn, "products_fts")
+    _executar(
+        conn,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+            name,
+            description,
+            content='products',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+            INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN
+            INSERT INTO products_fts(products_fts, rowid, name, description) VALUES ('delete', old.id, old.name, old.description);
+            INSERT INTO products_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+        END
+        """,
+    )
+    if nova:
+        _executar(conn, "INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+@migracao(4, "versões do catálogo")
+def _m0004(conn: Connection) -> None:
+    _executar(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS catalog_versions (
+            "key" VARCHAR NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY ("key")
+        )
+        """,
+    )
+
+@migracao(5, "products.updated_at")
+def _m0005(conn: Connection) -> None:
+    _adicionar_coluna(conn, "products", "updated_at", "DATETIME")
+    _executar(conn, "CREATE INDEX IF NOT EXISTS ix_products_updated_at ON products (updated_at)")
+
+@migracao(6, "localização das lojas (R*Tree)")
+def _m0006(conn: Connection) -> None:
+    _adicionar_coluna(conn, "merchants", "latitude", "FLOAT")
+    _adicionar_coluna(conn, "merchants", "longitude", "FLOAT")
+    # mesma DDL de app/query/geo.py na época, copiada
+    nova = not _existe(conn, "merchants_rtree")
+    _executar(
+        conn,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS merchants_rtree USING rtree(
+            id,
+            min_lat, max_lat,
+            min_lng, max_lng
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS merchants_rtree_ai AFTER INSERT ON merchants
+        WHEN new.latitude IS NOT NULL AND new.longitude IS NOT NULL BEGIN
+            INSERT INTO merchants_rtree(id, min_lat, max_lat, min_lng, max_lng)
+            VALUES (new.id, new.latitude, new.latitude, new.longitude, new.longitude);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS merchants_rtree_ad AFTER DELETE ON merchants BEGIN
+            DELETE FROM merchants_rtree WHERE id = old.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS merchants_rtree_au AFTER UPDATE OF latitude, longitude ON merchants BEGIN
+            DELETE FROM merchants_rtree WHERE id = old.id;
+            INSERT INTO merchants_rtree(id, min_lat, max_lat, min_lng, max_lng)
+            SELECT new.id, new.latitude, new.latitude, new.longitude, new.longitude
+            WHERE new.latitude IS NOT NULL AND new.longitude IS NOT NULL;
+        END
+        """,
+    )
+    if nova:
+        _executar(
+            conn,
+            """
+            INSERT INTO merchants_rtree(id, min_lat, max_lat, min_lng, max_lng)
+            SELECT id, latitude, latitude, longitude, longitude FROM merchants
+            WHERE latitude IS NOT NULL AND longitude IS NOT NULL
+            """,
+        )
+
+@migracao(7, "modelo de leitura do catálogo (product_views)")
+def _m0007(conn: Connection) -> None:
+    _executar(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS product_views (
+            id INTEGER NOT NULL,
+            merchant_id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            active BOOLEAN NOT NULL,
+            body BLOB NOT NULL,
+            PRIMARY KEY (id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_product_views_active_id ON product_views (active, id)",
+        "CREATE INDEX IF NOT EXISTS ix_product_views_merchant_id_id ON product_views (merchant_id, id)",
+        "DELETE FROM product_views",
+    )
+    # corpo no formato de ProductOut desta versão (o que app/query/vitrine.py
+    # gravava quando a migração saiu), montado aqui e não pelo vitrine: formato
+    # novo depois é trabalho de `python -m app.query.vitrine repair`
+    ultimo = 0
+    while True:
+        produtos = conn.execute(
+            text("""
+                SELECT p.id, p.merchant_id, p.name, p.description, p.price, p.active, m.store_name
+                FROM products p JOIN merchants m ON m.id = p.merchant_id
+                WHERE p.id > :ultimo ORDER BY p.id LIMIT 500
+            """),
+            {"ultimo": ultimo},
+        ).all()
+        if not produtos:
+            return
+        tags = defaultdict(list)
+        for product_id, tag_id, code, label in conn.execute(
+            text("""
+                SELECT pt.product_id, t.id, t.code, t.label
+                FROM product_tag pt JOIN dietary_tags t ON t.id = pt.tag_id
+                WHERE pt.product_id > :ultimo AND pt.product_id <= :ate
+                ORDER BY pt.product_id, t.id
+            """),
+            {"ultimo": ultimo, "ate": produtos[-1].id},
+        ):
+            tags[product_id].append({"id": tag_id, "code": code, "label": label})
+        conn.execute(
+            text("INSERT INTO product_views (id, merchant_id, name, active, body) VALUES (:id, :merchant_id, :name, :active, :body)"),
+            [
+                {
+                    "id": id_, "merchant_id": merchant_id, "name": name, "active": bool(active),
+                    "body": orjson.dumps({
+                        "id": id_, "merchant_id": merchant_id, "name": name, "description": description,
+                        "price": price, "active": bool(active), "tags": tags[id_], "store_name": store_name,
+                    }),
+                }
+                for id_, merchant_id, name, description, price, active, store_name in produtos
+            ],
+        )
+        ultimo = produtos[-1].id
+
+@migracao(8, "log de mudanças do catálogo (catalog_events)")
+def _m0008(conn: Connection) -> None:
+    _executar(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS catalog_events (
+            seq INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            kind VARCHAR NOT NULL,
+            merchant_id INTEGER,
+            tag_ids VARCHAR NOT NULL,
+            body BLOB NOT NULL
+        )
+        """,
+    )
+
+@migracao(9, "carrinho e pedidos")
+def _m0009(conn: Connection) -> None:
+    _executar(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS carts (
+            user_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            updated_at DATETIME NOT NULL,
+            PRIMARY KEY (user_id),
+            FOREIGN KEY(user_id) REFERENCES users (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS cart_items (
+            user_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            unit_price FLOAT NOT NULL,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY (user_id, product_id),
+            FOREIGN KEY(user_id) REFERENCES users (id),
+            FOREIGN KEY(product_id) REFERENCES products (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            total FLOAT NOT NULL,
+            status VARCHAR NOT NULL,
+            created_at DATETIME NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(user_id) REFERENCES users (id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_orders_user_id_id ON orders (user_id, id)",
+        """
+        CREATE TABLE IF NOT EXISTS order_items (
+            order_id INTEGER NOT NULL,
+            product_id INTEGER NOT NULL,
+            merchant_id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            unit_price FLOAT NOT NULL,
+            quantity INTEGER NOT NULL,
+            PRIMARY KEY (order_id, product_id),
+            FOREIGN KEY(order_id) REFERENCES orders (id),
+            FOREIGN KEY(product_id) REFERENCES products (id)
+        )
+        """,
+    )
+
+@migracao(10, "contadores do admin e fila de verificação de lojas")
+def _m0010(conn: Connection) -> None:
+    _executar(
+        conn,
+        # a fila lê verified = 0: lojas antigas com NULL entram nela
+        "UPDATE merchants SET verified = 0 WHERE verified IS NULL",
+        "CREATE INDEX IF NOT EXISTS ix_merchants_verified_id ON merchants (verified, id)",
+        """
+        CREATE TABLE IF NOT EXISTS admin_counters (
+            name VARCHAR NOT NULL,
+            ref_id INTEGER NOT NULL,
+            value INTEGER NOT NULL,
+            PRIMARY KEY (name, ref_id)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_admin_counters_name_value ON admin_counters (name, value, ref_id)",
+        # contagem inicial, com os nomes de app/query/contadores.py desta versão
+        "DELETE FROM admin_counters",
+        """
+        INSERT INTO admin_counters (name, ref_id, value)
+        SELECT 'users:' || coalesce(nullif(role, ''), 'client'), 0, count(*) FROM users GROUP BY 1
+        UNION ALL
+        SELECT CASE WHEN verified THEN 'merchants:verified' ELSE 'merchants:unverified' END, 0, count(*)
+        FROM merchants GROUP BY 1
+        UNION ALL
+        SELECT 'products:active', 0, count(*) FROM products WHERE active HAVING count(*) > 0
+        UNION ALL
+        SELECT 'products:active:merchant', merchant_id, count(*) FROM products WHERE active GROUP BY merchant_id
+        UNION ALL
+        SELECT 'products:active:tag', pt.tag_id, count(*)
+        FROM product_tag pt JOIN products p ON p.id = pt.product_id
+        WHERE p.active GROUP BY pt.tag_id
+        """,
+    )
+
+@migracao(11, "perfil alimentar dos usuários")
+def _m0011(conn: Connection) -> None:
+    _executar(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS user_dietary_tags (
+            user_id INTEGER NOT NULL,
+            tag_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, tag_id),
+            FOREIGN KEY(user_id) REFERENCES users (id),
+            FOREIGN KEY(tag_id) REFERENCES dietary_tags (id)
+        )
+        """,
+    )
+
+
+@migracao(12, "outbox")
+def _m0012(conn: Connection) -> None:
+    _executar(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+            topic VARCHAR NOT NULL,
+            "key" VARCHAR NOT NULL,
+            payload BLOB NOT NULL,
+            status VARCHAR NOT NULL,
+            attempts INTEGER NOT NULL,
+            available_at DATETIME NOT NULL,
+            created_at DATETIME NOT NULL,
+            processed_at DATETIME,
+            last_error VARCHAR,
+            UNIQUE ("key")
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_outbox_status_available_at ON outbox (status, available_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_outbox_status_processed_at ON outbox (status, processed_at)",
+    )
+
+# ---------- versão ----------
+def _criar_tabela(conn: Connection) -> None:
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {TABELA} (
+            version INTEGER NOT NULL PRIMARY KEY,
+            name VARCHAR NOT NULL,
+            applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """))
+
+def versao_do_banco(engine: Engine) -> int:
+    with engine.connect() as conn:
+        existe = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": TABELA},
+        ).first()
+        if existe is None:
+            return 0
+        return conn.execute(text(f"SELECT coalesce(max(version), 0) FROM {TABELA}")).scalar_one()
+
+
+# ---------- lock entre processos ----------
+_lock_local = threading.Lock()
+
+def _arquivo_do_lock(engine: Engine) -> Optional[str]:
+    banco = engine.url.database
+    if engine.url.get_backend_name() != "sqlite" or banco in (None, "", ":memory:"):
+        return None
+    return os.path.abspath(banco) + ".migrate.lock"
+
+@contextmanager
+def _trava(engine: Engine) -> Iterator[None]:
+    caminho = _arquivo_do_lock(engine)
+    with _lock_local:
+        if caminho is None:
+            yield
+            return
+        with open(caminho, "a+b") as f:
+            if os.name == "nt":
+                import msvcrt
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:  # LK_LOCK desiste depois de ~10 s
+                        time.sleep(0.5)
+                try:
+                    yield
+                finally:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+# ---------- aplicar ----------
+def aplicar(engine: Engine, ate: Optional[int] = None, log: Callable[[str], None] = lambda _: None) -> List[Migracao]:
+    """Aplica, sob o lock, as migrações que faltam (até `ate`). Devolve as aplicadas."""
+    alvo = versao_do_codigo() if ate is None else ate
+    aplicadas: List[Migracao] = []
+    with _trava(engine):
+        atual = versao_do_banco(engine)  # relida com o lock: outro processo pode ter terminado
+        for m in MIGRACOES:
+            if m.versao <= atual or m.versao > alvo:
+                continue
+            inicio = time.perf_counter()
+            with engine.begin() as conn:
+                _criar_tabela(conn)
+                m.aplicar(conn)
+                conn.execute(
+                    text(f"INSERT INTO {TABELA} (version, name) VALUES (:versao, :nome)"),
+                    {"versao": m.versao, "nome": m.nome},
+                )
+            aplicadas.append(m)
+            log(f"{m.versao:04d} {m.nome} ({(time.perf_counter() - inicio) * 1000:.0f} ms)")
+    return aplicadas
+
+def preparar(engine: Engine) -> None:
+    """
+    Startup do worker: um SELECT quando o banco está em dia. Atrasado, aplica
+    sob o lock (ou levanta BancoDesatualizado com MIGRATE_ON_STARTUP=0).
+    Adiantado (código mais velho que o banco) também recusa subir.
+    """
+    atual, esperada = versao_do_banco(engine), versao_do_codigo()
+    if atual == esperada:
+        return
+    if atual > esperada:
+        raise BancoDesatualizado(f"banco na versão {atual}, mais nova que a do código ({esperada})")
+    if not MIGRATE_ON_STARTUP:
+        raise BancoDesatualizado(
+            f"banco na versão {atual}, código espera {esperada}: rode `python -m app.query.migracoes upgrade`"
+        )
+    aplicar(engine)
+
+
+# ---------- conferência modelos x banco ----------
+def diferencas(engine: Engine) -> List[str]:
+    """Tabelas, colunas e índices dos modelos que não existem no banco (migração faltando)."""
+    import app.modelos.models  # noqa: F401  registra os modelos no metadata
+    from app.query.database import Base
+
+    faltando = []
+    insp = inspect(engine)
+    tabelas = set(insp.get_table_names())
+    for tabela in Base.metadata.sorted_tables:
+        if tabela.name not in tabelas:
+            faltando.append(f"tabela {tabela.name}")
+            continue
+        colunas = {c["name"] for c in insp.get_columns(tabela.name)}
+        faltando += [f"coluna {tabela.name}.{c.name}" for c in tabela.columns if c.name not in colunas]
+        indices = {i["name"] for i in insp.get_indexes(tabela.name)}
+        faltando += [f"índice {i.name}" for i in tabela.indexes if i.name not in indices]
+    return faltando
+
+
+# ---------- CLI ----------
+def main(argv: List[str]) -> int:
+    from app.query.database import engine
+
+    comando = argv[0] if argv else "status"
+    if comando == "upgrade":
+        ate = int(argv[1]) if len(argv) > 1 else None
+        aplicadas = aplicar(engine, ate=ate, log=print)
+        print(f"versão {versao_do_banco(engine)} ({len(aplicadas)} migrações aplicadas)")
+        return 0
+    if comando == "status":
+        atual = versao_do_banco(engine)
+        print(f"banco: {atual}  código: {versao_do_codigo()}")
+        for m in MIGRACOES:
+            print(f"  [{'x' if m.versao <= atual else ' '}] {m.versao:04d} {m.nome}")
+        return 0
+    if comando == "check":
+        faltando = diferencas(engine)
+        for item in faltando:
+            print(f"sem migração: {item}")
+        return 1 if faltando else 0
+    print("uso: python -m app.query.migracoes [upgrade [versão] | status | check]")
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
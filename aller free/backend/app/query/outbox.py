@@ -0,0 +1,381 @@
+# app/query/outbox.py
+"""
+Outbox: efeitos de uma escrita que rodam depois do commit, fora do request.
+
+A escrita chama enfileirar(db, topico, chave, payload) antes do commit, na
+mesma transação da mudança: a mudança e a mensagem entram juntas ou nenhuma
+entra. O request responde assim que o commit passa; quem processa é o
+trabalhador:
+
+- dentro de cada worker do uvicorn (padrão, OUTBOX_WORKER=inline): uma tarefa
+  acordada logo depois de cada commit que enfileirou e, a cada
+  OUTBOX_POLL_INTERVAL segundos, para pegar o que outros processos gravaram
+  e as novas tentativas;
+- ou num processo à parte (OUTBOX_WORKER=off nos workers):
+      python -m app.query.outbox run
+
+drenar(): confere no engine de leitura se há mensagem pronta (sem isso o poll
+pegaria o lock de escrita do SQLite a cada volta, com a fila vazia) e só então
+reserva até OUTBOX_BATCH mensagens prontas num UPDATE só (attempts
++ 1 e available_at empurrado OUTBOX_LEASE_SECONDS para a frente, então outro
+trabalhador não pega a mesma) e roda cada uma numa transação do escritor: o
+tratador do tópico faz o trabalho e a mensagem é marcada done no mesmo commit,
+desde que a reserva ainda seja dela. Efeito no banco acontece uma vez só;
+efeito externo (notificação, API de terceiros) é "pelo menos uma vez" e deve
+mandar mensagem.chave como chave de idempotência. Tratador com trabalho grande
+faz um pedaço por vez: devolve o payload do próximo passo e a mensagem volta
+para a fila já pronta (transações curtas, o escritor não fica preso).
+
+Falha: nova tentativa com espera exponencial (OUTBOX_RETRY_BASE_SECONDS,
+dobrando até OUTBOX_RETRY_MAX_SECONDS); depois de OUTBOX_MAX_ATTEMPTS a
+mensagem fica dead, com o último erro, até alguém rodar retry. Concluída fica
+OUTBOX_RETAIN_SECONDS (a chave continua valendo) e depois é podada.
+
+Tópicos: catalog_events.prune (poda do log do feed, app/query/eventos.py).
+Sem nenhum tópico registrado o trabalhador nem começa.
+
+Chave: uma por efeito. O mesmo efeito enfileirado de novo (request repetido,
+duas chamadas na mesma transação) é ignorado enquanto a mensagem existir.
+
+Fila e atraso: /metrics (outbox_pending, outbox_dead, outbox_lag_seconds e
+outbox_messages_total), GET /admin/outbox e
+
+    python -m app.query.outbox status    # por tópico: pendentes, mortas, atraso
+    python -m app.query.outbox drain     # processa tudo o que estiver pronto e sai
+    python -m app.query.outbox retry     # mensagens dead voltam para a fila
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+import orjson
+from sqlalchemy import delete, event, func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.modelos import models
+from app.query import metricas
+from app.query.database import AsyncReadSessionLocal, ReadSessionLocal, SessionLocal
+
+
+MODO = os.getenv("OUTBOX_WORKER", "inline")  # inline | off
+LOTE = int(os.getenv("OUTBOX_BATCH", "100"))
+POLL_SEGUNDOS = float(os.getenv("OUTBOX_POLL_INTERVAL", "1.0"))
+RESERVA_SEGUNDOS = float(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+MAX_TENTATIVAS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+ESPERA_BASE = float(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "1.0"))
+ESPERA_MAX = float(os.getenv("OUTBOX_RETRY_MAX_SECONDS", "300"))
+RETER_SEGUNDOS = float(os.getenv("OUTBOX_RETAIN_SECONDS", "86400"))
+PODA_SEGUNDOS = 60.0
+
+PENDENTE = "pending"
+CONCLUIDA = "done"
+MORTA = "dead"
+
+logger = logging.getLogger(__name__)
+
+_outbox = models.OutboxMessage.__table__
+
+
+@dataclass(frozen=True)
+class Mensagem:
+    id: int
+    topico: str
+    chave: str
+    payload: Dict[str, Any]
+    tentativa: int  # 1 na primeira vez
+    criada_em: datetime
+
+
+@dataclass
+class Situacao:
+    pendentes: int = 0
+    mortas: int = 0
+    mais_antiga: Optional[datetime] = None  # created_at da pendente mais antiga
+
+    def atraso(self, agora: Optional[datetime] = None) -> float:
+        """Segundos desde que a pendente mais antiga foi enfileirada (0 sem pendentes)."""
+        if self.mais_antiga is None:
+            return 0.0
+        return max(0.0, ((agora or datetime.utcnow()) - self.mais_antiga).total_seconds())
+
+
+# ---------- tratadores ----------
+# fn(db, mensagem) roda dentro da transação que conclui a mensagem e não comita.
+# Devolve None (terminou) ou o payload do próximo passo
+Tratador = Callable[[Session, Mensagem], Optional[Dict[str, Any]]]
+_tratadores: Dict[str, Tratador] = {}
+
+def tratador(topico: str) -> Callable[[Tratador], Tratador]:
+    def registrar(fn: Tratador) -> Tratador:
+        _tratadores[topico] = fn
+        return fn
+    return registrar
+
+
+# ---------- enfileirar (mesma transação da mudança) ----------
+def enfileirar(db, topico: str, chave: str, payload: Dict[str, Any]) -> None:
+    """Grava a mensagem (ignorada se a chave já existe). Aceita Session ou Connection. Não comita."""
+    agora = datetime.utcnow()
+    stmt = sqlite_insert(_outbox).values(
+        topic=topico, key=chave, payload=orjson.dumps(payload),
+        status=PENDENTE, attempts=0, available_at=agora, created_at=agora,
+    )
+    db.execute(stmt.on_conflict_do_nothing(index_elements=[_outbox.c.key]))
+    # acorda o trabalhador deste worker logo depois do commit
+    if isinstance(db, Session) and "outbox" not in db.info:
+        db.info["outbox"] = True
+        event.listen(db, "after_commit", _avisar)
+
+def _avisar(_session) -> None:
+    trabalhador.acordar()
+
+
+# ---------- processamento ----------
+def _prontas(agora: datetime):
+    return select(_outbox.c.id).where(_outbox.c.status == PENDENTE, _outbox.c.available_at <= agora)
+
+def _reservar(db: Session, limite: int) -> List[Mensagem]:
+    agora = datetime.utcnow()
+    # fila vazia (o caso comum) não chega ao escritor: o UPDATE abriria BEGIN IMMEDIATE
+    with ReadSessionLocal() as leitura:
+        if leitura.execute(_prontas(agora).limit(1)).first() is None:
+            return []
+    prontas = _prontas(agora).order_by(_outbox.c.available_at, _outbox.c.id).limit(limite)
+    rows = db.execute(
+        update(_outbox)
+        .where(_outbox.c.id.in_(prontas))
+        .values(attempts=_outbox.c.attempts + 1, available_at=agora + timedelta(seconds=RESERVA_SEGUNDOS))
+        .returning(_outbox.c.id, _outbox.c.topic, _outbox.c.key, _outbox.c.payload, _outbox.c.attempts, _outbox.c.created_at)
+    ).all()
+    db.commit()
+    return sorted(
+        (Mensagem(r.id, r.topic, r.key, orjson.loads(r.payload), r.attempts, r.created_at) for r in rows),
+        key=lambda m: m.id,
+    )
+
+def _fechar(db: Session, mensagem: Mensagem, **valores) -> bool:
+    """Atualiza a mensagem se a reserva ainda é desta tentativa (outro trabalhador não a pegou)."""
+    resultado = db.execute(
+        update(_outbox)
+        .where(_outbox.c.id == mensagem.id, _outbox.c.attempts == mensagem.tentativa)
+        .values(**valores)
+    )
+    return resultado.rowcount == 1
+
+def _processar(db: Session, mensagem: Mensagem) -> str:
+    fn = _tratadores.get(mensagem.topico)
+    try:
+        if fn is None:
+            raise LookupError(f"nenhum tratador para o tópico {mensagem.topico!r}")
+        proximo = fn(db, mensagem)
+        agora = datetime.utcnow()
+        if proximo is None:
+            valores = {"status": CONCLUIDA, "processed_at": agora, "last_error": None}
+        else:
+            # próximo passo: pronto já, com as tentativas zeradas
+            valores = {"payload": orjson.dumps(proximo), "attempts": 0, "available_at": agora}
+        if not _fechar(db, mensagem, **valores):
+            db.rollback()  # a reserva venceu e outro trabalhador pegou a mensagem
+            return "lost"
+        db.commit()
+        return "done" if proximo is None else "step"
+    except Exception as exc:
+        db.rollback()
+        erro = f"{type(exc).__name__}: {exc}"[:1000]
+        if mensagem.tentativa >= MAX_TENTATIVAS:
+            logger.error("outbox: mensagem %s (%s) desistida: %s", mensagem.id, mensagem.topico, erro)
+            _fechar(db, mensagem, status=MORTA, last_error=erro)
+            resultado = "dead"
+        else:
+            espera = min(ESPERA_BASE * 2 ** (mensagem.tentativa - 1), ESPERA_MAX)
+            logger.warning("outbox: mensagem %s (%s) falhou, nova tentativa em %.0f s: %s", mensagem.id, mensagem.topico, espera, erro)
+            _fechar(db, mensagem, available_at=datetime.utcnow() + timedelta(seconds=espera), last_error=erro)
+            resultado = "retry"
+        db.commit()
+        return resultado
+
+def drenar(limite: int = LOTE) -> int:
+    """Reserva e processa até `limite` mensagens prontas, uma transação cada. Devolve quantas."""
+    with SessionLocal() as db:
+        mensagens = _reservar(db, limite)
+        for mensagem in mensagens:
+            metricas.OUTBOX_MENSAGENS.inc((mensagem.topico, _processar(db, mensagem)))
+        return len(mensagens)
+
+def podar() -> int:
+    """Apaga as concluídas há mais de OUTBOX_RETAIN_SECONDS."""
+    limite = datetime.utcnow() - timedelta(seconds=RETER_SEGUNDOS)
+    with SessionLocal() as db:
+        n = db.execute(delete(_outbox).where(_outbox.c.status == CONCLUIDA, _outbox.c.processed_at < limite)).rowcount
+        db.commit()
+    return n
+
+def repetir_mortas(db: Session) -> int:
+    """Mensagens dead voltam para a fila com as tentativas zeradas. Não comita."""
+    return db.execute(
+        update(_outbox).where(_outbox.c.status == MORTA)
+        .values(status=PENDENTE, attempts=0, available_at=datetime.utcnow())
+    ).rowcount
+
+
+# ---------- fila e atraso ----------
+def _consulta_situacao():
+    return (
+        select(_outbox.c.topic, _outbox.c.status, func.count(), func.min(_outbox.c.created_at))
+        .where(_outbox.c.status.in_((PENDENTE, MORTA)))
+        .group_by(_outbox.c.topic, _outbox.c.status)
+    )
+
+def _agrupar(rows) -> Dict[str, Situacao]:
+    por_topico: Dict[str, Situacao] = {}
+    for topico, status, n, mais_antiga in rows:
+        situacao = por_topico.setdefault(topico, Situacao())
+        if status == PENDENTE:
+            situacao.pendentes, situacao.mais_antiga = n, mais_antiga
+        else:
+            situacao.mortas = n
+    return por_topico
+
+def situacao(db) -> Dict[str, Situacao]:
+    """Pendentes, mortas e pendente mais antiga por tópico (só os que têm alguma)."""
+    return _agrupar(db.execute(_consulta_situacao()).all())
+
+async def situacao_async(db: AsyncSession) -> Dict[str, Situacao]:
+    return _agrupar((await db.execute(_consulta_situacao())).all())
+
+async def mortas_async(db: AsyncSession, limite: int) -> List:
+    """As últimas mensagens dead, com o erro de cada uma."""
+    stmt = (
+        select(_outbox.c.id, _outbox.c.topic, _outbox.c.key, _outbox.c.attempts, _outbox.c.created_at, _outbox.c.last_error)
+        .where(_outbox.c.status == MORTA)
+        .order_by(_outbox.c.id.desc())
+        .limit(limite)
+    )
+    return (await db.execute(stmt)).all()
+
+
+# ---------- trabalhador do worker ----------
+class Trabalhador:
+    """
+    Tarefa do event loop: drena a fila no threadpool (o escritor é síncrono)
+    quando acordada por um commit ou a cada `poll` segundos, e guarda a
+    situação da fila para o /metrics. Com processar=False só lê a situação.
+    """
+
+    def __init__(self, poll: float = POLL_SEGUNDOS, lote: int = LOTE, processar: bool = MODO != "off"):
+        self.poll = poll
+        self.lote = lote
+        self.processar = processar
+        self.situacao: Dict[str, Situacao] = {}
+        self._tarefa: Optional[asyncio.Task] = None
+        self._acordar: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def iniciar(self) -> None:
+        """Startup. Sem tópico registrado não há o que processar nem fila para medir."""
+        if self._tarefa is None and _tratadores:
+            self._loop = asyncio.get_running_loop()
+            self._acordar = asyncio.Event()
+            self._tarefa = asyncio.create_task(self._rodar())
+
+    def acordar(self) -> None:
+        """Drena agora (chamado de qualquer thread, depois de um commit que enfileirou)."""
+        loop, sinal = self._loop, self._acordar
+        if self._tarefa is None or loop is None or sinal is None or not self.processar:
+            return
+        try:
+            loop.call_soon_threadsafe(sinal.set)
+        except RuntimeError:  # loop já fechado (shutdown)
+            pass
+
+    async def _rodar(self) -> None:
+        lido_em = podado_em = 0.0
+        while True:
+            try:
+                await asyncio.wait_for(self._acordar.wait(), self.poll)
+            except asyncio.TimeoutError:
+                pass
+            self._acordar.clear()
+            try:
+                if self.processar:
+                    if await run_in_threadpool(drenar, self.lote):
+                        self._acordar.set()  # pode ter mais (ou o próximo passo de uma mensagem)
+                    if time.monotonic() - podado_em >= PODA_SEGUNDOS:
+                        podado_em = time.monotonic()
+                        await run_in_threadpool(podar)
+                if time.monotonic() - lido_em >= self.poll:
+                    lido_em = time.monotonic()
+                    async with AsyncReadSessionLocal() as db:
+                        self.situacao = await situacao_async(db)
+            except Exception:
+                logger.exception("outbox: falha ao processar a fila")
+
+    async def encerrar(self) -> None:
+        """Shutdown: o que ficou na fila continua no banco para o próximo trabalhador."""
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            await asyncio.gather(self._tarefa, return_exceptions=True)
+            self._tarefa = None
+
+
+trabalhador = Trabalhador()
+
+
+# ---------- CLI ----------
+def _status() -> int:
+    with SessionLocal() as db:
+        por_topico = situacao(db)
+    if not por_topico:
+        print("fila vazia")
+    agora = datetime.utcnow()
+    for topico, s in sorted(por_topico.items()):
+        print(f"{topico}: {s.pendentes} pendentes, {s.mortas} mortas, atraso {s.atraso(agora):.1f} s")
+    return 1 if any(s.mortas for s in por_topico.values()) else 0
+
+def main(argv: List[str]) -> int:
+    import main  # noqa: F401  (as rotas importam os módulos que registram os tratadores)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    comando = argv[0] if argv else ""
+    if comando == "status":
+        return _status()
+    if comando == "drain":
+        total = 0
+        while (n := drenar()):
+            total += n
+        print(f"{total} mensagens processadas")
+        return _status()
+    if comando == "retry":
+        with SessionLocal() as db:
+            n = repetir_mortas(db)
+            db.commit()
+        print(f"{n} mensagens de volta na fila")
+        return 0
+    if comando == "run":
+        podado_em = 0.0
+        try:
+            while True:
+                try:
+                    n = drenar()
+                    if time.monotonic() - podado_em >= PODA_SEGUNDOS:
+                        podado_em = time.monotonic()
+                        podar()
+                except Exception:
+                    logger.exception("outbox: falha ao processar a fila")
+                    n = 0
+                if not n:
+                    time.sleep(POLL_SEGUNDOS)
+        except KeyboardInterrupt:
+            return 0
+    print("uso: python -m app.query.outbox [status | drain | retry | run]")
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
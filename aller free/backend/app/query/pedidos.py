@@ -0,0 +1,223 @@
+# app/query/pedidos.py
+"""
+Carrinho e pedidos no banco.
+
+A cópia quente de cada carrinho fica na memória do worker
+(app/cache/carrinhos.py); aqui ficam as duas transações que a levam ao banco:
+
+- gravar(db, lote): write-behind. Cada item do lote é o delta de um carrinho
+  desde a versão (carts.version) em que a memória se baseou. O lote inteiro
+  vai em ~5 statements (executemany / IN), qualquer que seja o número de
+  carrinhos. Se a versão no banco já não é a base (outro worker gravou ou
+  fechou o carrinho antes), o delta é aplicado por cima do que está lá e os
+  itens resultantes voltam para a memória se realinhar;
+- fechar(db, user_id, base, itens): checkout. Numa transação só: confere a
+  versão do carrinho (concorrência otimista: de dois checkouts do mesmo
+  carrinho, só um passa), lê preço e active de todos os itens num SELECT e
+  grava pedido, itens do pedido e o carrinho vazio. Nenhuma linha de products
+  é escrita: compradores do mesmo produto só disputam o escritor, e a
+  transação dura ~1 ms.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.modelos import models
+
+
+_carts = models.Cart.__table__
+_itens = models.CartItem.__table__
+_pedidos = models.Order.__table__
+_itens_pedido = models.OrderItem.__table__
+_produtos = models.Product.__table__
+
+
+@dataclass(frozen=True)
+class Item:
+    product_id: int
+    name: str
+    unit_price: float
+    quantity: int
+
+
+@dataclass
+class Delta:
+    """O que mudou num carrinho desde a base: product_id -> item (None = removido)."""
+    limpar: bool = False  # True: a base inteira foi descartada antes dos itens
+    itens: Dict[int, Optional[Item]] = field(default_factory=dict)
+
+    def __bool__(self) -> bool:
+        return self.limpar or bool(self.itens)
+
+    def aplicar(self, base: Dict[int, Item]) -> Dict[int, Item]:
+        novo = {} if self.limpar else dict(base)
+        for product_id, item in self.itens.items():
+            if item is None:
+                novo.pop(product_id, None)
+            else:
+                novo[product_id] = item
+        return novo
+
+    def depois(self, outro: "Delta") -> "Delta":
+        """Este delta seguido de `outro` (o mais novo vale)."""
+        if outro.limpar:
+            return outro
+        return Delta(self.limpar, {**self.itens, **outro.itens})
+
+
+@dataclass
+class Divergencia:
+    product_id: int
+    reason: str                   # "unavailable" | "price_changed"
+    old_price: float
+    price: Optional[float] = None  # preço atual (price_changed)
+    name: Optional[str] = None
+
+
+@dataclass
+class Pedido:
+    order_id: int
+    total: float
+    versao: int  # carts.version depois do checkout
+
+
+class CarrinhoMudou(Exception):
+    """carts.version não é mais a base: o carrinho foi gravado ou fechado em outro lugar."""
+
+
+class ItensDivergentes(Exception):
+    def __init__(self, divergencias: List[Divergencia]):
+        super().__init__(f"{len(divergencias)} itens mudaram")
+        self.divergencias = divergencias
+
+
+# ---------- leitura ----------
+def _de_linhas(rows) -> Dict[int, Dict[int, Item]]:
+    por_usuario: Dict[int, Dict[int, Item]] = {}
+    for user_id, product_id, name, unit_price, quantity in rows:
+        por_usuario.setdefault(user_id, {})[product_id] = Item(product_id, name, unit_price, quantity)
+    return por_usuario
+
+def _select_itens(user_ids: List[int]):
+    c = _itens.c
+    return select(c.user_id, c.product_id, c.name, c.unit_price, c.quantity).where(c.user_id.in_(user_ids))
+
+def _versoes(db: Session, user_ids: List[int]) -> Dict[int, int]:
+    return dict(db.execute(select(_carts.c.user_id, _carts.c.version).where(_carts.c.user_id.in_(user_ids))).all())
+
+async def carregar_async(db: AsyncSession, user_id: int) -> Tuple[int, Dict[int, Item]]:
+    """(versão, itens) do carrinho gravado; (0, {}) se o usuário nunca teve carrinho."""
+    versao = await versao_async(db, user_id)
+    itens = _de_linhas((await db.execute(_select_itens([user_id]))).all()).get(user_id, {})
+    return versao, itens
+
+async def versao_async(db: AsyncSession, user_id: int) -> int:
+    stmt = select(_carts.c.version).where(_carts.c.user_id == user_id)
+    return (await db.execute(stmt)).scalar_one_or_none() or 0
+
+async def produto_async(db: AsyncSession, product_id: int) -> Optional[Tuple[int, str, float, bool]]:
+    """(id, name, price, active) do produto, ou None."""
+    p = _produtos.c
+    return (await db.execute(select(p.id, p.name, p.price, p.active).where(p.id == product_id))).first()
+
+
+# ---------- gravação em lote (write-behind) ----------
+def _upsert_versao(db: Session, versoes: Dict[int, int]) -> None:
+    stmt = sqlite_insert(_carts)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[_carts.c.user_id],
+        set_={"version": stmt.excluded.version, "updated_at": stmt.excluded.updated_at},
+    )
+    agora = datetime.utcnow()
+    db.execute(stmt, [{"user_id": u, "version": v, "updated_at": agora} for u, v in versoes.items()])
+
+def gravar(db: Session, lote: List[Tuple[int, int, Delta]]) -> Dict[int, Tuple[int, Optional[Dict[int, Item]]]]:
+    """
+    lote = [(user_id, base, delta)], um por usuário. Comita e devolve
+    user_id -> (versão nova, itens gravados se a base estava velha, senão None).
+    """
+    ids = [user_id for user_id, _, _ in lote]
+    atuais = _versoes(db, ids)
+
+    limpar = [user_id for user_id, _, delta in lote if delta.limpar]
+    if limpar:
+        db.execute(delete(_itens).where(_itens.c.user_id.in_(limpar)))
+    remover = [
+        {"u": user_id, "p": product_id}
+        for user_id, _, delta in lote for product_id, item in delta.itens.items() if item is None
+    ]
+    if remover:
+        db.execute(
+            delete(_itens).where(_itens.c.user_id == bindparam("u"), _itens.c.product_id == bindparam("p")),
+            remover,
+        )
+    gravar_itens = [
+        {"user_id": user_id, "product_id": item.product_id, "name": item.name,
+         "unit_price": item.unit_price, "quantity": item.quantity}
+        for user_id, _, delta in lote for item in delta.itens.values() if item is not None
+    ]
+    if gravar_itens:
+        stmt = sqlite_insert(_itens)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[_itens.c.user_id, _itens.c.product_id],
+            set_={c: stmt.excluded[c] for c in ("name", "unit_price", "quantity")},
+        )
+        db.execute(stmt, gravar_itens)
+
+    versoes = {user_id: atuais.get(user_id, 0) + 1 for user_id in ids}
+    _upsert_versao(db, versoes)
+    velhos = [user_id for user_id, base, _ in lote if atuais.get(user_id, 0) != base]
+    gravados = _de_linhas(db.execute(_select_itens(velhos))) if velhos else {}
+    db.commit()
+    return {
+        user_id: (versoes[user_id], gravados.get(user_id, {}) if user_id in velhos else None)
+        for user_id in ids
+    }
+
+
+# ---------- checkout ----------
+def fechar(db: Session, user_id: int, base: int, itens: Dict[int, Item]) -> Pedido:
+    """
+    Grava o pedido com os itens do carrinho (na versão `base`) e esvazia o
+    carrinho. CarrinhoMudou / ItensDivergentes: nada é gravado.
+    """
+    if _versoes(db, [user_id]).get(user_id, 0) != base:
+        db.rollback()
+        raise CarrinhoMudou()
+
+    p = _produtos.c
+    atuais = {
+        row.id: row
+        for row in db.execute(select(p.id, p.merchant_id, p.name, p.price, p.active).where(p.id.in_(list(itens))))
+    }
+    divergencias = []
+    for item in itens.values():
+        produto = atuais.get(item.product_id)
+        if produto is None or not produto.active:
+            divergencias.append(Divergencia(item.product_id, "unavailable", item.unit_price, name=item.name))
+        elif produto.price != item.unit_price:
+            divergencias.append(
+                Divergencia(item.product_id, "price_changed", item.unit_price, produto.price, produto.name)
+            )
+    if divergencias:
+        db.rollback()
+        raise ItensDivergentes(divergencias)
+
+    total = round(sum(item.unit_price * item.quantity for item in itens.values()), 2)
+    order_id = db.execute(
+        insert(_pedidos).values(user_id=user_id, total=total, status="placed", created_at=datetime.utcnow())
+        .returning(_pedidos.c.id)
+    ).scalar_one()
+    db.execute(insert(_itens_pedido), [
+        {"order_id": order_id, "product_id": item.product_id, "merchant_id": atuais[item.product_id].merchant_id,
+         "name": item.name, "unit_price": item.unit_price, "quantity": item.quantity}
+        for item in itens.values()
+    ])
+    db.execute(delete(_itens).where(_itens.c.user_id == user_id))
+    _upsert_versao(db, {user_id: base + 1})
+    db.commit()
+    return Pedido(order_id, total, base + 1)
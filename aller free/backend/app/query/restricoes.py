@@ -0,0 +1,53 @@
+# app/query/restricoes.py
+"""
+Perfil alimentar do usuário (tabela user_dietary_tags): as tags que um produto
+precisa ter, todas, para servir a ele. GET /products/for-me lê o perfil a cada
+request (uma consulta pela chave primária), então a troca do perfil vale já no
+request seguinte, em qualquer worker.
+
+Tag apagada não sai dos perfis: o vínculo fica, aponta para uma tag que não
+existe e nenhum produto a tem, então o feed do usuário fica vazio até ele
+revisar o perfil. Para quem escolheu a restrição por alergia, não mostrar nada
+é mais seguro do que passar a mostrar produtos sem ela.
+"""
+from typing import List, Tuple
+
+from sqlalchemy import Row, delete, func, insert, select
+from sqlalchemy.orm import Session
+from app.modelos import models
+
+
+_perfis = models.user_dietary_tag_table
+
+
+def tags_do_usuario(db: Session, user_id: int) -> List[int]:
+    """tag_ids do perfil, inclusive os de tags já apagadas."""
+    return list(db.execute(select(_perfis.c.tag_id).where(_perfis.c.user_id == user_id)).scalars())
+
+def perfil(db: Session, user_id: int) -> Tuple[List[Row], int]:
+    """(tags existentes do perfil por id, quantas foram apagadas) numa consulta só."""
+    Tag = models.DietaryTag
+    rows = db.execute(
+        select(_perfis.c.tag_id, Tag.code, Tag.label)
+        .outerjoin(Tag, Tag.id == _perfis.c.tag_id)
+        .where(_perfis.c.user_id == user_id)
+        .order_by(_perfis.c.tag_id)
+    ).all()
+    existentes = [row for row in rows if row.code is not None]
+    return existentes, len(rows) - len(existentes)
+
+def gravar(db: Session, user_id: int, tag_ids: List[int]) -> None:
+    """Substitui o perfil inteiro. Não comita."""
+    db.execute(delete(_perfis).where(_perfis.c.user_id == user_id))
+    if tag_ids:
+        db.execute(insert(_perfis), [{"user_id": user_id, "tag_id": tag_id} for tag_id in dict.fromkeys(tag_ids)])
+
+def proximo_id_de_tag(db: Session) -> int:
+    """
+    Id para uma tag nova acima de qualquer id ainda citado num perfil: sem
+    AUTOINCREMENT o SQLite reusaria o id da última tag apagada, e o perfil de
+    quem exigia a tag antiga passaria a exigir a nova.
+    """
+    citado = db.execute(select(func.max(_perfis.c.tag_id))).scalar() or 0
+    atual = db.execute(select(func.max(models.DietaryTag.id))).scalar() or 0
+    return max(citado, atual) + 1
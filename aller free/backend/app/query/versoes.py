@@ -0,0 +1,76 @@
+# app/query/versoes.py
+"""
+Contadores de versão guardados no banco (tabela catalog_versions).
+
+Cada escrita que invalida um cache chama bump() antes do commit, então a nova
+versão fica visível para todos os workers exatamente quando a escrita fica.
+"""
+from typing import Dict, Iterable, List
+
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.modelos import models
+
+
+TAGS = "tags"
+# produtos existentes/ativos e vínculos product_tag (índice de bitmaps)
+PRODUTO_TAGS = "product_tags"
+# nomes/active dos produtos (índice de autocomplete, app/cache/sugestoes.py)
+SUGESTOES = "suggest"
+
+# chaves por entidade (uma linha por produto/loja que já mudou alguma vez)
+def produto(product_id: int) -> str:
+    return f"product:{product_id}"
+
+def loja(merchant_id: int) -> str:
+    """Coleção de produtos da loja (GET /products/merchant/{id})."""
+    return f"merchant:{merchant_id}:products"
+
+def bump(db: Session, *keys: str) -> List[int]:
+    """Incrementa as versões (cria a linha na primeira vez) e devolve as novas. Não comita."""
+    table = models.CatalogVersion.__table__
+    novas = []
+    for key in keys:
+        stmt = insert(table).values(key=key, version=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.key],
+            set_={"version": table.c.version + 1},
+        )
+        novas.append(db.execute(stmt.returning(table.c.version)).scalar_one())
+    return novas
+
+def bump_muitos(db: Session, keys: Iterable[str]) -> None:
+    """bump() de muitas chaves num executemany só (não devolve as versões). Não comita."""
+    keys = list(dict.fromkeys(keys))
+    if not keys:
+        return
+    table = models.CatalogVersion.__table__
+    stmt = insert(table).on_conflict_do_update(
+        index_elements=[table.c.key],
+        set_={"version": table.c.version + 1},
+    )
+    db.execute(stmt, [{"key": key, "version": 1} for key in keys])
+
+def _consulta_versao(key: str):
+    return select(models.CatalogVersion.version).where(models.CatalogVersion.key == key)
+
+def ler(db: Session, key: str) -> int:
+    return db.execute(_consulta_versao(key)).scalar_one_or_none() or 0
+
+async def ler_async(db: AsyncSession, key: str) -> int:
+    return (await db.execute(_consulta_versao(key))).scalar_one_or_none() or 0
+
+def _consulta_varios(keys):
+    return select(models.CatalogVersion.key, models.CatalogVersion.version).where(models.CatalogVersion.key.in_(keys))
+
+def ler_varios(db: Session, keys: Iterable[str]) -> Dict[str, int]:
+    keys = list(keys)
+    found = dict(db.execute(_consulta_varios(keys)).all())
+    return {key: found.get(key, 0) for key in keys}
+
+async def ler_varios_async(db: AsyncSession, keys: Iterable[str]) -> Dict[str, int]:
+    keys = list(keys)
+    found = dict((await db.execute(_consulta_varios(keys))).all())
+    return {key: found.get(key, 0) for key in keys}
@@ -0,0 +1,202 @@
+# app/query/vitrine.py
+"""
+Modelo de leitura do catálogo (tabela product_views).
+
+Ler um produto era products + product_tag + dietary_tags e montar as tags
+de cada um. Aqui cada produto tem uma linha com o ProductOut já codificado
+em JSON (body), com code/label das tags e o nome da loja, e as colunas que
+os filtros usam (merchant_id, name, active). As leituras do catálogo viram
+um SELECT numa tabela só e os bytes vão direto para a resposta
+(serializacao.lista / com_itens).
+
+Manutenção: as escritas chamam, antes do commit e na mesma transação,
+
+- atualizar(db, product_ids): produtos criados, alterados ou apagados
+  (refaz a linha a partir das tabelas de origem, ou apaga se o produto
+  não existe mais). Devolve o corpo antigo e o novo de cada produto que
+  mudou, que é o que o log do feed usa (eventos.produtos);
+- tag renomeada ou apagada: os produtos que a têm (produtos_da_tag, lidos
+  antes do delete no caso de apagar) passam por atualizar() na mesma
+  transação, antes de a versão "tags" mudar o ETag.
+
+O nome da loja não muda por nenhuma rota hoje; se passar a mudar, a rota
+chama atualizar() com os produtos da loja.
+
+Deriva (escrita direta no banco, bug numa rota):
+    python -m app.query.vitrine check     # compara com as tabelas de origem
+    python -m app.query.vitrine repair    # regrava só as linhas divergentes
+    python -m app.query.vitrine rebuild   # regrava tudo
+"""
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import Engine, delete, insert, select
+from sqlalchemy.orm import Session
+from app.modelos import models
+from app.esquemas import serializacao
+from app.query import catalogo
+
+
+LOTE = 500
+
+_views = models.ProductView.__table__
+
+
+@dataclass(frozen=True)
+class Mudanca:
+    id: int
+    antes: Optional[bytes]   # None: produto novo
+    depois: Optional[bytes]  # None: produto apagado
+
+
+# ---------- montagem ----------
+def _linhas(db, product_ids: List[int]) -> List[Dict]:
+    """Linhas de product_views dos produtos dados, montadas das tabelas de origem."""
+    Product, Merchant = models.Product, models.Merchant
+    rows = db.execute(
+        select(*catalogo.COLUNAS, Merchant.store_name)
+        .join(Merchant, Merchant.id == Product.merchant_id)
+        .where(Product.id.in_(product_ids))
+    ).all()
+    tags = catalogo.tags_dos_produtos(db, [r[0] for r in rows])
+    return [
+        {
+            "id": r[0],
+            "merchant_id": r[1],
+            "name": r[2],
+            "active": bool(r[5]),
+            "body": serializacao.dumps(serializacao.produto(r, tags.get(r[0], []), r[6])),
+        }
+        for r in rows
+    ]
+
+def _em_lotes(ids: List[int]) -> Iterator[List[int]]:
+    for i in range(0, len(ids), LOTE):
+        yield ids[i:i + LOTE]
+
+
+# ---------- escrita (mesma transação da mudança) ----------
+def atualizar(db, product_ids: Iterable[int]) -> List[Mudanca]:
+    """
+    Refaz as linhas dos produtos dados e devolve as que mudaram de fato
+    (corpo diferente). Aceita Session (faz flush antes: a sessão é
+    autoflush=False) ou Connection. Não comita.
+    """
+    ids = list(dict.fromkeys(product_ids))
+    if not ids:
+        return []
+    if isinstance(db, Session):
+        db.flush()
+    mudancas: List[Mudanca] = []
+    for bloco in _em_lotes(ids):
+        linhas = _linhas(db, bloco)
+        antes = dict(db.execute(select(_views.c.id, _views.c.body).where(_views.c.id.in_(bloco))).all())
+        db.execute(delete(_views).where(_views.c.id.in_(bloco)))
+        if linhas:
+            db.execute(insert(_views), linhas)
+        depois = {linha["id"]: linha["body"] for linha in linhas}
+        mudancas += [
+            Mudanca(pid, antes.get(pid), depois.get(pid))
+            for pid in bloco
+            if antes.get(pid) != depois.get(pid)
+        ]
+    return mudancas
+
+def produtos_da_tag(db, tag_id: int) -> List[int]:
+    pt = models.product_tag_table
+    return list(db.execute(select(pt.c.product_id).where(pt.c.tag_id == tag_id)).scalars())
+
+
+# ---------- leitura ----------
+def corpo(db: Session, product_id: int) -> Optional[bytes]:
+    return db.execute(select(_views.c.body).where(_views.c.id == product_id)).scalar_one_or_none()
+
+
+# ---------- conferência / reconstrução ----------
+@dataclass
+class Deriva:
+    conferidos: int = 0
+    faltando: List[int] = field(default_factory=list)    # produto sem linha
+    sobrando: List[int] = field(default_factory=list)    # linha sem produto
+    divergentes: List[int] = field(default_factory=list)  # body/colunas diferentes
+
+    @property
+    def ids(self) -> List[int]:
+        return self.faltando + self.sobrando + self.divergentes
+
+def _ids_por_bloco(conn, coluna) -> Iterator[List[int]]:
+    ultimo = 0
+    while True:
+        bloco = list(conn.execute(select(coluna).where(coluna > ultimo).order_by(coluna).limit(LOTE)).scalars())
+        if not bloco:
+            return
+        yield bloco
+        ultimo = bloco[-1]
+
+def verificar(conn) -> Deriva:
+    """Compara product_views com o que as tabelas de origem gerariam agora."""
+    deriva = Deriva()
+    for bloco in _ids_por_bloco(conn, models.Product.__table__.c.id):
+        esperadas = {linha["id"]: linha for linha in _linhas(conn, bloco)}
+        gravadas = {
+            row.id: row._asdict()
+            for row in conn.execute(select(_views).where(_views.c.id.in_(bloco)))
+        }
+        deriva.conferidos += len(bloco)
+        for pid in bloco:
+            if pid not in gravadas:
+                deriva.faltando.append(pid)
+            elif gravadas[pid] != esperadas.get(pid):
+                deriva.divergentes.append(pid)
+    produtos = models.Product.__table__.c.id
+    for bloco in _ids_por_bloco(conn, _views.c.id):
+        existentes = set(conn.execute(select(produtos).where(produtos.in_(bloco))).scalars())
+        deriva.sobrando += [pid for pid in bloco if pid not in existentes]
+    return deriva
+
+def reconstruir(conn) -> int:
+    """Regrava a tabela inteira. Devolve quantas linhas ficaram."""
+    conn.execute(delete(_views))
+    total = 0
+    for bloco in _ids_por_bloco(conn, models.Product.__table__.c.id):
+        linhas = _linhas(conn, bloco)
+        if linhas:
+            conn.execute(insert(_views), linhas)
+        total += len(linhas)
+    return total
+
+def rebuild(engine: Engine) -> int:
+    with engine.begin() as conn:
+        return reconstruir(conn)
+
+
+# ---------- CLI ----------
+def main(argv: List[str]) -> int:
+    from app.query.database import engine
+
+    comando = argv[0] if argv else ""
+    if comando == "rebuild":
+        print(f"product_views reconstruída ({rebuild(engine)} produtos)")
+        return 0
+    if comando in ("check", "repair"):
+        with engine.begin() as conn:
+            deriva = verificar(conn)
+            print(
+                f"{deriva.conferidos} produtos conferidos: {len(deriva.faltando)} faltando, "
+                f"{len(deriva.sobrando)} sobrando, {len(deriva.divergentes)} divergentes"
+            )
+            for nome in ("faltando", "sobrando", "divergentes"):
+                ids = getattr(deriva, nome)
+                if ids:
+                    print(f"  {nome}: {ids[:20]}{' ...' if len(ids) > 20 else ''}")
+            if comando == "repair" and deriva.ids:
+                atualizar(conn, deriva.ids)
+                print(f"{len(deriva.ids)} linhas regravadas")
+                return 0
+        return 1 if deriva.ids else 0
+    print("uso: python -m app.query.vitrine [check | repair | rebuild]")
+    return 2
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
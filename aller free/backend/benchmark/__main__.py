@@ -0,0 +1,125 @@
+# benchmark/__main__.py
+"""
+Suíte de benchmark da API (rodar a partir da pasta do main.py):
+
+    python -m benchmark gerar 100k                  # cria benchmark/bancos/100k.db
+    python -m benchmark micro 100k                  # funções quentes
+    python -m benchmark carga 100k --clientes 32 --requisicoes 20000
+    python -m benchmark caches 100k sugestoes       # caches em memória
+    python -m benchmark serializacao --produtos 5000  # banco em memória
+    python -m benchmark metricas                    # custo do middleware de /metrics
+    python -m benchmark comparar antes.json depois.json
+
+Escalas: 1k, 100k, 1m ou um número de produtos. micro e carga gravam o
+resultado em benchmark/resultados/<data>-<tipo>.json (ou em --saida).
+"""
+import argparse
+import os
+import sys
+from typing import List
+
+
+PASTA_BANCOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bancos")
+
+
+def _banco(args) -> str:
+    return args.banco or os.path.join(PASTA_BANCOS, f"{args.escala}.db")
+
+def _apontar_para(caminho: str) -> None:
+    # precisa acontecer antes do primeiro import de app.query.database
+    if not os.path.exists(caminho):
+        raise SystemExit(f"{caminho} não existe: rode antes `python -m benchmark gerar <escala>`")
+    from benchmark import dados
+    os.environ["DATABASE_URL"] = dados.url_do_arquivo(caminho)
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmark")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("gerar", help="gera o banco sintético")
+    p.add_argument("escala")
+    p.add_argument("--banco")
+    p.add_argument("--semente", type=int, default=42)
+    p.add_argument("--sobrescrever", action="store_true")
+
+    p = sub.add_parser("micro", help="micro-benchmarks das funções quentes")
+    p.add_argument("escala")
+    p.add_argument("--banco")
+    p.add_argument("--fator", type=float, default=1.0, help="multiplica as repetições")
+    p.add_argument("--saida")
+
+    p = sub.add_parser("carga", help="carga HTTP em processo (ASGI)")
+    p.add_argument("escala")
+    p.add_argument("--banco")
+    p.add_argument("--clientes", type=int, default=16)
+    p.add_argument("--requisicoes", type=int, default=5000)
+    p.add_argument("--semente", type=int, default=42)
+    p.add_argument("--saida")
+
+    p = sub.add_parser("caches", help="medições dos caches em memória (imprime, não grava)")
+    p.add_argument("escala")
+    p.add_argument("cache", choices=("sugestoes", "carrinhos", "perfis"))
+    p.add_argument("--banco")
+
+    p = sub.add_parser("serializacao", help="serialização do catálogo antes/depois (banco em memória)")
+    p.add_argument("--produtos", type=int, default=5000)
+
+    p = sub.add_parser("metricas", help="custo por request do middleware de métricas")
+    p.add_argument("--requisicoes", type=int, default=100_000)
+
+    p = sub.add_parser("comparar", help="compara dois resultados JSON")
+    p.add_argument("antes")
+    p.add_argument("depois")
+
+    args = parser.parse_args(argv)
+
+    if args.comando == "comparar":
+        from benchmark import medicao
+        medicao.comparar(args.antes, args.depois)
+        return 0
+    if args.comando == "serializacao":
+        from benchmark import micro
+        micro.serializacao(args.produtos)
+        return 0
+    if args.comando == "metricas":
+        from benchmark import micro
+        print(f"middleware de métricas: {micro.overhead_metricas(args.requisicoes):.2f} µs por request")
+        return 0
+
+    from benchmark import dados, medicao
+    escala = dados.Escala.de(args.escala)
+    banco = _banco(args)
+
+    if args.comando == "gerar":
+        os.makedirs(os.path.dirname(os.path.abspath(banco)), exist_ok=True)
+        try:
+            resumo = dados.gerar(banco, escala, semente=args.semente, sobrescrever=args.sobrescrever)
+        except FileExistsError:
+            print(f"{banco} já existe (use --sobrescrever)")
+            return 1
+        print(resumo)
+        return 0
+
+    _apontar_para(banco)
+    if args.comando == "caches":
+        from benchmark import caches
+        caches.CACHES[args.cache]()
+        return 0
+
+    parametros = {"escala": args.escala, "banco": os.path.abspath(banco)}
+    if args.comando == "micro":
+        from benchmark import micro
+        parametros["fator"] = args.fator
+        resultado = micro.rodar(escala, fator=args.fator)
+    else:
+        from benchmark import carga
+        parametros.update(clientes=args.clientes, requisicoes=args.requisicoes, semente=args.semente)
+        resultado = carga.rodar(escala, clientes=args.clientes, requisicoes=args.requisicoes, semente=args.semente)
+
+    resultado = {**medicao.metadados(args.comando, parametros), **resultado}
+    medicao.imprimir(resultado["operacoes"])
+    print(f"resultado: {medicao.salvar(resultado, args.saida)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,180 @@
+# benchmark/caches.py
+"""
+Medições dos caches em memória, direto no Python (sem HTTP):
+
+- sugestoes: construção, memória e latência do índice de prefixos
+  (app/cache/sugestoes.py);
+- carrinhos: latência de add/get/remove, gravação do lote e vazão do
+  checkout (app/cache/carrinhos.py). Grava carrinhos e pedidos no banco;
+- perfis: feed /for-me (lista pronta por perfil) x /filter (AND dos bitmaps)
+  e o custo de manter as listas (app/cache/perfis.py).
+
+Imprime os números em vez de gravar JSON: servem para dimensionar o cache,
+não para comparar execuções. Como em micro, DATABASE_URL já precisa apontar
+para um banco do benchmark antes de importar o app (o __main__ cuida disso).
+"""
+import asyncio
+import random
+import time
+from typing import Dict, List
+
+
+def _p(tempos: List[float], q: float) -> float:
+    return tempos[min(len(tempos) - 1, int(q * len(tempos)))] * 1e6
+
+
+def sugestoes(consultas: int = 20_000) -> None:
+    """Tempo de construção, memória e latência de consulta do autocomplete."""
+    from app.cache.sugestoes import indice
+    from app.query.database import AsyncReadSessionLocal, fechar_async
+
+    inicio = time.perf_counter()
+    arvore = indice._construir_agora()
+    construcao = time.perf_counter() - inicio
+    memoria = arvore.tamanho()
+    print(
+        f"{len(arvore.produto_termo) - 1} ids, {len(arvore.textos)} termos, {len(arvore.chaves)} chaves, "
+        f"{len(arvore.topo)} topos: construção {construcao:.1f} s, {memoria / 2**20:.1f} MiB"
+    )
+
+    rng = random.Random(1)
+    prefixos = [n[:rng.randint(1, min(len(n), 8))] for n in rng.choices(arvore.normas or ["a"], k=1000)]
+
+    async def rodar() -> List[float]:
+        tempos = []
+        async with AsyncReadSessionLocal() as db:
+            for i in range(consultas):
+                t0 = time.perf_counter()
+                await indice.sugerir_async(db, prefixos[i % len(prefixos)], 10)
+                tempos.append(time.perf_counter() - t0)
+        await fechar_async()
+        return sorted(tempos)
+
+    tempos = asyncio.run(rodar())
+    print(f"sugerir: p50 {_p(tempos, 0.5):.0f} µs  p99 {_p(tempos, 0.99):.0f} µs  máx {tempos[-1] * 1e6:.0f} µs")
+
+
+def carrinhos(usuarios: int = 2000, operacoes: int = 20_000, compradores: int = 200) -> None:
+    """
+    Latência de add/get/remove, tempo de gravação do lote e vazão do checkout
+    com todos comprando o mesmo produto.
+    """
+    from sqlalchemy import select
+    from app.cache.carrinhos import Carrinhos, ErroCarrinho
+    from app.modelos import models
+    from app.query import migracoes
+    from app.query.database import AsyncReadSessionLocal, SessionLocal, engine, fechar_async
+
+    migracoes.preparar(engine)
+    with SessionLocal() as db:
+        user_ids = db.scalars(select(models.User.id).order_by(models.User.id).limit(usuarios)).all()
+        produto_ids = db.scalars(select(models.Product.id).where(models.Product.active.is_(True)).limit(1000)).all()
+
+    async def operar(loja: Carrinhos) -> None:
+        rng = random.Random(1)
+        tempos: Dict[str, List[float]] = {"add": [], "get": [], "remove": []}
+        async with AsyncReadSessionLocal() as db:
+            for user_id in user_ids:
+                await loja.obter(db, user_id)
+            for _ in range(operacoes):
+                user_id = rng.choice(user_ids)
+                op = rng.choice(("add", "add", "get", "remove"))
+                t0 = time.perf_counter()
+                try:
+                    if op == "add":
+                        await loja.adicionar(db, user_id, rng.choice(produto_ids), 1)
+                    elif op == "get":
+                        await loja.obter(db, user_id)
+                    else:
+                        carrinho = await loja.obter(db, user_id)
+                        if not carrinho.itens:
+                            continue
+                        await loja.remover(db, user_id, next(iter(carrinho.itens)))
+                except ErroCarrinho:
+                    continue
+                tempos[op].append(time.perf_counter() - t0)
+        for op, t in tempos.items():
+            t.sort()
+            print(f"{op:7s} p50 {_p(t, 0.5):6.0f} µs  p99 {_p(t, 0.99):6.0f} µs  ({len(t)} ops)")
+        sujos = len(loja._sujos)
+        t0 = time.perf_counter()
+        while loja._sujos:
+            await loja.gravar()
+        print(f"gravação: {sujos} carrinhos em {(time.perf_counter() - t0) * 1e3:.0f} ms")
+
+    async def comprar(loja: Carrinhos, user_id: int) -> None:
+        async with AsyncReadSessionLocal() as db:
+            await loja.fechar(db, user_id)
+
+    async def checkout(concorrencia: int) -> None:
+        loja = Carrinhos()
+        compram = user_ids[:compradores]
+        async with AsyncReadSessionLocal() as db:
+            for user_id in compram:
+                await loja.adicionar(db, user_id, produto_ids[0], 1)
+        await loja.gravar()
+        t0 = time.perf_counter()
+        for i in range(0, len(compram), concorrencia):
+            await asyncio.gather(*(comprar(loja, u) for u in compram[i:i + concorrencia]))
+        segundos = time.perf_counter() - t0
+        print(f"checkout, {concorrencia:3d} simultâneos no mesmo produto: {len(compram) / segundos:.0f} pedidos/s")
+        await loja.encerrar()
+
+    async def rodar() -> None:
+        loja = Carrinhos()
+        await operar(loja)
+        await loja.encerrar()
+        for concorrencia in (1, 50, compradores):
+            await checkout(concorrencia)
+        await fechar_async()
+
+    asyncio.run(rodar())
+
+
+def perfis(quantos: int = 50, consultas: int = 20_000) -> None:
+    """for-me x /filter em `quantos` perfis sorteados, e o custo de manter as listas numa escrita."""
+    from sqlalchemy import select
+    from app.cache.indice_tags import indice as indice_tags
+    from app.cache.perfis import feeds
+    from app.modelos import models
+    from app.query.database import ReadSessionLocal
+
+    db = ReadSessionLocal()
+    tag_ids = list(db.execute(select(models.DietaryTag.id)).scalars())
+    rng = random.Random(1)
+    chaves = [frozenset(rng.sample(tag_ids, rng.randint(1, min(3, len(tag_ids))))) for _ in range(quantos)]
+
+    inicio = time.perf_counter()
+    indice_tags.versao(db)
+    print(f"índice de tags: {(time.perf_counter() - inicio) * 1e3:.0f} ms")
+    inicio = time.perf_counter()
+    for chave in set(chaves):
+        feeds.pagina(db, chave)
+    print(
+        f"{len(feeds)} perfis distintos construídos em {(time.perf_counter() - inicio) * 1e3:.0f} ms, "
+        f"{feeds.total_ids} ids ({feeds.total_ids * 4 / 2**20:.1f} MiB)"
+    )
+
+    for nome, consultar in (
+        ("for-me", lambda chave, depois_de: feeds.pagina(db, chave, depois_de, 50)),
+        ("filter", lambda chave, depois_de: indice_tags.consultar(db, todas=chave, active=True, depois_de=depois_de, limite=50)),
+    ):
+        tempos = []
+        for i in range(consultas):
+            chave = chaves[i % len(chaves)]
+            t0 = time.perf_counter()
+            consultar(chave, rng.randint(0, 50_000) if i % 2 else 0)
+            tempos.append(time.perf_counter() - t0)
+        tempos.sort()
+        print(f"{nome}: p50 {_p(tempos, 0.5):.0f} µs  p99 {_p(tempos, 0.99):.0f} µs")
+
+    versao = indice_tags.versao(db)
+    estados = {rng.randint(1, 50_000): (True, set(rng.sample(tag_ids, 2))) for _ in range(100)}
+    inicio = time.perf_counter()
+    for n, (pid, estado) in enumerate(estados.items(), start=1):
+        feeds._aplicado(versao + n, {pid: estado})
+    print(f"manutenção: {(time.perf_counter() - inicio) / len(estados) * 1e6:.0f} µs por produto alterado ({len(feeds)} perfis)")
+    db.close()
+
+
+CACHES = {"sugestoes": sugestoes, "carrinhos": carrinhos, "perfis": perfis}
@@ -0,0 +1,255 @@
+# benchmark/carga.py
+"""
+Driver de carga HTTP em processo: chama o app ASGI (main.app) direto, sem
+socket nem servidor, com N clientes virtuais concorrentes no mesmo event loop.
+
+Cada cliente sorteia a próxima operação pelos pesos de MISTURA (leituras do
+catálogo, escritas de lojista e login) e, como um navegador, lembra o ETag de
+cada URL e manda If-None-Match (as leituras com ETag podem voltar 304).
+O mapa determinístico de benchmark/dados.py dá os ids e os donos sem
+consultar o banco. Tudo sai da mesma semente, então duas execuções na mesma
+escala fazem a mesma sequência de requisições por cliente.
+
+O lifespan do app roda de verdade (startup/shutdown), como no uvicorn.
+"""
+import asyncio
+import random
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+import orjson
+
+from benchmark import dados, medicao
+
+
+# operação -> peso relativo
+MISTURA: Dict[str, int] = {
+    "GET /products/": 30,
+    "GET /products/{id}": 20,
+    "GET /products/filter": 10,
+    "GET /products/search": 10,
+    "GET /products/merchant/{id}": 8,
+    "GET /merchants/nearby": 5,
+    "GET /tags/": 4,
+    "POST /products/": 5,
+    "PATCH /products/{id}": 5,
+    "POST /auth/login": 3,
+}
+
+_PALAVRAS = ["integral", "bolo", "cenoura", "pão", "granola", "cacau", "queijo", "coco", "aveia"]
+
+
+# ---------- ASGI ----------
+class ClienteASGI:
+    """O mínimo de cliente HTTP sobre a interface ASGI (sem rede)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def requisitar(
+        self,
+        metodo: str,
+        caminho: str,
+        *,
+        corpo: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+        ip: str = "127.0.0.1",
+    ) -> Tuple[int, Dict[str, str]]:
+        caminho, _, query = caminho.partition("?")
+        dados_corpo = orjson.dumps(corpo) if corpo is not None else b""
+        cabecalhos = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+        if corpo is not None:
+            cabecalhos.append((b"content-type", b"application/json"))
+            cabecalhos.append((b"content-length", str(len(dados_corpo)).encode()))
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": metodo,
+            "scheme": "http",
+            "path": caminho,
+            "raw_path": caminho.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"bench")] + cabecalhos,
+            "client": (ip, 50000),
+            "server": ("bench", 80),
+        }
+        enviado = False
+        resposta: Dict[str, Any] = {"status": 0, "headers": {}}
+
+        async def receive():
+            nonlocal enviado
+            if not enviado:
+                enviado = True
+                return {"type": "http.request", "body": dados_corpo, "more_body": False}
+            await asyncio.Event().wait()  # desconexão nunca acontece
+
+        async def send(mensagem):
+            if mensagem["type"] == "http.response.start":
+                resposta["status"] = mensagem["status"]
+                resposta["headers"] = {k.decode().lower(): v.decode() for k, v in mensagem.get("headers", [])}
+
+        await self.app(scope, receive, send)
+        return resposta["status"], resposta["headers"]
+
+
+class Lifespan:
+    """Roda o startup/shutdown do app pelo protocolo lifespan do ASGI."""
+
+    def __init__(self, app):
+        self.app = app
+        self._entrada: asyncio.Queue = asyncio.Queue()
+        self._saida: asyncio.Queue = asyncio.Queue()
+        self._tarefa: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        scope = {"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}}
+        self._tarefa = asyncio.create_task(self.app(scope, self._entrada.get, self._saida.put))
+        await self._entrada.put({"type": "lifespan.startup"})
+        mensagem = await self._saida.get()
+        if mensagem["type"] != "lifespan.startup.complete":
+            raise RuntimeError(mensagem.get("message") or "startup do app falhou")
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._entrada.put({"type": "lifespan.shutdown"})
+        await self._saida.get()
+        await self._tarefa
+
+
+# ---------- operações ----------
+class ClienteVirtual:
+    def __init__(self, n: int, http: ClienteASGI, escala: dados.Escala, token: str, semente: int):
+        self.rng = random.Random(semente * 1000 + n)
+        self.http = http
+        self.escala = escala
+        self.etags: Dict[str, str] = {}
+        # cada cliente virtual escreve como um lojista fixo
+        self.merchant_id = 1 + n % escala.lojas
+        self.auth = {"Authorization": f"Bearer {token}"}
+        self.produtos_criados = 0
+
+    def _produto(self) -> int:
+        return self.rng.randint(1, self.escala.produtos)
+
+    def _tag(self) -> str:
+        return self.rng.choice(dados.TAGS)[0]
+
+    async def _get(self, caminho: str, params: Optional[Dict] = None) -> int:
+        if params:
+            caminho += "?" + urlencode(params, doseq=True)
+        headers = {}
+        if caminho in self.etags:
+            headers["If-None-Match"] = self.etags[caminho]
+        status, resposta = await self.http.requisitar("GET", caminho, headers=headers)
+        if "etag" in resposta:
+            self.etags[caminho] = resposta["etag"]
+        return status
+
+    def _corpo_produto(self) -> Dict:
+        return {
+            "merchant_id": self.merchant_id,
+            "name": f"{self.rng.choice(_PALAVRAS).capitalize()} bench",
+            "description": "criado pelo benchmark de carga",
+            "price": round(self.rng.uniform(2, 80), 2),
+            "tags": [self._tag()],
+        }
+
+    async def executar(self, operacao: str) -> int:
+        rng = self.rng
+        if operacao == "GET /products/":
+            params = {"limit": 50}
+            if rng.random() < 0.3:
+                params["tag"] = self._tag()
+            return await self._get("/products/", params)
+        if operacao == "GET /products/{id}":
+            return await self._get(f"/products/{self._produto()}")
+        if operacao == "GET /products/filter":
+            tags = rng.sample([t[0] for t in dados.TAGS], 2)
+            return await self._get("/products/filter", {"tags": tags[:1], "any_tags": tags[1:], "active": "true"})
+        if operacao == "GET /products/search":
+            return await self._get("/products/search", {"q": rng.choice(_PALAVRAS)})
+        if operacao == "GET /products/merchant/{id}":
+            return await self._get(f"/products/merchant/{rng.randint(1, self.escala.lojas)}")
+        if operacao == "GET /merchants/nearby":
+            lat, lng = rng.uniform(*dados._LAT), rng.uniform(*dados._LNG)
+            return await self._get("/merchants/nearby", {"lat": round(lat, 4), "lng": round(lng, 4), "radius": 50})
+        if operacao == "GET /tags/":
+            return await self._get("/tags/")
+        if operacao == "POST /products/":
+            status, _ = await self.http.requisitar("POST", "/products/", corpo=self._corpo_produto(), headers=self.auth)
+            return status
+        if operacao == "PATCH /products/{id}":
+            # um dos produtos gerados para a loja deste cliente
+            por_loja = max(1, self.escala.produtos // self.escala.lojas)
+            product_id = dados.produto_da_loja(self.merchant_id, rng.randrange(por_loja), self.escala)
+            status, _ = await self.http.requisitar(
+                "PATCH", f"/products/{product_id}", corpo=self._corpo_produto(), headers=self.auth,
+            )
+            return status
+        if operacao == "POST /auth/login":
+            user_id = rng.randint(1, self.escala.usuarios)
+            # IP sorteado: o limite por IP do login não deve medir o próprio driver
+            ip = f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+            status, _ = await self.http.requisitar(
+                "POST", "/auth/login", corpo={"email": dados.email(user_id), "password": dados.SENHA}, ip=ip,
+            )
+            return status
+        raise ValueError(f"operação desconhecida: {operacao}")
+
+
+# ---------- execução ----------
+async def _rodar(app, escala: dados.Escala, clientes: int, requisicoes: int, semente: int, mistura: Dict[str, int]):
+    from app.autenticacao import auth
+
+    http = ClienteASGI(app)
+    operacoes, pesos = list(mistura), list(mistura.values())
+    latencias: Dict[str, List[float]] = defaultdict(list)
+    erros: Dict[str, int] = defaultdict(int)
+    status_por_op: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+    restantes = requisicoes
+
+    async def cliente(n: int):
+        nonlocal restantes
+        vc = ClienteVirtual(n, http, escala, auth.create_access_token({"sub": str(1 + n % escala.lojas), "role": "merchant"}), semente)
+        relogio = time.perf_counter
+        while restantes > 0:
+            restantes -= 1
+            operacao = vc.rng.choices(operacoes, pesos)[0]
+            inicio = relogio()
+            try:
+                status = await vc.executar(operacao)
+            except Exception:
+                status = 599
+            latencias[operacao].append(relogio() - inicio)
+            status_por_op[operacao][status] += 1
+            if status >= 400:
+                erros[operacao] += 1
+
+    async with Lifespan(app):
+        inicio = time.perf_counter()
+        await asyncio.gather(*(cliente(n) for n in range(clientes)))
+        duracao = time.perf_counter() - inicio
+
+    todas = [t for ts in latencias.values() for t in ts]
+    resultado = {op: medicao.resumo(latencias[op], erros[op], duracao) for op in operacoes if latencias[op]}
+    for op, bloco in resultado.items():
+        bloco["status"] = {str(k): v for k, v in sorted(status_por_op[op].items())}
+    resultado["TOTAL"] = medicao.resumo(todas, sum(erros.values()), duracao)
+    return resultado, duracao
+
+def rodar(
+    escala: dados.Escala,
+    clientes: int = 16,
+    requisicoes: int = 5000,
+    semente: int = dados.SEMENTE_PADRAO,
+    mistura: Optional[Dict[str, int]] = None,
+) -> Dict[str, Any]:
+    """Importa main (DATABASE_URL já apontando para o banco gerado) e roda a carga."""
+    import main
+
+    operacoes, duracao = asyncio.run(_rodar(main.app, escala, clientes, requisicoes, semente, mistura or MISTURA))
+    return {"duracao_s": round(duracao, 3), "operacoes": operacoes}
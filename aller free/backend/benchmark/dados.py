@@ -0,0 +1,216 @@
+# benchmark/dados.py
+"""
+Gerador determinístico de um marketplace sintético para os benchmarks.
+
+A mesma escala e a mesma semente geram sempre as mesmas linhas (só o sal do
+hash bcrypt muda). A distribuição é fixa:
+
+- usuários 1..L são lojistas (usuário i é dono da loja i), os seguintes são clientes;
+- o produto i pertence à loja 1 + (i - 1) % L, então os produtos de uma loja
+  são conhecidos sem consultar o banco (a carga usa isso para as escritas);
+- cada produto tem de 0 a 3 tags do vocabulário TAGS;
+- todos os usuários têm a senha SENHA.
+
+O banco é criado do zero com create_all, carregado em lotes com executemany
+e só depois ganha os índices FTS (busca.py) e R*Tree (geo.py), que são
+populados de uma vez pelo instalar() de cada um. No fim as migrações
+(idempotentes) rodam para registrar a versão do esquema.
+"""
+import os
+import random
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List
+
+from sqlalchemy import create_engine, event, func, insert, select
+from sqlalchemy.engine import Engine
+
+
+ESCALAS = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+SEMENTE_PADRAO = 42
+SENHA = "bench-senha"
+PRODUTOS_POR_LOJA = 100
+CLIENTES_POR_PRODUTO = 0.05
+LOTE = 10_000
+
+TAGS = [
+    ("gluten_free", "Sem glúten"),
+    ("lactose_free", "Sem lactose"),
+    ("vegan", "Vegano"),
+    ("vegetarian", "Vegetariano"),
+    ("sugar_free", "Sem açúcar"),
+    ("low_carb", "Low carb"),
+    ("organic", "Orgânico"),
+    ("nut_free", "Sem castanhas"),
+    ("egg_free", "Sem ovo"),
+    ("soy_free", "Sem soja"),
+    ("kosher", "Kosher"),
+    ("halal", "Halal"),
+]
+
+_ITENS = [
+    "Pão", "Bolo", "Biscoito", "Granola", "Iogurte", "Queijo", "Leite", "Suco",
+    "Torrada", "Macarrão", "Pizza", "Brownie", "Cookie", "Tapioca", "Cuscuz",
+    "Barra de cereal", "Hambúrguer", "Sorvete", "Chocolate", "Pão de queijo",
+]
+_SABORES = [
+    "integral", "de cenoura", "de banana", "de aveia", "de coco", "de milho",
+    "de arroz", "de amêndoas", "de castanha", "de morango", "de cacau",
+    "de mandioca", "de grão-de-bico", "de quinoa", "caseiro", "artesanal",
+]
+_MARCAS = ["Aller", "Bom Grão", "Terra Viva", "Da Roça", "Nutri+", "Sabor Livre", "Vida Leve", "Raiz"]
+
+# lojas espalhadas por um retângulo que cobre boa parte do Brasil
+_LAT = (-30.0, -3.0)
+_LNG = (-55.0, -35.0)
+
+
+@dataclass(frozen=True)
+class Escala:
+    produtos: int
+    lojas: int
+    clientes: int
+
+    @property
+    def usuarios(self) -> int:
+        return self.lojas + self.clientes
+
+    @classmethod
+    def de(cls, nome_ou_produtos: str) -> "Escala":
+        produtos = ESCALAS.get(nome_ou_produtos.lower()) or int(nome_ou_produtos)
+        return cls(
+            produtos=produtos,
+            lojas=max(1, produtos // PRODUTOS_POR_LOJA),
+            clientes=max(10, int(produtos * CLIENTES_POR_PRODUTO)),
+        )
+
+
+# ---------- mapa determinístico (usado também pela carga) ----------
+def email(user_id: int) -> str:
+    return f"user{user_id}@bench.example.com"
+
+def loja_do_produto(product_id: int, escala: Escala) -> int:
+    return 1 + (product_id - 1) % escala.lojas
+
+def produto_da_loja(merchant_id: int, n: int, escala: Escala) -> int:
+    """n-ésimo (0, 1, ...) produto gerado da loja."""
+    return merchant_id + n * escala.lojas
+
+
+# ---------- linhas ----------
+def _usuarios(escala: Escala, hashed: str) -> Iterator[Dict]:
+    for i in range(1, escala.usuarios + 1):
+        lojista = i <= escala.lojas
+        yield {
+            "id": i,
+            "email": email(i),
+            "password": hashed,
+            "role": "merchant" if lojista else "client",
+            "name": f"Lojista {i}" if lojista else f"Cliente {i}",
+        }
+
+def _lojas(escala: Escala, rng: random.Random) -> Iterator[Dict]:
+    for i in range(1, escala.lojas + 1):
+        yield {
+            "id": i,
+            "user_id": i,
+            "store_name": f"{rng.choice(_MARCAS)} {i}",
+            "verified": rng.random() < 0.7,
+            "latitude": round(rng.uniform(*_LAT), 6),
+            "longitude": round(rng.uniform(*_LNG), 6),
+        }
+
+def _produtos(escala: Escala, rng: random.Random) -> Iterator[Dict]:
+    for i in range(1, escala.produtos + 1):
+        item, sabor, marca = rng.choice(_ITENS), rng.choice(_SABORES), rng.choice(_MARCAS)
+        yield {
+            "id": i,
+            "merchant_id": loja_do_produto(i, escala),
+            "name": f"{item} {sabor}",
+            "description": f"{item} {sabor} da {marca}, feito sem complicação.",
+            "price": round(rng.uniform(2, 80), 2),
+            "active": rng.random() < 0.9,
+        }
+
+def _vinculos(escala: Escala, rng: random.Random) -> Iterator[Dict]:
+    tag_ids = list(range(1, len(TAGS) + 1))
+    for i in range(1, escala.produtos + 1):
+        for tag_id in rng.sample(tag_ids, rng.choice((0, 1, 1, 2, 2, 3))):
+            yield {"product_id": i, "tag_id": tag_id}
+
+def _em_lotes(linhas: Iterator[Dict], tamanho: int = LOTE) -> Iterator[List[Dict]]:
+    lote: List[Dict] = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+# ---------- geração ----------
+def url_do_arquivo(caminho: str) -> str:
+    return f"sqlite:///{os.path.abspath(caminho)}"
+
+def _engine_de_carga(url: str) -> Engine:
+    engine = create_engine(url)
+
+    @event.listens_for(engine, "connect")
+    def _pragmas(dbapi_conn, _):
+        # só para a carga: o arquivo é descartável até o fim da geração
+        cur = dbapi_conn.cursor()
+        cur.execute("PRAGMA journal_mode = WAL")
+        cur.execute("PRAGMA synchronous = OFF")
+        cur.close()
+
+    return engine
+
+def gerar(caminho: str, escala: Escala, semente: int = SEMENTE_PADRAO, sobrescrever: bool = False) -> Dict:
+    """Cria o banco em `caminho` e devolve um resumo (contagens e tempo)."""
+    from app.query.database import Base
+    from app.modelos import models
+    from app.autenticacao import auth
+    from app.query import busca, geo, migracoes
+
+    if os.path.exists(caminho):
+        if not sobrescrever:
+            raise FileExistsError(caminho)
+        for sufixo in ("", "-wal", "-shm"):
+            if os.path.exists(caminho + sufixo):
+                os.remove(caminho + sufixo)
+
+    inicio = time.perf_counter()
+    rng = random.Random(semente)
+    engine = _engine_de_carga(url_do_arquivo(caminho))
+    Base.metadata.create_all(engine)
+    hashed = auth.hash_password(SENHA)
+
+    with engine.begin() as conn:
+        conn.execute(insert(models.DietaryTag.__table__), [
+            {"id": i, "code": code, "label": label} for i, (code, label) in enumerate(TAGS, start=1)
+        ])
+        for tabela, linhas in (
+            (models.User.__table__, _usuarios(escala, hashed)),
+            (models.Merchant.__table__, _lojas(escala, rng)),
+            (models.Product.__table__, _produtos(escala, rng)),
+            (models.product_tag_table, _vinculos(escala, rng)),
+        ):
+            for lote in _em_lotes(linhas):
+                conn.execute(insert(tabela), lote)
+
+    # índices derivados: criados depois da carga, populados de uma vez
+    busca.instalar(engine)
+    geo.instalar(engine)
+    migracoes.aplicar(engine)
+
+    with engine.connect() as conn:
+        vinculos = conn.execute(select(func.count()).select_from(models.product_tag_table)).scalar_one()
+    engine.dispose()
+    return {
+        "arquivo": os.path.abspath(caminho),
+        "semente": semente,
+        "escala": asdict(escala),
+        "vinculos": vinculos,
+        "segundos": round(time.perf_counter() - inicio, 2),
+    }
@@ -0,0 +1,108 @@
+# benchmark/medicao.py
+"""
+Estatísticas (p50/p95/p99, vazão) e os arquivos JSON de resultado.
+
+Cada execução vira um JSON com metadados (commit, Python, máquina, parâmetros)
+e um bloco por operação medida. comparar() lê dois desses arquivos e mostra a
+variação de cada percentil, para ver se uma mudança deixou a API mais rápida
+ou mais lenta.
+"""
+import json
+import math
+import os
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+
+PASTA_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+PERCENTIS = (50, 95, 99)
+
+
+def percentil(ordenados: Sequence[float], p: float) -> float:
+    """Percentil pelo método nearest-rank; `ordenados` já em ordem crescente."""
+    if not ordenados:
+        return 0.0
+    k = math.ceil(p / 100 * len(ordenados)) - 1
+    return ordenados[max(0, min(len(ordenados) - 1, k))]
+
+def resumo(latencias_s: List[float], erros: int = 0, duracao_s: Optional[float] = None) -> Dict[str, Any]:
+    """Resumo de uma lista de latências (segundos) em ms."""
+    ordenados = sorted(latencias_s)
+    n = len(ordenados)
+    bloco: Dict[str, Any] = {"n": n, "erros": erros}
+    for p in PERCENTIS:
+        bloco[f"p{p}_ms"] = round(percentil(ordenados, p) * 1000, 3)
+    bloco["media_ms"] = round(sum(ordenados) / n * 1000, 3) if n else 0.0
+    bloco["max_ms"] = round(ordenados[-1] * 1000, 3) if n else 0.0
+    total = duracao_s if duracao_s is not None else sum(ordenados)
+    bloco["ops_por_s"] = round(n / total, 1) if total else 0.0
+    return bloco
+
+def cronometrar(fn, repeticoes: int, aquecimento: int = 3) -> List[float]:
+    """Chama fn() `repeticoes` vezes e devolve a latência de cada chamada."""
+    for _ in range(aquecimento):
+        fn()
+    tempos = []
+    relogio = time.perf_counter
+    for _ in range(repeticoes):
+        inicio = relogio()
+        fn()
+        tempos.append(relogio() - inicio)
+    return tempos
+
+
+# ---------- arquivos ----------
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5, cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def metadados(tipo: str, parametros: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "tipo": tipo,
+        "quando": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "maquina": f"{platform.system()} {platform.machine()} ({os.cpu_count()} cpus)",
+        "parametros": parametros,
+    }
+
+def salvar(resultado: Dict[str, Any], caminho: Optional[str] = None) -> str:
+    if caminho is None:
+        os.makedirs(PASTA_RESULTADOS, exist_ok=True)
+        carimbo = datetime.now().strftime("%Y%m%d-%H%M%S")
+        caminho = os.path.join(PASTA_RESULTADOS, f"{carimbo}-{resultado['tipo']}.json")
+    with open(caminho, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    return caminho
+
+def imprimir(operacoes: Dict[str, Dict[str, Any]]) -> None:
+    print(f"{'operação':28s} {'n':>7s} {'erros':>6s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'ops/s':>9s}")
+    for nome, b in operacoes.items():
+        print(f"{nome:28s} {b['n']:7d} {b['erros']:6d} {b['p50_ms']:9.3f} {b['p95_ms']:9.3f} {b['p99_ms']:9.3f} {b['ops_por_s']:9.1f}")
+
+def comparar(caminho_antes: str, caminho_depois: str) -> None:
+    """Variação de p50/p95/p99 e vazão por operação (negativo = mais rápido)."""
+    with open(caminho_antes, encoding="utf-8") as f:
+        antes = json.load(f)
+    with open(caminho_depois, encoding="utf-8") as f:
+        depois = json.load(f)
+    print(f"antes:  {antes.get('commit')} {antes.get('quando')}")
+    print(f"depois: {depois.get('commit')} {depois.get('quando')}")
+    print(f"{'operação':28s} {'p50':>9s} {'p95':>9s} {'p99':>9s} {'ops/s':>9s}")
+    for nome, b in depois["operacoes"].items():
+        a = antes["operacoes"].get(nome)
+        if a is None:
+            print(f"{nome:28s} (nova)")
+            continue
+        colunas = []
+        for campo in ("p50_ms", "p95_ms", "p99_ms", "ops_por_s"):
+            colunas.append(f"{(b[campo] - a[campo]) / a[campo] * 100:+8.1f}%" if a[campo] else f"{'-':>9s}")
+        print(f"{nome:28s} " + " ".join(colunas))
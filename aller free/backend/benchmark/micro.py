@@ -0,0 +1,206 @@
+# benchmark/micro.py
+"""
+Micro-benchmarks das funções quentes, direto no Python (sem HTTP):
+
+- list_products: consulta da página do catálogo (catalogo.buscar_produtos),
+  sem filtro, com tag e com texto;
+- get_current_user: dependência de autenticação com o cache de principais
+  quente e frio;
+- verify_password: bcrypt no custo atual (BCRYPT_ROUNDS);
+- serialização de uma página de ProductOut: caminho pydantic (ORM ->
+  ProductOut -> JSON), linhas -> dict -> orjson, e os corpos prontos de
+  product_views (o que o catálogo usa).
+
+O banco precisa ter sido gerado por `python -m benchmark gerar` e
+DATABASE_URL já precisa apontar para ele antes de importar o app
+(o __main__ cuida disso).
+
+serializacao(n): os mesmos três caminhos de serialização sobre a tabela
+inteira, num banco em memória com n produtos, conferindo que os três geram
+o mesmo JSON; tempo por 1k produtos (python -m benchmark serializacao).
+
+overhead_metricas(n): custo por request do middleware de métricas
+(app/query/metricas.py) contra um app ASGI vazio (python -m benchmark metricas).
+"""
+import asyncio
+import json
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmark import dados, medicao
+
+
+def _casos(escala: dados.Escala) -> List[Tuple[str, Callable[[], Any], int]]:
+    from fastapi.security import HTTPAuthorizationCredentials
+    from pydantic import TypeAdapter
+    from sqlalchemy import select
+    from app.autenticacao import auth
+    from app.cache import principais
+    from app.dependencias import dependencies
+    from app.esquemas import schemas, serializacao
+    from app.modelos import models
+    from app.query import catalogo
+    from app.query.database import ReadSessionLocal
+
+    def listar(**filtros):
+        def fn():
+            db = ReadSessionLocal()
+            try:
+                serializacao.pagina(catalogo.buscar_produtos(db, limit=catalogo.DEFAULT_PAGE_SIZE, **filtros))
+            finally:
+                db.close()
+        return fn
+
+    # token de um lojista do meio da faixa (o principal tem merchant_id)
+    user_id = max(1, escala.lojas // 2)
+    credenciais = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=auth.create_access_token({"sub": str(user_id), "role": "merchant"}),
+    )
+
+    def usuario_atual(frio: bool):
+        def fn():
+            if frio:
+                principais.limpar()
+            dependencies.get_current_user(credenciais, ReadSessionLocal())
+        return fn
+
+    db = ReadSessionLocal()
+    hashed = db.execute(select(models.User.password).where(models.User.id == 1)).scalar_one()
+    db.close()
+
+    pagina = TypeAdapter(List[schemas.ProductOut])
+
+    def serializar_pydantic():
+        db = ReadSessionLocal()
+        try:
+            objs = db.execute(
+                select(models.Product).order_by(models.Product.id).limit(catalogo.DEFAULT_PAGE_SIZE).options(catalogo.com_tags())
+            ).scalars().all()
+            pagina.dump_json(pagina.validate_python(objs, from_attributes=True))
+        finally:
+            db.close()
+
+    def serializar_catalogo():
+        db = ReadSessionLocal()
+        try:
+            rows = db.execute(select(*catalogo.COLUNAS).order_by(models.Product.id).limit(catalogo.DEFAULT_PAGE_SIZE)).all()
+            serializacao.dumps(serializacao.produtos(rows, catalogo.tags_dos_produtos(db, [r[0] for r in rows])))
+        finally:
+            db.close()
+
+    def serializar_vitrine():
+        db = ReadSessionLocal()
+        try:
+            View = models.ProductView
+            corpos = db.execute(select(View.body).order_by(View.id).limit(catalogo.DEFAULT_PAGE_SIZE)).scalars().all()
+            serializacao.lista(corpos)
+        finally:
+            db.close()
+
+    return [
+        ("list_products", listar(), 500),
+        ("list_products?tag", listar(tag=dados.TAGS[0][0]), 500),
+        ("list_products?q", listar(q="integral"), 200),
+        ("get_current_user (quente)", usuario_atual(frio=False), 2000),
+        ("get_current_user (frio)", usuario_atual(frio=True), 1000),
+        ("verify_password", lambda: auth.verify_password(dados.SENHA, hashed), 10),
+        ("ProductOut x50 (pydantic)", serializar_pydantic, 300),
+        ("ProductOut x50 (orjson)", serializar_catalogo, 300),
+        ("ProductOut x50 (product_views)", serializar_vitrine, 300),
+    ]
+
+def rodar(escala: dados.Escala, fator: float = 1.0) -> Dict[str, Any]:
+    """Roda todos os casos; `fator` multiplica o número de repetições."""
+    operacoes: Dict[str, Dict[str, Any]] = {}
+    for nome, fn, repeticoes in _casos(escala):
+        tempos = medicao.cronometrar(fn, max(1, int(repeticoes * fator)))
+        operacoes[nome] = medicao.resumo(tempos)
+    return {"operacoes": operacoes}
+
+
+def serializacao(n: int = 5000) -> None:
+    """Antes/depois da serialização do catálogo, por 1k produtos, num banco em memória."""
+    from pydantic import TypeAdapter
+    from sqlalchemy import create_engine, insert, select
+    from sqlalchemy.orm import Session
+    from app.esquemas import schemas, serializacao as ser
+    from app.modelos import models
+    from app.query import catalogo, vitrine
+    from app.query.database import Base
+
+    eng = create_engine("sqlite://")
+    Base.metadata.create_all(eng)
+    with Session(eng) as db:
+        db.add(models.User(id=1, email="bench@example.com", password="x"))
+        db.add(models.Merchant(id=1, user_id=1, store_name="bench"))
+        db.add_all([models.DietaryTag(id=i, code=f"tag{i}", label=f"Tag {i}") for i in range(1, 9)])
+        db.flush()
+        db.execute(insert(models.Product.__table__), [
+            {"id": i, "merchant_id": 1, "name": f"Produto {i}", "description": "descrição " * 5, "price": i / 10, "active": True}
+            for i in range(1, n + 1)
+        ])
+        db.execute(insert(models.product_tag_table), [
+            {"product_id": i, "tag_id": t} for i in range(1, n + 1) for t in (1 + i % 8, 1 + (i + 3) % 8)
+        ])
+        vitrine.reconstruir(db.connection())
+        db.commit()
+
+    adaptador = TypeAdapter(List[schemas.ProductOut])
+
+    def antes():
+        # caminho antigo: ORM + selectinload -> ProductOut por objeto -> json da stdlib
+        with Session(eng) as db:
+            objs = db.execute(select(models.Product).order_by(models.Product.id).options(catalogo.com_tags())).scalars().all()
+            validados = adaptador.validate_python(objs, from_attributes=True)
+            return json.dumps(adaptador.dump_python(validados, mode="json")).encode()
+
+    def depois():
+        with Session(eng) as db:
+            rows = db.execute(select(*catalogo.COLUNAS).order_by(models.Product.id)).all()
+            tags = catalogo.tags_dos_produtos(db, [r[0] for r in rows])
+            return ser.dumps(ser.produtos(rows, tags))
+
+    def pronto():
+        with Session(eng) as db:
+            View = models.ProductView
+            return ser.lista(db.execute(select(View.body).order_by(View.id)).scalars().all())
+
+    # store_name só existe em product_views (o Product ORM não tem o atributo)
+    esperado = [dict(p, store_name="bench") for p in json.loads(antes())]
+    assert [dict(p, store_name="bench") for p in json.loads(depois())] == esperado == json.loads(pronto())
+    for nome, fn in (
+        ("antes (ORM + ProductOut + json)", antes),
+        ("linhas + orjson", depois),
+        ("product_views (corpos prontos)", pronto),
+    ):
+        fn()
+        rodadas = 5
+        inicio = time.perf_counter()
+        for _ in range(rodadas):
+            fn()
+        ms_por_mil = (time.perf_counter() - inicio) / rodadas / n * 1000 * 1000
+        print(f"{nome:34s} {ms_por_mil:7.2f} ms / 1k produtos")
+
+
+def overhead_metricas(requests: int = 100_000) -> float:
+    """Custo do middleware de métricas por request em µs, contra um app ASGI vazio."""
+    from app.query.metricas import MiddlewareMetricas
+
+    async def vazio(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+
+    async def nada(_):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/bench"}
+
+    async def rodar(app) -> float:
+        inicio = time.perf_counter()
+        for _ in range(requests):
+            await app(scope, None, nada)
+        return time.perf_counter() - inicio
+
+    async def comparar() -> float:
+        return (await rodar(MiddlewareMetricas(vazio, slow_request_ms=0)) - await rodar(vazio)) / requests * 1e6
+
+    return asyncio.run(comparar())
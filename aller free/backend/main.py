@@ -2,26 +2,73 @@
 from fastapi import FastAPI
 
 
-# importa engine/Base do pacote app (sua pasta app tem database.py)
-from app.query.database import Base, engine
+# importa engine do pacote app (app/query/database.py)
+from app.query.database import engine
 
-# IMPORTA models ANTES de criar as tabelas
-# isso garante que Base.metadata conheça todas as tabelas declaradas
+# IMPORTA models para o mapeamento do ORM
 import app.modelos.models  # <- garante que os modelos sejam registrados no metadata
 
-# Cria as tabelas na inicialização (aponta para database.db definido em app/database.py)
-Base.metadata.create_all(bind=engine)
+# esquema versionado (app/query/migracoes.py): com o banco em dia é um SELECT só.
+# Em produção rode `python -m app.query.migracoes upgrade` antes de subir os workers
+from app.query import migracoes
+migracoes.preparar(engine)
 
 # cria a app
 app = FastAPI(title="IHC Marketplace - MVP")
 
+# APP_DEBUG=1: devolve X-SQL-Count / X-SQL-Time-Ms em cada resposta
+from app.query import instrumentacao
+if instrumentacao.DEBUG:
+    app.middleware("http")(instrumentacao.middleware_contagem)
+
+# métricas Prometheus em /metrics: latência por rota, SQL, pool e fila do bcrypt
+# (SLOW_REQUEST_MS > 0 loga os requests lentos com o SQL de cada um)
+from app.query import metricas
+app.add_middleware(metricas.MiddlewareMetricas)
+
 # importa routers dos endpoints (são módulos irmãos na pasta endpoints/)
-from app.endpoints import usuario, produto, lojista, tags
+from app.endpoints import usuario, produto, lojista, tags, eventos, carrinho, admin, perfil, metricas as metricas_endpoint
 
 app.include_router(usuario.router)
 app.include_router(produto.router)
 app.include_router(lojista.router)
 app.include_router(tags.router)
+app.include_router(eventos.router)
+app.include_router(carrinho.router)
+app.include_router(admin.router)
+app.include_router(perfil.router)
+app.include_router(metricas_endpoint.router)
+
+# pool de processos do bcrypt (app/autenticacao/senhas.py)
+from app.autenticacao import senhas
+app.add_event_handler("shutdown", senhas.encerrar)
+
+# índice de bitmaps das tags (app/cache/indice_tags.py): construído já no startup
+from app.cache.indice_tags import indice as indice_tags
+app.add_event_handler("startup", indice_tags.aquecer)
+
+# autocomplete (app/cache/sugestoes.py): trie dos nomes de produto, também no startup
+from app.cache.sugestoes import indice as indice_sugestoes
+app.add_event_handler("startup", indice_sugestoes.aquecer)
+
+# feed /ws/catalog (app/cache/canal.py): para a leitura do log e as tarefas de envio
+from app.cache.canal import canal
+app.add_event_handler("shutdown", canal.encerrar)
+
+# carrinhos em memória (app/cache/carrinhos.py): grava o que falta antes de sair
+from app.cache.carrinhos import carrinhos
+app.add_event_handler("shutdown", carrinhos.encerrar)
+
+# outbox (app/query/outbox.py): trabalhador que processa os efeitos deixados
+# para depois do commit, como a poda do log do feed (OUTBOX_WORKER=off quando
+# roda em processo à parte)
+from app.query.outbox import trabalhador as trabalhador_outbox
+app.add_event_handler("startup", trabalhador_outbox.iniciar)
+app.add_event_handler("shutdown", trabalhador_outbox.encerrar)
+
+# pool do engine async (aiosqlite) das rotas de leitura
+from app.query.database import fechar_async
+app.add_event_handler("shutdown", fechar_async)
 
 # rota simples pra sanity check
 @app.get("/")
@@ -0,0 +1,79 @@
+# tests/conftest.py
+"""
+Cada sessão de testes roda num banco SQLite novo, num diretório temporário.
+O ambiente é montado antes de importar o app: app/query/database.py lê
+DATABASE_URL no import.
+
+O trabalhador do outbox fica desligado (OUTBOX_WORKER=off, sem poll) para
+que nada rode no engine por fora dos requests: assert_max_queries conta
+todo statement do processo.
+"""
+import os
+import shutil
+import tempfile
+
+_DIR = tempfile.mkdtemp(prefix="aller-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DIR, 'test.db')}"
+os.environ["OUTBOX_WORKER"] = "off"
+os.environ["OUTBOX_POLL_INTERVAL"] = "3600"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ.pop("APP_DEBUG", None)
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+
+    with TestClient(main.app) as c:
+        yield c
+    shutil.rmtree(_DIR, ignore_errors=True)
+
+
+def _login(client, email: str, role: str) -> dict:
+    client.post("/auth/register", json={"email": email, "password": "segredo", "role": role})
+    token = client.post("/auth/login", json={"email": email, "password": "segredo"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(scope="session")
+def admin(client) -> dict:
+    return _login(client, "admin@teste.com", "admin")
+
+
+def _lojista(client, email: str, loja: str) -> dict:
+    headers = _login(client, email, "merchant")
+    merchant = client.post("/merchants/", json={"store_name": loja}, headers=headers).json()
+    return {**headers, "merchant_id": str(merchant["id"])}
+
+
+@pytest.fixture(scope="session")
+def lojista(client) -> dict:
+    """Headers de um lojista com loja criada (merchant_id em lojista["merchant_id"])."""
+    return _lojista(client, "loja@teste.com", "Empório Teste")
+
+
+@pytest.fixture(scope="session")
+def outro_lojista(client) -> dict:
+    """Um segundo lojista, dono de outra loja (posse, filtros por loja)."""
+    return _lojista(client, "outra.loja@teste.com", "Outra Loja")
+
+
+@pytest.fixture(scope="session")
+def catalogo(client, admin, lojista) -> dict:
+    """60 produtos da loja do lojista, com 0 a 3 tags cada."""
+    codes = ["vegano", "sem_gluten", "sem_lactose"]
+    for code in codes:
+        client.post("/tags/", json={"code": code, "label": code.replace("_", " ")}, headers=admin)
+    headers = {"Authorization": lojista["Authorization"]}
+    merchant_id = int(lojista["merchant_id"])
+    for i in range(60):
+        r = client.post(
+            "/products/",
+            json={"merchant_id": merchant_id, "name": f"Pão integral {i}", "price": i, "tags": codes[: i % 4]},
+            headers=headers,
+        )
+        assert r.status_code == 201, r.text
+    return {"merchant_id": merchant_id, "tags": codes}
@@ -0,0 +1,27 @@
+# tests/test_admin.py
+from sqlalchemy import event
+from app.query.database import engine
+
+
+def test_verificar_loja_usa_uma_transacao_so(client, admin, outro_lojista):
+    merchant_id = int(outro_lojista["merchant_id"])
+    inicios = []
+
+    def contar(conn):
+        inicios.append(conn)
+
+    event.listen(engine, "begin", contar)
+    try:
+        r = client.patch(f"/lojistas/verify/{merchant_id}", headers=admin)
+        de_novo = client.patch(f"/lojistas/verify/{merchant_id}", headers=admin)
+    finally:
+        event.remove(engine, "begin", contar)
+    assert r.status_code == 200, r.text
+    assert r.json()["id"] == merchant_id and r.json()["verified"] is True
+    assert r.json()["store_name"] == "Outra Loja"
+    assert de_novo.status_code == 200 and de_novo.json() == r.json()
+    assert len(inicios) == 2  # um BEGIN por requisição, nada depois do commit
+
+
+def test_verificar_loja_inexistente(client, admin):
+    assert client.patch("/lojistas/verify/999999", headers=admin).status_code == 404
@@ -0,0 +1,245 @@
+# tests/test_carrinhos.py
+"""
+Carrinhos write-behind (app/cache/carrinhos.py) e checkout (app/query/pedidos.py).
+
+Dois Carrinhos() fazem o papel de dois workers do uvicorn sobre o mesmo banco.
+O intervalo de gravação é enorme: nada vai para o banco sem o teste chamar
+gravar(), fechar() ou encerrar(). As leituras usam um engine async próprio
+(NullPool), para cada asyncio.run não herdar conexões do loop do TestClient.
+"""
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from app.cache import carrinhos as modulo
+from app.cache.carrinhos import Carrinhos, ErroCarrinho
+from app.modelos import models
+from app.query import pedidos
+from app.query.database import ASYNC_DATABASE_URL, SessionLocal
+
+_engine = create_async_engine(ASYNC_DATABASE_URL, poolclass=NullPool)
+_Sessao = async_sessionmaker(_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def _worker() -> Carrinhos:
+    return Carrinhos(intervalo=3600)
+
+def _rodar(fn):
+    """Roda fn(db) num loop novo, com uma sessão de leitura."""
+    async def principal():
+        async with _Sessao() as db:
+            return await fn(db)
+    return asyncio.run(principal())
+
+def _gravado(user_id: int):
+    """(versão, {product_id: quantidade}) do carrinho no banco."""
+    with SessionLocal() as db:
+        versao = db.execute(select(models.Cart.version).where(models.Cart.user_id == user_id)).scalar() or 0
+        itens = db.execute(
+            select(models.CartItem.product_id, models.CartItem.quantity).where(models.CartItem.user_id == user_id)
+        ).all()
+    return versao, {pid: q for pid, q in itens}
+
+def _quantidades(carrinho) -> dict:
+    return {pid: item.quantity for pid, item in carrinho.itens.items()}
+
+
+@pytest.fixture
+def usuario(client, request) -> int:
+    email = f"{request.node.name[:40]}@carrinho.com"
+    return client.post("/auth/register", json={"email": email, "password": "segredo"}).json()["id"]
+
+
+@pytest.fixture
+def produtos(client, lojista) -> list:
+    ids = []
+    for i in range(3):
+        r = client.post(
+            "/products/",
+            json={"merchant_id": int(lojista["merchant_id"]), "name": f"Granola {i}", "price": 10 + i},
+            headers={"Authorization": lojista["Authorization"]},
+        )
+        ids.append(r.json()["id"])
+    return ids
+
+
+def _alterar(client, lojista, product_id: int, **campos) -> None:
+    r = client.post(
+        "/products/batch",
+        json={"operations": [{"op": "update", "id": product_id, **campos}]},
+        headers={"Authorization": lojista["Authorization"]},
+    )
+    assert r.status_code == 200, r.text
+
+
+def test_dois_workers_gravam_um_por_cima_do_outro(usuario, produtos, monkeypatch):
+    p1, p2, p3 = produtos
+    a, b = _worker(), _worker()
+
+    async def cenario(db):
+        await a.adicionar(db, usuario, p1, 1)
+        await a.gravar()
+        await b.obter(db, usuario)          # B parte da versão 1, com p1
+        await b.adicionar(db, usuario, p2, 2)
+        await b.remover(db, usuario, p1)
+        await a.adicionar(db, usuario, p3, 3)
+        await a.adicionar(db, usuario, p1, 4)  # p1 = 5 em A
+        await a.gravar()                     # versão 2: p1=5, p3=3
+        await b.gravar()                     # base 1 velha: delta de B por cima da versão 2
+        return _quantidades(b._dados[usuario])
+
+    assert _rodar(cenario) == {p2: 2, p3: 3}  # B realinhou com o que A gravou
+    assert _gravado(usuario) == (3, {p2: 2, p3: 3})
+
+    # A ainda está na versão 2; depois de RECONFERIR ele recarrega do banco
+    monkeypatch.setattr(modulo, "RECONFERIR", 0.0)
+
+    async def reconferir(db):
+        return _quantidades(await a.obter(db, usuario))
+
+    assert _rodar(reconferir) == {p2: 2, p3: 3}
+
+
+def test_falha_na_gravacao_devolve_o_delta(usuario, produtos, monkeypatch):
+    p1, p2, _ = produtos
+    loja = _worker()
+    gravar = modulo._gravar
+    falhas = [RuntimeError("banco travado")]
+
+    def talvez_falhar(lote):
+        if falhas:
+            raise falhas.pop()
+        return gravar(lote)
+
+    monkeypatch.setattr(modulo, "_gravar", talvez_falhar)
+
+    async def cenario(db):
+        await loja.adicionar(db, usuario, p1, 1)
+        await loja.adicionar(db, usuario, p2, 1)
+        with pytest.raises(RuntimeError):
+            await loja.gravar()
+        await loja.remover(db, usuario, p2)  # mais novo que o delta devolvido
+        assert loja.pendentes == 1
+        await loja.gravar()
+        assert loja.pendentes == 0
+
+    _rodar(cenario)
+    assert _gravado(usuario) == (1, {p1: 1})
+
+
+def test_checkout_espera_a_gravacao_em_andamento(usuario, produtos, monkeypatch):
+    p1, p2, _ = produtos
+    loja = _worker()
+    entrou, liberar = threading.Event(), threading.Event()
+    gravar = modulo._gravar
+
+    def gravar_devagar(lote):
+        entrou.set()
+        liberar.wait(5)
+        return gravar(lote)
+
+    monkeypatch.setattr(modulo, "_gravar", gravar_devagar)
+
+    async def cenario(db):
+        await loja.adicionar(db, usuario, p1, 1)
+        gravacao = asyncio.ensure_future(loja.gravar())
+        await asyncio.to_thread(entrou.wait, 5)
+        await loja.adicionar(db, usuario, p2, 2)  # fora do lote em andamento
+        checkout = asyncio.ensure_future(loja.fechar(db, usuario))
+        await asyncio.sleep(0.05)
+        assert not checkout.done()  # esperando o lote de base 0 -> 1 terminar
+        with pytest.raises(ErroCarrinho) as exc:
+            await loja.adicionar(db, usuario, p1, 1)
+        assert exc.value.status == 409  # sem add/remove durante o checkout
+        liberar.set()
+        await gravacao
+        pedido = await checkout
+        assert loja.pendentes == 0 and loja._dados[usuario].itens == {}
+        return pedido
+
+    pedido = _rodar(cenario)
+    assert pedido.total == 10 + 2 * 11
+    assert _gravado(usuario) == (2, {})  # gravação (1) e checkout (2)
+    with SessionLocal() as db:
+        itens = db.execute(
+            select(models.OrderItem.product_id, models.OrderItem.quantity).where(models.OrderItem.order_id == pedido.order_id)
+        ).all()
+    assert sorted(itens) == sorted([(p1, 1), (p2, 2)])  # p2 foi no pedido sem passar pelo lote
+
+
+def test_dois_checkouts_do_mesmo_carrinho_so_um_passa(usuario, produtos):
+    p1, p2, _ = produtos
+    a, b = _worker(), _worker()
+
+    async def cenario(db):
+        await a.adicionar(db, usuario, p1, 1)
+        await a.gravar()
+        await b.obter(db, usuario)
+        await b.adicionar(db, usuario, p2, 1)  # delta só em B
+        await a.fechar(db, usuario)
+        with pytest.raises(pedidos.CarrinhoMudou):
+            await b.fechar(db, usuario)
+        # B recarrega o carrinho (vazio depois do pedido de A) com o próprio delta por cima
+        return _quantidades(b._dados[usuario]), b._dados[usuario].base
+
+    assert _rodar(cenario) == ({p2: 1}, 2)
+
+
+def test_preco_mudou_e_produto_indisponivel_corrigem_o_carrinho(client, lojista, usuario, produtos):
+    p1, p2, p3 = produtos
+    loja = _worker()
+
+    async def encher(db):
+        for pid in produtos:
+            await loja.adicionar(db, usuario, pid, 1)
+        await loja.gravar()
+
+    _rodar(encher)
+    _alterar(client, lojista, p1, price=99.5)
+    _alterar(client, lojista, p2, active=False)
+
+    async def checkout(db):
+        with pytest.raises(pedidos.ItensDivergentes) as exc:
+            await loja.fechar(db, usuario)
+        motivos = {d.product_id: (d.reason, d.old_price, d.price) for d in exc.value.divergencias}
+        carrinho = loja._dados[usuario]
+        precos = {pid: item.unit_price for pid, item in carrinho.itens.items()}
+        pedido = await loja.fechar(db, usuario, carrinho.versao)  # o cliente confere e manda de novo
+        return motivos, precos, pedido
+
+    motivos, precos, pedido = _rodar(checkout)
+    assert motivos == {p1: ("price_changed", 10, 99.5), p2: ("unavailable", 11, None)}
+    assert precos == {p1: 99.5, p3: 12}
+    assert pedido.total == 99.5 + 12
+
+
+def test_versao_vista_pelo_cliente_diferente_recusa_o_checkout(usuario, produtos):
+    loja = _worker()
+
+    async def cenario(db):
+        carrinho = await loja.adicionar(db, usuario, produtos[0], 1)
+        vista = carrinho.versao
+        await loja.adicionar(db, usuario, produtos[1], 1)
+        with pytest.raises(ErroCarrinho) as exc:
+            await loja.fechar(db, usuario, vista)
+        assert exc.value.status == 409
+        await loja.encerrar()
+
+    _rodar(cenario)
+
+
+def test_encerrar_grava_o_que_falta(usuario, produtos):
+    loja = _worker()
+
+    async def cenario(db):
+        await loja.adicionar(db, usuario, produtos[0], 2)
+        await loja.adicionar(db, usuario, produtos[1], 1)
+        assert loja._tarefa is not None  # tarefa de gravação iniciada pelo primeiro add
+        await loja.encerrar()
+        assert loja._tarefa is None and loja.pendentes == 0
+
+    _rodar(cenario)
+    assert _gravado(usuario) == (1, {produtos[0]: 2, produtos[1]: 1})
@@ -0,0 +1,54 @@
+# tests/test_consultas.py
+"""
+Orçamento de statements SQL das leituras do catálogo: o número de consultas
+de uma página não pode crescer com o tamanho dela (regressão de N+1).
+Cada rota é medida com 5 e com 50 itens, sem o cache de respostas.
+"""
+import pytest
+
+from app.cache import respostas
+from app.query.instrumentacao import assert_max_queries
+
+
+# (url, máximo de statements, contando o BEGIN da transação de leitura)
+ORCAMENTOS = [
+    ("/products/?limit={limit}", 2),
+    ("/products/?tag=vegano&limit={limit}", 2),
+    ("/products/merchant/{merchant_id}?limit={limit}", 3),
+    ("/products/search?q=pão&limit={limit}", 2),
+    ("/products/filter?tags=vegano&limit={limit}", 3),
+    ("/products/filter?tags=vegano&tags=sem_gluten&limit={limit}", 3),
+]
+
+
+def _medir(client, url: str, limite: int, headers=None):
+    respostas.limpar()  # mede a consulta, não o LRU de corpos prontos
+    with assert_max_queries(limite) as contagem:
+        r = client.get(url, headers=headers)
+    assert r.status_code == 200, r.text
+    corpo = r.json()
+    return contagem.statements, len(corpo if isinstance(corpo, list) else corpo["items"])
+
+
+@pytest.mark.parametrize("url,limite", ORCAMENTOS)
+def test_pagina_nao_cresce_com_o_tamanho(client, catalogo, url, limite):
+    url = url.replace("{merchant_id}", str(catalogo["merchant_id"]))
+    client.get(url.format(limit=1))  # índices em memória já construídos
+    pequena, itens_pequena = _medir(client, url.format(limit=5), limite)
+    grande, itens_grande = _medir(client, url.format(limit=50), limite)
+    assert itens_grande > itens_pequena
+    assert grande == pequena
+
+
+def test_produtos_do_lojista(client, catalogo, lojista):
+    headers = {"Authorization": lojista["Authorization"]}
+    client.get("/products/me?limit=1", headers=headers)
+    statements, itens = _medir(client, "/products/me?limit=50", 2, headers=headers)
+    assert itens == 50
+
+
+def test_assert_max_queries_falha_acima_do_limite(client, catalogo):
+    respostas.limpar()
+    with pytest.raises(AssertionError, match="statements SQL executados, limite 0"):
+        with assert_max_queries(0):
+            client.get("/products/?limit=5")
@@ -0,0 +1,117 @@
+# tests/test_eventos.py
+"""
+Feed /ws/catalog pelo cliente de websocket do TestClient: hello com o seq
+atual, filtros por loja e por tag (ao vivo e na reposição com ?since=) e o
+reset quando o seq pedido já saiu do log.
+
+Cada teste escreve primeiro o que o filtro deve descartar e depois o que deve
+chegar: o primeiro frame recebido já prova que o descartado não passou. Entre
+um teste e outro a tarefa de leitura do canal termina (sem assinantes), então
+cada conexão começa do último seq do banco, não de uma leitura atrasada.
+"""
+import time
+
+import pytest
+from app.cache.canal import canal
+from app.query import eventos, outbox
+
+
+@pytest.fixture(autouse=True)
+def canal_parado(monkeypatch):
+    monkeypatch.setattr(canal, "poll", 0.02)
+    limite = time.monotonic() + 5
+    while canal._tarefa is not None:
+        assert time.monotonic() < limite, "a tarefa do canal não terminou"
+        time.sleep(0.01)
+
+
+def _produto(client, lojista, nome: str, tags=()) -> int:
+    r = client.post(
+        "/products/",
+        json={"merchant_id": int(lojista["merchant_id"]), "name": nome, "price": 5, "tags": list(tags)},
+        headers={"Authorization": lojista["Authorization"]},
+    )
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+def _seq_atual(client) -> int:
+    with client.websocket_connect("/ws/catalog") as ws:
+        hello = ws.receive_json()
+    assert hello["type"] == "hello"
+    return hello["seq"]
+
+
+@pytest.fixture(scope="module")
+def tag_feed(client, admin) -> str:
+    client.post("/tags/", json={"code": "feed_tag", "label": "feed"}, headers=admin)
+    return "feed_tag"
+
+
+def test_ao_vivo_so_recebe_a_loja_assinada(client, lojista, outro_lojista):
+    merchant_id = int(lojista["merchant_id"])
+    with client.websocket_connect(f"/ws/catalog?merchant={merchant_id}") as ws:
+        seq = ws.receive_json()["seq"]
+        _produto(client, outro_lojista, "Fora do filtro")
+        pid = _produto(client, lojista, "Dentro do filtro")
+        frame = ws.receive_json()
+    assert frame["type"] == "product.created"
+    assert (frame["id"], frame["merchant_id"]) == (pid, merchant_id)
+    assert frame["seq"] > seq + 1  # o evento da outra loja ficou no meio, sem chegar
+
+
+def test_ao_vivo_filtro_por_tag_e_eventos_de_tag_para_todos(client, admin, lojista, outro_lojista, tag_feed):
+    with client.websocket_connect(f"/ws/catalog?tag={tag_feed}") as ws:
+        ws.receive_json()  # hello
+        _produto(client, lojista, "Sem a tag")
+        pid = _produto(client, outro_lojista, "Com a tag", tags=[tag_feed])
+        assert ws.receive_json()["id"] == pid
+        # tag criada não tem produto nem loja, mas vale para qualquer assinatura
+        client.post("/tags/", json={"code": "feed_outra", "label": "outra"}, headers=admin)
+        assert ws.receive_json()["type"] == "tag.created"
+
+
+def test_since_repoe_so_o_que_faltou_e_respeita_o_filtro(client, lojista, outro_lojista):
+    merchant_id = int(outro_lojista["merchant_id"])
+    seq = _seq_atual(client)
+    perdidos = [_produto(client, outro_lojista, f"Perdido {i}") for i in range(3)]
+    _produto(client, lojista, "De outra loja")  # no log, mas fora do filtro
+
+    with client.websocket_connect(f"/ws/catalog?since={seq}&merchant={merchant_id}") as ws:
+        recebidos = [ws.receive_json() for _ in perdidos]
+        # depois da reposição o feed segue ao vivo, sem repetir nada
+        novo = _produto(client, outro_lojista, "Novo")
+        seguinte = ws.receive_json()
+    assert [f["id"] for f in recebidos] == perdidos
+    assert all(f["seq"] > seq for f in recebidos)
+    assert [f["seq"] for f in recebidos] == sorted(f["seq"] for f in recebidos)
+    assert seguinte["id"] == novo and seguinte["seq"] > recebidos[-1]["seq"]
+
+
+def test_since_podado_do_log_recebe_reset(client, lojista, monkeypatch):
+    seq = _seq_atual(client)
+    monkeypatch.setattr(eventos, "RETER", 2)
+    for i in range(4):
+        _produto(client, lojista, f"Poda {i}")
+    assert outbox.drenar() >= 1  # a poda vai pelo outbox: o log fica só com os 2 últimos
+
+    with client.websocket_connect(f"/ws/catalog?since={seq}") as ws:
+        reset = ws.receive_json()
+        assert reset == {"type": "reset", "seq": _seq_atual(client)}
+        # e continua do seq do reset
+        pid = _produto(client, lojista, "Depois do reset")
+        assert ws.receive_json()["id"] == pid
+
+
+def test_since_no_futuro_recebe_reset(client):
+    seq = _seq_atual(client)
+    with client.websocket_connect(f"/ws/catalog?since={seq + 1000}") as ws:
+        assert ws.receive_json() == {"type": "reset", "seq": seq}
+
+
+def test_tag_desconhecida_fecha_a_conexao(client):
+    from starlette.websockets import WebSocketDisconnect
+
+    with pytest.raises(WebSocketDisconnect) as exc:
+        with client.websocket_connect("/ws/catalog?tag=nao_existe") as ws:
+            ws.receive_json()
+    assert exc.value.code == 1008
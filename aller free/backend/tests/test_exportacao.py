@@ -0,0 +1,22 @@
+# tests/test_exportacao.py
+import csv
+import io
+
+import orjson
+
+
+def test_ndjson_tem_o_formato_de_product_out(client, catalogo):
+    r = client.get("/products/export", params={"format": "ndjson", "merchant_id": catalogo["merchant_id"]})
+    assert r.status_code == 200
+    registros = [orjson.loads(linha) for linha in r.content.splitlines()]
+    assert len(registros) >= 60
+    produto = client.get(f"/products/{registros[0]['id']}").json()
+    assert {k: registros[0][k] for k in produto} == produto
+    assert {r["store_name"] for r in registros} == {"Empório Teste"}
+
+
+def test_csv_continua_com_as_colunas_da_importacao(client, catalogo):
+    r = client.get("/products/export", params={"format": "csv", "merchant_id": catalogo["merchant_id"]})
+    linhas = list(csv.reader(io.StringIO(r.text)))
+    assert linhas[0] == ["id", "merchant_id", "name", "description", "price", "active", "tags", "updated_at"]
+    assert all(len(linha) == 8 for linha in linhas[1:])
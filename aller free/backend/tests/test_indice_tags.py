@@ -0,0 +1,150 @@
+# tests/test_indice_tags.py
+"""
+Índice de bitmaps conferido contra a mesma conta feita com sets: páginas e
+cursor de ids_do_int (que atravessam as janelas de conversão), AND/OR/NOT com
+o filtro de ativos, facetas e a aplicação das mudanças de um worker.
+"""
+import random
+import time
+
+import pytest
+from app.cache.indice_tags import Bitmap, IndiceTags, _Indice, ids_do_int
+
+TAGS = (1, 2, 3, 4)
+
+
+def _bitmap(ids) -> Bitmap:
+    ids = list(ids)
+    return Bitmap.de_ids(ids, (max(ids, default=0) >> 3) + 1)
+
+
+class _Modelo:
+    """O que o índice deveria responder, em sets: pid -> (active, tags)."""
+
+    def __init__(self, rng: random.Random, n: int, maior_id: int):
+        self.produtos = {
+            pid: (rng.random() < 0.7, {t for t in TAGS if rng.random() < 0.4})
+            for pid in rng.sample(range(1, maior_id + 1), n)
+        }
+
+    def indice(self, versao: int = 1) -> IndiceTags:
+        indice = IndiceTags(check_interval=3600)  # _garantir não vai ao banco
+        indice._indice = _Indice(
+            versao=versao,
+            todos=_bitmap(self.produtos),
+            ativos=_bitmap(pid for pid, (ativo, _) in self.produtos.items() if ativo),
+            por_tag={t: _bitmap(pid for pid, (_, tags) in self.produtos.items() if t in tags) for t in TAGS},
+            checked_at=time.monotonic(),
+        )
+        return indice
+
+    def consultar(self, todas=(), alguma=(), nenhuma=(), active=None):
+        return sorted(
+            pid for pid, (ativo, tags) in self.produtos.items()
+            if (active is None or ativo == active)
+            and set(todas) <= tags
+            and (not alguma or tags & set(alguma))
+            and not tags & set(nenhuma)
+        )
+
+
+# ---------- ids_do_int ----------
+@pytest.mark.parametrize("semente", range(5))
+def test_ids_do_int_pagina_como_o_set(semente):
+    rng = random.Random(semente)
+    # até ~3 * 2^20: passa pelas janelas de 4k, 8k, ... e pelo teto de 2^20 bits
+    ids = sorted(rng.sample(range(0, 3_000_000), 2000)) + [3_000_001]
+    valor = _bitmap(ids).como_int()
+    assert ids_do_int(valor, depois_de=-1) == ids
+    for _ in range(50):
+        depois_de = rng.choice(ids + [rng.randrange(3_000_000)])
+        limite = rng.choice((None, 1, 7, 64, 500))
+        esperado = [i for i in ids if i > depois_de]
+        assert ids_do_int(valor, depois_de, limite) == (esperado if limite is None else esperado[:limite])
+
+
+def test_ids_do_int_nos_limites_das_palavras():
+    ids = [1, 63, 64, 65, 127, 128, 4095, 4096, 4097, 12287, 12288]
+    valor = _bitmap(ids).como_int()
+    assert ids_do_int(valor) == ids
+    assert ids_do_int(valor, depois_de=64, limite=3) == [65, 127, 128]
+    assert ids_do_int(0) == []
+
+
+# ---------- consultas ----------
+def _consultas(rng: random.Random):
+    for _ in range(200):
+        todas = rng.sample(TAGS, rng.randint(0, 2))
+        alguma = rng.sample(TAGS, rng.randint(0, 2))
+        nenhuma = rng.sample(TAGS, rng.randint(0, 1))
+        yield dict(todas=todas, alguma=alguma, nenhuma=nenhuma, active=rng.choice((None, True, False)))
+
+
+@pytest.mark.parametrize("semente", range(3))
+def test_consultar_bate_com_a_conta_em_sets(semente):
+    rng = random.Random(semente)
+    modelo = _Modelo(rng, 3000, 20_000)
+    indice = modelo.indice()
+    for filtros in _consultas(rng):
+        esperado = modelo.consultar(**filtros)
+        r = indice.consultar(None, **filtros, limite=25)
+        assert (r.ids, r.total, r.tem_mais) == (esperado[:25], len(esperado), len(esperado) > 25)
+        assert r.facetas == {t: sum(t in modelo.produtos[pid][1] for pid in esperado) for t in TAGS}
+        if esperado:  # cursor: a página seguinte começa depois do último id
+            cursor = esperado[len(esperado) // 2]
+            seguinte = indice.consultar(None, **filtros, depois_de=cursor, limite=25)
+            assert seguinte.ids == [pid for pid in esperado if pid > cursor][:25]
+
+
+def test_tag_sem_bitmap_nao_casa_nada_e_nao_exclui_nada():
+    modelo = _Modelo(random.Random(7), 200, 1000)
+    indice = modelo.indice()
+    assert indice.consultar(None, todas=[99]).total == 0
+    assert indice.consultar(None, nenhuma=[99]).total == len(modelo.produtos)
+    assert indice.consultar(None, alguma=[99]).total == 0
+
+
+def test_ativos_com_todas():
+    modelo = _Modelo(random.Random(8), 500, 5000)
+    indice = modelo.indice(versao=4)
+    assert indice.ativos_com_todas(None, [1, 2]) == (4, modelo.consultar(todas=[1, 2], active=True))
+
+
+# ---------- manutenção ----------
+def test_aplicar_em_sequencia_acompanha_as_mudancas():
+    rng = random.Random(9)
+    modelo = _Modelo(rng, 500, 5000)
+    indice = modelo.indice(versao=10)
+    ouvidos = []
+    indice.ao_aplicar(lambda versao, estados: ouvidos.append(versao))
+
+    for versao in range(11, 41):
+        estados = {}
+        for _ in range(rng.randint(1, 5)):
+            pid = rng.randint(1, 6000)  # inclui ids além do tamanho dos bitmaps
+            if pid in modelo.produtos and rng.random() < 0.3:
+                estados[pid] = None
+                del modelo.produtos[pid]
+            else:
+                estados[pid] = modelo.produtos[pid] = (rng.random() < 0.7, {t for t in TAGS if rng.random() < 0.4})
+        indice._aplicar(versao, estados)
+
+    assert ouvidos == list(range(11, 41))
+    assert indice._indice.versao == 40
+    for filtros in _consultas(rng):
+        esperado = modelo.consultar(**filtros)
+        r = indice.consultar(None, **filtros, limite=10_000)
+        assert (r.ids, r.total) == (esperado, len(esperado))
+
+
+def test_aplicar_com_versao_pulada_descarta_o_indice():
+    modelo = _Modelo(random.Random(10), 100, 1000)
+    indice = modelo.indice(versao=5)
+    ouvidos = []
+    indice.ao_aplicar(lambda versao, estados: ouvidos.append(versao))
+
+    indice._aplicar(7, {1: (True, {1})})  # a 6 foi de outro worker
+    assert indice._indice is None  # próxima leitura reconstrói do banco
+    assert ouvidos == []           # quem deriva do índice também refaz pela versão
+    indice._aplicar(8, {1: (True, {1})})  # sem índice: nada a fazer
+    assert indice._indice is None and ouvidos == []
@@ -0,0 +1,23 @@
+# tests/test_instrumentacao.py
+import time
+
+import pytest
+from sqlalchemy import create_engine, exc, text
+
+from app.query import instrumentacao
+
+
+def test_statement_com_erro_nao_deixa_resto_na_conexao():
+    engine = create_engine("sqlite://")
+    instrumentacao.instalar(engine)
+    with engine.connect() as conn, instrumentacao.capturar(guardar_sql=True) as contagem:
+        info = dict(conn.info)
+        for _ in range(3):
+            with pytest.raises(exc.OperationalError):
+                conn.execute(text("SELECT * FROM nao_existe"))
+        assert conn.info == info  # nada acumulado pelos statements que falharam
+        time.sleep(0.2)
+        conn.execute(text("SELECT 1"))
+    # só o statement que terminou conta, com o tempo dele e não desde os que falharam
+    assert contagem.sql == ["SELECT 1"]
+    assert contagem.tempos[0] < 0.1
@@ -0,0 +1,21 @@
+# tests/test_lojista.py
+from sqlalchemy import select
+from app.modelos import models
+from app.query.database import SessionLocal
+
+
+def test_mudar_localizacao_gera_evento_e_muda_o_etag_da_loja(client, lojista):
+    headers = {"Authorization": lojista["Authorization"]}
+    merchant_id = int(lojista["merchant_id"])
+    etag = client.get(f"/products/merchant/{merchant_id}").headers["etag"]
+
+    r = client.put("/merchants/me/location", json={"latitude": -23.55, "longitude": -46.63}, headers=headers)
+    assert r.status_code == 200, r.text
+
+    with SessionLocal() as db:
+        ultimo = db.execute(
+            select(models.CatalogEvent.kind, models.CatalogEvent.merchant_id).order_by(models.CatalogEvent.seq.desc()).limit(1)
+        ).one()
+    assert tuple(ultimo) == ("merchant.moved", merchant_id)
+    r = client.get(f"/products/merchant/{merchant_id}", headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag
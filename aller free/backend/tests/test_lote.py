@@ -0,0 +1,143 @@
+# tests/test_lote.py
+"""
+POST /products/batch: posse conferida numa consulta só, atomic desfaz tudo,
+best_effort desfaz só o grupo que falhou, e o lote mantém product_views,
+contadores, versões, índice de tags e autocomplete como as rotas unitárias.
+"""
+import pytest
+from sqlalchemy import select
+from app.modelos import models
+from app.query import contadores, lote, vitrine
+from app.query.database import SessionLocal, engine
+from app.query.instrumentacao import capturar
+
+
+def _headers(lojista) -> dict:
+    return {"Authorization": lojista["Authorization"]}
+
+def _criar(client, lojista, nome: str, n: int, tags=()) -> list:
+    ids = []
+    for i in range(n):
+        r = client.post(
+            "/products/",
+            json={"merchant_id": int(lojista["merchant_id"]), "name": f"{nome} {i}", "price": 10, "tags": list(tags)},
+            headers=_headers(lojista),
+        )
+        assert r.status_code == 201, r.text
+        ids.append(r.json()["id"])
+    return ids
+
+def _lote(client, lojista, operacoes, mode="atomic"):
+    return client.post("/products/batch", json={"mode": mode, "operations": operacoes}, headers=_headers(lojista))
+
+def _precos(ids) -> dict:
+    with SessionLocal() as db:
+        rows = db.execute(select(models.Product.id, models.Product.price).where(models.Product.id.in_(ids))).all()
+    return {pid: preco for pid, preco in rows}
+
+def _sem_deriva() -> None:
+    with engine.connect() as conn:
+        assert vitrine.verificar(conn).ids == []
+        # só os de produto: test_principais grava uma loja direto no banco
+        assert {c: v for c, v in contadores.verificar(conn).items() if c[0].startswith("products")} == {}
+
+
+@pytest.fixture(scope="module")
+def outra_loja(client, outro_lojista) -> int:
+    """Um produto de outro lojista."""
+    return _criar(client, outro_lojista, "Alheio", 1)[0]
+
+
+def test_posse_e_conferida_numa_consulta_so(client, lojista):
+    ids = _criar(client, lojista, "Posse", 30)
+    contagens = []
+    for n in (3, 30):
+        with capturar(guardar_sql=True) as contagem:
+            r = _lote(client, lojista, [{"op": "update", "id": pid, "price": 20 + n} for pid in ids[:n]])
+        assert r.status_code == 200, r.text
+        donos = [sql for sql in contagem.sql if "merchants.user_id" in sql]
+        assert len(donos) == 1, donos
+        contagens.append(contagem.statements)
+    assert contagens[0] == contagens[1]  # não cresce com o tamanho do lote
+
+
+def test_atomic_com_item_de_outra_loja_nao_grava_nada(client, lojista, outra_loja):
+    ids = _criar(client, lojista, "Atomico", 2)
+    r = _lote(client, lojista, [
+        {"op": "update", "id": ids[0], "price": 99},
+        {"op": "update", "id": outra_loja, "price": 99},
+        {"op": "delete", "id": ids[1]},
+        {"op": "update", "id": 10**9, "price": 1},
+    ])
+    assert r.status_code == 409
+    corpo = r.json()
+    assert (corpo["committed"], corpo["applied"], corpo["failed"]) == (False, 0, 4)
+    assert [item["status"] for item in corpo["results"]] == [409, 403, 409, 404]
+    assert corpo["results"][0]["error"] == lote.NAO_APLICADO
+    assert _precos(ids) == {ids[0]: 10, ids[1]: 10}
+
+
+def test_atomic_desfaz_grupos_ja_gravados_quando_um_falha_no_banco(client, lojista, monkeypatch):
+    ids = _criar(client, lojista, "Falha", 2)
+    gravar = lote._gravar
+
+    def falhar_no_delete(db, grupo):
+        gravar(db, grupo)
+        if grupo[0].item.op == "delete":
+            raise RuntimeError("disco cheio")
+
+    monkeypatch.setattr(lote, "_gravar", falhar_no_delete)
+    r = _lote(client, lojista, [{"op": "update", "id": ids[0], "price": 55}, {"op": "delete", "id": ids[1]}])
+    assert r.status_code == 409
+    assert [item["status"] for item in r.json()["results"]] == [409, 500]
+    assert _precos(ids) == {ids[0]: 10, ids[1]: 10}  # o update do primeiro grupo também saiu
+    _sem_deriva()
+
+
+def test_best_effort_grava_os_validos_e_desfaz_so_o_grupo_que_falhou(client, lojista, outra_loja, monkeypatch):
+    ids = _criar(client, lojista, "Parcial", 3)
+    gravar = lote._gravar
+
+    def falhar_no_delete(db, grupo):
+        gravar(db, grupo)
+        if grupo[0].item.op == "delete":
+            raise RuntimeError("disco cheio")
+
+    monkeypatch.setattr(lote, "_gravar", falhar_no_delete)
+    r = _lote(client, lojista, [
+        {"op": "update", "id": ids[0], "price": 31},
+        {"op": "update", "id": outra_loja, "price": 31},
+        {"op": "delete", "id": ids[1]},
+        {"op": "update", "id": ids[2], "name": "Parcial renomeado"},
+    ], mode="best_effort")
+    assert r.status_code == 200
+    corpo = r.json()
+    assert [item["status"] for item in corpo["results"]] == [200, 403, 500, 200]
+    assert (corpo["committed"], corpo["applied"], corpo["failed"]) == (True, 2, 2)
+    assert _precos(ids) == {ids[0]: 31, ids[1]: 10, ids[2]: 10}  # o delete foi desfeito no savepoint
+    _sem_deriva()
+
+
+def test_lote_mantem_vitrine_indices_e_versoes(client, admin, lojista):
+    client.post("/tags/", json={"code": "integral_lote", "label": "integral"}, headers=admin)
+    ids = _criar(client, lojista, "Farinha", 4)
+    etag = client.get(f"/products/{ids[0]}").headers["etag"]
+    assert client.get("/products/filter?tags=integral_lote").json()["total"] == 0  # índice construído
+
+    r = _lote(client, lojista, [
+        {"op": "add_tags", "id": ids[0], "tags": ["integral_lote"]},
+        {"op": "add_tags", "id": ids[1], "tags": ["integral_lote"]},
+        {"op": "update", "id": ids[1], "active": False},
+        {"op": "update", "id": ids[2], "name": "Quinoa em flocos"},
+        {"op": "delete", "id": ids[3]},
+    ])
+    assert r.status_code == 200, r.text
+
+    produto = client.get(f"/products/{ids[0]}", headers={"If-None-Match": etag})
+    assert produto.status_code == 200 and [t["code"] for t in produto.json()["tags"]] == ["integral_lote"]
+    filtro = client.get("/products/filter?tags=integral_lote&active=true").json()
+    assert [p["id"] for p in filtro["items"]] == [ids[0]]
+    assert client.get(f"/products/{ids[3]}").status_code == 404
+    textos = [s["text"] for s in client.get("/products/suggest?prefix=quinoa").json()]
+    assert "Quinoa em flocos" in textos
+    _sem_deriva()
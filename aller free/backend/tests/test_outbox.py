@@ -0,0 +1,200 @@
+# tests/test_outbox.py
+"""
+Outbox: reserva (lease), nova tentativa com espera, desistência (dead) e
+tratador em passos. Cada teste começa com a fila vazia e registra os
+próprios tópicos; o trabalhador está desligado (conftest), então nada roda
+sem o teste chamar _reservar/_processar/drenar.
+
+O escritor tem uma conexão só: as conferências abrem uma sessão curta cada,
+e a sessão do teste nunca fica com transação aberta quando drenar() roda.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import delete, func, select, update
+from app.modelos import models
+from app.query import outbox
+from app.query.database import SessionLocal
+
+
+_fila = models.OutboxMessage.__table__
+
+
+@pytest.fixture
+def db(client):
+    with SessionLocal() as db:
+        db.execute(delete(_fila))
+        db.commit()
+        yield db
+
+
+def _enfileirar(db, topico: str, payload=None) -> None:
+    outbox.enfileirar(db, topico, f"{topico}:1", payload or {})
+    db.commit()
+
+def _vencer() -> None:
+    """Faz a reserva (ou a espera) de todas as mensagens vencer."""
+    with SessionLocal() as db:
+        db.execute(update(_fila).values(available_at=datetime.utcnow() - timedelta(seconds=1)))
+        db.commit()
+
+def _linhas():
+    with SessionLocal() as db:
+        return db.execute(select(_fila)).all()
+
+def _linha():
+    (linha,) = _linhas()
+    return linha
+
+
+def test_chave_repetida_nao_duplica_a_mensagem(db):
+    _enfileirar(db, "teste.chave")
+    _enfileirar(db, "teste.chave")
+    assert len(_linhas()) == 1
+
+
+def test_reserva_segura_a_mensagem_e_a_tentativa_vencida_perde(db):
+    feitos = []
+    outbox.tratador("teste.reserva")(lambda db, m: feitos.append(m.tentativa))
+    _enfileirar(db, "teste.reserva")
+
+    (primeira,) = outbox._reservar(db, 10)
+    assert primeira.tentativa == 1
+    assert _linha().available_at > datetime.utcnow()
+    assert outbox._reservar(db, 10) == []  # reservada: outro trabalhador não pega
+
+    _vencer()  # a reserva venceu sem a primeira tentativa terminar
+    (segunda,) = outbox._reservar(db, 10)
+    assert segunda.tentativa == 2
+
+    assert outbox._processar(db, primeira) == "lost"
+    assert _linha().status == outbox.PENDENTE
+    assert outbox._processar(db, segunda) == "done"
+    assert _linha().status == outbox.CONCLUIDA
+    assert feitos == [1, 2]  # o efeito da tentativa perdida foi desfeito no rollback
+
+
+def test_falha_volta_para_a_fila_com_espera_exponencial(db, monkeypatch):
+    monkeypatch.setattr(outbox, "ESPERA_BASE", 10.0)
+
+    def falhar(db, mensagem):
+        raise ValueError("fora do ar")
+
+    outbox.tratador("teste.falha")(falhar)
+    _enfileirar(db, "teste.falha")
+
+    for tentativa, espera in ((1, 10), (2, 20)):
+        (mensagem,) = outbox._reservar(db, 10)
+        assert mensagem.tentativa == tentativa
+        antes = datetime.utcnow()
+        assert outbox._processar(db, mensagem) == "retry"
+        linha = _linha()
+        assert linha.status == outbox.PENDENTE
+        assert linha.last_error == "ValueError: fora do ar"
+        assert timedelta(seconds=espera - 1) < linha.available_at - antes <= timedelta(seconds=espera + 1)
+        assert outbox._reservar(db, 10) == []  # ainda esperando
+        _vencer()
+
+
+def test_desiste_depois_de_max_tentativas_e_retry_devolve_para_a_fila(db, monkeypatch):
+    monkeypatch.setattr(outbox, "MAX_TENTATIVAS", 2)
+    monkeypatch.setattr(outbox, "ESPERA_BASE", 0.0)
+    falhando = [True]
+
+    def talvez(db, mensagem):
+        if falhando[0]:
+            raise RuntimeError("quebrado")
+
+    outbox.tratador("teste.morta")(talvez)
+    _enfileirar(db, "teste.morta")
+
+    assert outbox.drenar() == 1 and _linha().status == outbox.PENDENTE
+    _vencer()
+    assert outbox.drenar() == 1
+    linha = _linha()
+    assert (linha.status, linha.attempts, linha.last_error) == (outbox.MORTA, 2, "RuntimeError: quebrado")
+    with SessionLocal() as leitura:
+        assert outbox.situacao(leitura)["teste.morta"].mortas == 1
+    assert outbox.drenar() == 0  # dead não é reservada
+
+    falhando[0] = False
+    assert outbox.repetir_mortas(db) == 1
+    db.commit()
+    assert (_linha().status, _linha().attempts) == (outbox.PENDENTE, 0)
+    assert outbox.drenar() == 1
+    assert _linha().status == outbox.CONCLUIDA
+
+
+def test_tratador_em_passos_volta_pronto_com_as_tentativas_zeradas(db):
+    vistos = []
+
+    def passo(db, mensagem):
+        vistos.append((mensagem.payload["n"], mensagem.tentativa))
+        n = mensagem.payload["n"] + 1
+        return {"n": n} if n < 3 else None
+
+    outbox.tratador("teste.passos")(passo)
+    _enfileirar(db, "teste.passos", {"n": 0})
+
+    while outbox.drenar():
+        pass
+    assert vistos == [(0, 1), (1, 1), (2, 1)]
+    assert _linha().status == outbox.CONCLUIDA
+
+
+def test_fila_sem_pronta_nao_abre_transacao_no_escritor(db):
+    from sqlalchemy import event
+    from app.query.database import engine
+
+    outbox.tratador("teste.espera")(lambda db, m: None)
+    _enfileirar(db, "teste.espera")
+    with SessionLocal() as escrita:
+        escrita.execute(update(_fila).values(available_at=datetime.utcnow() + timedelta(hours=1)))
+        escrita.commit()
+
+    inicios = []
+
+    def contar(conn):
+        inicios.append(conn)
+
+    event.listen(engine, "begin", contar)
+    try:
+        assert outbox.drenar() == 0
+    finally:
+        event.remove(engine, "begin", contar)
+    assert inicios == []  # só a leitura viu a fila
+
+
+def test_sem_topico_registrado_o_trabalhador_nao_comeca(monkeypatch):
+    import asyncio
+
+    monkeypatch.setattr(outbox, "_tratadores", {})
+    trabalhador = outbox.Trabalhador()
+
+    async def iniciar():
+        trabalhador.iniciar()
+        return trabalhador._tarefa
+
+    assert asyncio.run(iniciar()) is None
+
+
+def test_poda_do_log_do_feed_vai_pelo_outbox(client, lojista, monkeypatch):
+    from app.query import eventos
+
+    with SessionLocal() as leitura:
+        ultimo = leitura.execute(select(func.max(models.CatalogEvent.seq))).scalar()
+    monkeypatch.setattr(eventos, "RETER", 1)
+    r = client.post(
+        "/products/",
+        json={"merchant_id": int(lojista["merchant_id"]), "name": "Poda pelo outbox", "price": 1},
+        headers={"Authorization": lojista["Authorization"]},
+    )
+    assert r.status_code in (200, 201), r.text
+    with SessionLocal() as leitura:
+        assert leitura.execute(select(func.min(models.CatalogEvent.seq))).scalar() <= ultimo  # o request não podou
+        assert outbox.situacao(leitura)[eventos.PODAR].pendentes == 1
+    while outbox.drenar():
+        pass
+    with SessionLocal() as leitura:
+        seqs = leitura.execute(select(models.CatalogEvent.seq)).scalars().all()
+    assert seqs == [ultimo + 1]
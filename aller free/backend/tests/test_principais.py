@@ -0,0 +1,27 @@
+# tests/test_principais.py
+"""
+Principal em cache x loja criada por outro worker: o invalidar() de
+create_merchant só limpa o cache do próprio processo.
+"""
+from app.cache import principais
+from app.modelos import models
+from app.query.database import SessionLocal
+
+
+def test_rota_de_lojista_rele_loja_criada_em_outro_worker(client):
+    user_id = client.post("/auth/register", json={"email": "sem.loja@teste.com", "password": "segredo", "role": "merchant"}).json()["id"]
+    token = client.post("/auth/login", json={"email": "sem.loja@teste.com", "password": "segredo"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    assert client.get("/products/me", headers=headers).json()["items"] == []
+    assert principais.obter(None, user_id).merchant_id is None  # em cache, sem loja
+
+    # a loja nasce "em outro worker": gravada direto, sem invalidar este cache
+    with SessionLocal() as db:
+        db.add(models.Merchant(user_id=user_id, store_name="Loja Nova"))
+        db.commit()
+
+    csv = "name,price,description,tags\nBolo de milho,12.5,,\n"
+    r = client.post("/products/import", files={"file": ("p.csv", csv, "text/csv")}, headers=headers)
+    assert r.status_code == 200, r.text
+    assert [p["name"] for p in client.get("/products/me", headers=headers).json()["items"]] == ["Bolo de milho"]
@@ -0,0 +1,84 @@
+# tests/test_senhas.py
+import bcrypt
+import pytest
+
+from app.autenticacao import auth, senhas
+
+
+def _hash(rounds: int) -> str:
+    return bcrypt.hashpw(b"segredo", bcrypt.gensalt(rounds)).decode()
+
+
+def test_hash_com_outro_custo_e_refeito_no_login():
+    ok, novo = senhas._verificar_e_atualizar("segredo", _hash(auth.BCRYPT_ROUNDS + 1))
+    assert ok and novo is not None
+    assert auth.pwd_context.needs_update(novo) is False
+    assert auth.verify_password("segredo", novo)
+
+
+def test_hash_no_custo_atual_fica():
+    assert senhas._verificar_e_atualizar("segredo", _hash(auth.BCRYPT_ROUNDS)) == (True, None)
+
+
+def test_senha_errada_nao_refaz():
+    assert senhas._verificar_e_atualizar("outra", _hash(auth.BCRYPT_ROUNDS + 1)) == (False, None)
+
+
+# ---------- admissão ----------
+class _Relogio:
+    def __init__(self):
+        self.agora = 1000.0
+
+    def __call__(self) -> float:
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    r = _Relogio()
+    monkeypatch.setattr(senhas.time, "monotonic", r)
+    return r
+
+
+def test_janela_desliza_sem_zerar_na_virada(relogio):
+    janela = senhas.JanelaDeslizante(limite=3, janela=60)
+    for t in (0, 50, 55):
+        relogio.agora = 1000 + t
+        janela.registrar("ip")
+    relogio.agora = 1061
+    janela.registrar("ip")  # a de t=0 saiu
+    # numa janela fixa de 60 s iniciada em 0, o contador teria zerado em t=60
+    relogio.agora = 1062
+    with pytest.raises(senhas.LimiteExcedido) as exc:
+        janela.registrar("ip")
+    assert exc.value.retry_after == 48  # quando a de t=50 sai da janela
+    relogio.agora = 1110
+    janela.registrar("ip")  # a de t=50 saiu
+
+
+def test_sem_impor_conta_mas_nao_barra(relogio):
+    janela = senhas.JanelaDeslizante(limite=2, janela=60)
+    for _ in range(5):
+        janela.registrar("ip", impor=False)
+    with pytest.raises(senhas.LimiteExcedido):
+        janela.registrar("ip")
+
+
+def test_limite_so_vale_com_o_pool_sob_pressao(relogio, monkeypatch):
+    monkeypatch.setattr(senhas, "_por_email", senhas.JanelaDeslizante(limite=2))
+    monkeypatch.setattr(senhas, "_por_ip", senhas.JanelaDeslizante(limite=100))
+    monkeypatch.setattr(senhas, "LIMITAR_ACIMA", 2)
+    monkeypatch.setattr(senhas, "MAX_PENDENTES", 4)
+
+    monkeypatch.setattr(senhas, "_pendentes", 0)
+    for _ in range(5):
+        senhas.admitir("1.2.3.4", "Alguem@teste.com")
+
+    monkeypatch.setattr(senhas, "_pendentes", 2)
+    with pytest.raises(senhas.LimiteExcedido):
+        senhas.admitir("1.2.3.4", "alguem@teste.com")
+    senhas.admitir("1.2.3.4", "outra@teste.com")
+
+    monkeypatch.setattr(senhas, "_pendentes", 4)
+    with pytest.raises(senhas.Sobrecarga):
+        senhas.admitir("1.2.3.4", "nova@teste.com")
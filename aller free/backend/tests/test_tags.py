@@ -0,0 +1,50 @@
+# tests/test_tags.py
+"""
+Tag renomeada ou apagada: o corpo pronto dos produtos (product_views) e os
+contadores do admin mudam na mesma transação do request, então a resposta
+seguinte já traz o label novo (e o ETag novo nunca aponta para o corpo velho).
+"""
+from app.query import contadores, vitrine
+from app.query.database import engine
+
+
+def _produto(client, lojista, code: str) -> int:
+    r = client.post(
+        "/products/",
+        json={"merchant_id": int(lojista["merchant_id"]), "name": f"Cuscuz {code}", "price": 7, "tags": [code]},
+        headers={"Authorization": lojista["Authorization"]},
+    )
+    assert r.status_code == 201, r.text
+    return r.json()["id"]
+
+
+def _sem_deriva() -> None:
+    with engine.connect() as conn:
+        assert vitrine.verificar(conn).ids == []
+        # só os de produto: test_principais grava uma loja direto no banco
+        assert {c: v for c, v in contadores.verificar(conn).items() if c[0].startswith("products")} == {}
+
+
+def test_renomear_tag_remonta_os_produtos_no_request(client, admin, lojista):
+    tag_id = client.post("/tags/", json={"code": "organico", "label": "orgânico"}, headers=admin).json()["id"]
+    product_id = _produto(client, lojista, "organico")
+    etag = client.get(f"/products/{product_id}").headers["etag"]
+
+    r = client.put(f"/tags/{tag_id}", json={"code": "organico", "label": "Orgânico certificado"}, headers=admin)
+    assert r.status_code == 200, r.text
+
+    r = client.get(f"/products/{product_id}", headers={"If-None-Match": etag})
+    assert r.status_code == 200
+    assert r.headers["etag"] != etag
+    assert [t["label"] for t in r.json()["tags"]] == ["Orgânico certificado"]
+    _sem_deriva()
+
+
+def test_apagar_tag_tira_dos_produtos_e_dos_contadores(client, admin, lojista):
+    tag_id = client.post("/tags/", json={"code": "caseiro", "label": "caseiro"}, headers=admin).json()["id"]
+    product_id = _produto(client, lojista, "caseiro")
+
+    assert client.delete(f"/tags/{tag_id}", headers=admin).status_code == 204
+
+    assert client.get(f"/products/{product_id}").json()["tags"] == []
+    _sem_deriva()